@@ -3,19 +3,20 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
+import os
 import secrets
 import shutil
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Protocol, cast
+from typing import Any, Protocol, cast
 
 from django.conf import settings
 from django.utils.functional import SimpleLazyObject
 from django.utils.module_loading import import_string
-from opentelemetry import trace
 
 import old_api
-from airlock import exceptions, permissions, policies
+from airlock import exceptions, metrics, permissions, policies
 from airlock.enums import (
     AuditEventType,
     NotificationEventType,
@@ -24,6 +25,7 @@ from airlock.enums import (
     RequestStatusOwner,
     Visibility,
 )
+from airlock.lib import generations
 from airlock.models import (
     AuditEvent,
     FileReview,
@@ -67,6 +69,9 @@ class DataAccessLayerProtocol(Protocol):
     def get_release_request(self, request_id: str):
         raise NotImplementedError()
 
+    def get_release_request_version(self, request_id: str) -> tuple[str, int]:
+        raise NotImplementedError()
+
     def create_release_request(
         self,
         workspace: str,
@@ -93,6 +98,12 @@ class DataAccessLayerProtocol(Protocol):
     def get_requests_by_status(self, *states: RequestStatus):
         raise NotImplementedError()
 
+    def count_requests_by_status(self) -> dict[RequestStatus, int]:
+        raise NotImplementedError()
+
+    def count_files_pending_upload(self) -> int:
+        raise NotImplementedError()
+
     def set_status(self, request_id: str, status: RequestStatus, audit: AuditEvent):
         raise NotImplementedError()
 
@@ -200,6 +211,12 @@ class DataAccessLayerProtocol(Protocol):
     def audit_event(self, audit: AuditEvent):
         raise NotImplementedError()
 
+    def buffer_audit_event(self, audit: AuditEvent):
+        raise NotImplementedError()
+
+    def flush_audit_events(self):
+        raise NotImplementedError()
+
     def get_audit_log(
         self,
         user: str | None = None,
@@ -257,6 +274,101 @@ class DataAccessLayerProtocol(Protocol):
         raise NotImplementedError()
 
 
+class WorkspaceListingCache:
+    """A cached, sorted list of the workspace directories with a manifest.
+
+    The list of directories is only read again when WORKSPACE_DIR's mtime
+    changes, i.e. when a workspace is added or removed. Once we've seen a
+    workspace's manifest, we don't check for it again, as they are not
+    removed; directories without one yet are checked each time.
+
+    If the workspace watcher is running, we use its generations instead of
+    mtimes, which also means directories without a manifest are only checked
+    again when they change.
+    """
+
+    # A directory's mtime only has the resolution of the filesystem's clock, so
+    # a change made just after we read the directory may not change it. We
+    # don't trust an mtime until it is this many seconds old.
+    RACY_SECONDS = 2
+
+    def __init__(self):
+        self._key: tuple[str, int | str] | None = None
+        self._dirs: list[str] = []
+        self._with_manifest: set[str] = set()
+        # name -> generation token at which a directory had no manifest
+        self._without_manifest: dict[str, str] = {}
+        # sorted (lowercased name, listing) pairs for searching
+        self._index: list[tuple[str, WorkspaceListing]] = []
+
+    def search(self, workspace_dir: Path, query: str = "") -> list[WorkspaceListing]:
+        """Return the workspaces whose name contains query, sorted by name."""
+        self._refresh(workspace_dir)
+        query = query.lower()
+        return [listing for name, listing in self._index if query in name]
+
+    def names_with_manifest(self, workspace_dir: Path) -> frozenset[str]:
+        """Return the names of the workspaces which have a manifest."""
+        self._refresh(workspace_dir)
+        return frozenset(self._with_manifest)
+
+    def _refresh(self, workspace_dir: Path):
+        watched = workspace_dir == settings.WORKSPACE_DIR
+        token = generations.get_token(generations.ROOT) if watched else None
+        if token is not None:
+            key: tuple[str, int | str] = (str(workspace_dir), token)
+            stale = key != self._key
+        else:
+            stat = workspace_dir.stat()
+            key = (str(workspace_dir), stat.st_mtime_ns)
+            stale = key != self._key or time.time() - stat.st_mtime < self.RACY_SECONDS
+
+        metrics.CACHE_LOOKUPS.inc(
+            cache="workspace_listing", result="miss" if stale else "hit"
+        )
+        if stale:
+            if self._key is None or self._key[0] != key[0]:
+                self._with_manifest = set()
+                self._without_manifest = {}
+            with os.scandir(workspace_dir) as entries:
+                self._dirs = sorted(entry.name for entry in entries if entry.is_dir())
+            # forget any workspaces that have been removed
+            self._with_manifest &= set(self._dirs)
+            self._without_manifest = {
+                name: seen_at
+                for name, seen_at in self._without_manifest.items()
+                if name in self._dirs
+            }
+            self._key = key
+            changed = True
+        else:
+            changed = False
+
+        for name in self._dirs:
+            if name in self._with_manifest:
+                continue
+            name_token = generations.get_token(name) if token is not None else None
+            if (
+                name_token is not None
+                and self._without_manifest.get(name) == name_token
+            ):
+                # unchanged since we last looked
+                continue
+            if (workspace_dir / name / "metadata" / "manifest.json").exists():
+                self._with_manifest.add(name)
+                self._without_manifest.pop(name, None)
+                changed = True
+            elif name_token is not None:
+                self._without_manifest[name] = name_token
+
+        if changed:
+            self._index = [
+                (name.lower(), WorkspaceListing(name=name))
+                for name in self._dirs
+                if name in self._with_manifest
+            ]
+
+
 class BusinessLogicLayer:
     """
     The mechanism via which the rest of the codebase should read and write application
@@ -266,6 +378,7 @@ class BusinessLogicLayer:
 
     def __init__(self, data_access_layer: DataAccessLayerProtocol):
         self._dal = data_access_layer
+        self._workspace_listing_cache = WorkspaceListingCache()
 
     def get_workspace(
         self,
@@ -309,45 +422,40 @@ class BusinessLogicLayer:
             include_out_of_date_action_outputs=include_out_of_date_action_outputs,
         )
 
-    def _build_workspace_list(self, user, workspaces) -> list[Workspace]:
-        valid_workspaces = []
-        for workspace_name in workspaces:
-            try:
-                workspace = self.get_workspace(workspace_name, user)
-            except exceptions.WorkspaceNotFound:
-                continue
-            except exceptions.ManifestFileError as error:
-                span = trace.get_current_span()
-                span.record_exception(error)
-                continue
-
-            valid_workspaces.append(workspace)
-
-        return valid_workspaces
+    def _build_workspace_list(
+        self, workspaces: dict[str, Any]
+    ) -> list[WorkspaceListing]:
+        # Only the workspace name, project and archived status are needed to
+        # list workspaces, so we don't read their manifests; we just skip any
+        # that don't have one.
+        with_manifest = self._workspace_listing_cache.names_with_manifest(
+            settings.WORKSPACE_DIR
+        )
+        return [
+            WorkspaceListing.from_metadata(name, metadata)
+            for name, metadata in workspaces.items()
+            if name in with_manifest
+        ]
 
-    def get_workspaces_for_user(self, user: User) -> list[Workspace]:
-        """Get all the local workspace directories that a user has permission for."""
+    def get_workspaces_for_user(self, user: User) -> list[WorkspaceListing]:
+        """Get lightweight WorkspaceListing objects for all the local workspace
+        directories that a user has permission for."""
 
-        return self._build_workspace_list(user, user.workspaces)
+        return self._build_workspace_list(user.workspaces)
 
-    def get_copiloted_workspaces_for_user(self, user: User) -> list[Workspace]:
-        """Get all the local workspace directories that a user is a copilot for."""
-        return self._build_workspace_list(user, user.copiloted_workspaces)
+    def get_copiloted_workspaces_for_user(self, user: User) -> list[WorkspaceListing]:
+        """Get lightweight WorkspaceListing objects for all the local workspace
+        directories that a user is a copilot for."""
+        return self._build_workspace_list(user.copiloted_workspaces)
 
-    def get_all_workspaces(self) -> list[WorkspaceListing]:
-        """Get lightweight WorkspaceListing objects for all workspace directories.
+    def get_all_workspaces(self, query: str = "") -> list[WorkspaceListing]:
+        """Get lightweight WorkspaceListing objects for all workspace directories,
+        sorted by name.
 
-        Scans WORKSPACE_DIR once and checks only whether metadata/manifest.json
-        exists. Skips directories with no manifest file.
+        Skips directories with no metadata/manifest.json file. If query is given,
+        only workspaces whose name contains it (ignoring case) are included.
         """
-        workspaces = []
-        for workspace_dir in settings.WORKSPACE_DIR.iterdir():
-            if not workspace_dir.is_dir():
-                continue
-            if not (workspace_dir / "metadata" / "manifest.json").exists():
-                continue
-            workspaces.append(WorkspaceListing(name=workspace_dir.name))
-        return workspaces
+        return self._workspace_listing_cache.search(settings.WORKSPACE_DIR, query)
 
     def get_release_request(self, request_id: str, user: User) -> ReleaseRequest:
         """Get a ReleaseRequest object for an id."""
@@ -359,6 +467,16 @@ class BusinessLogicLayer:
         permissions.check_user_can_view_workspace(user, release_request.workspace)
         return release_request
 
+    def get_release_request_version(self, request_id: str, user: User) -> int:
+        """Get the version of a release request, without loading it.
+
+        The version increases whenever the request, its files, or its audit
+        log change, so it can be used to tell cheaply if a request has changed.
+        """
+        workspace, version = self._dal.get_release_request_version(request_id)
+        permissions.check_user_can_view_workspace(user, workspace)
+        return version
+
     def get_current_request(self, workspace: str, user: User) -> ReleaseRequest | None:
         """Get the current request for a workspace/user."""
         permissions.check_user_can_view_workspace(user, workspace)
@@ -470,6 +588,14 @@ class BusinessLogicLayer:
             self._get_reviewable_requests_by_status(user, RequestStatus.APPROVED)
         )
 
+    def get_request_status_counts(self) -> dict[RequestStatus, int]:
+        """Get the number of requests in each status, for metrics."""
+        return self._dal.count_requests_by_status()
+
+    def get_pending_upload_count(self) -> int:
+        """Get the number of released files still to be uploaded, for metrics."""
+        return self._dal.count_files_pending_upload()
+
     VALID_STATE_TRANSITIONS = {
         RequestStatus.PENDING: [
             RequestStatus.SUBMITTED,
@@ -601,6 +727,7 @@ class BusinessLogicLayer:
             **audit_extra,
         )
         self._dal.set_status(release_request.id, to_status, audit)
+        metrics.REQUEST_STATUS_CHANGES.inc(status=to_status.name)
         if (release_request.status, to_status) == (
             RequestStatus.RETURNED,
             RequestStatus.SUBMITTED,
@@ -1384,7 +1511,7 @@ class BusinessLogicLayer:
             workspace=workspace.name,
             path=path,
         )
-        self._dal.audit_event(audit)
+        self._dal.buffer_audit_event(audit)
 
     def audit_request_file_access(
         self, request: ReleaseRequest, path: UrlPath, user: User
@@ -1396,7 +1523,7 @@ class BusinessLogicLayer:
             path=path,
             group=path.parts[0],
         )
-        self._dal.audit_event(audit)
+        self._dal.buffer_audit_event(audit)
 
     def audit_request_file_download(
         self, request: ReleaseRequest, path: UrlPath, user: User
@@ -1408,7 +1535,7 @@ class BusinessLogicLayer:
             path=path,
             group=path.parts[0],
         )
-        self._dal.audit_event(audit)
+        self._dal.buffer_audit_event(audit)
 
     def audit_early_return(self, request: ReleaseRequest, user: User):
         audit = AuditEvent.from_request(
@@ -1418,6 +1545,10 @@ class BusinessLogicLayer:
         )
         self._dal.audit_event(audit)
 
+    def flush_audit_events(self):
+        """Write any buffered read-only audit events to the audit log."""
+        self._dal.flush_audit_events()
+
     def hide_audit_events_for_turn(self, request: ReleaseRequest, review_turn):
         self._dal.hide_audit_events_for_turn(request.id, review_turn)
 
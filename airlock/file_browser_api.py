@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import hashlib
+from collections import OrderedDict
+from collections.abc import Hashable
 from dataclasses import dataclass, field
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Protocol
 
-from airlock import renderers
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from airlock import metrics, permissions, renderers
 from airlock.enums import PathType, RequestFileType, WorkspaceFileStatus
 from airlock.models import (
     CodeRepo,
@@ -457,22 +464,15 @@ def get_code_tree(
         # we only want the selected path, and its immediate children if it has any
         pathlist = [selected_path]
 
-        # we only have paths, so we find any child paths of the selected_path
-        len_selected = len(selected_path.parts)
-        for path in repo.pathlist:
-            if path == selected_path:
-                continue
-            if path.parts[:len_selected] == selected_path.parts:
-                # same prefix, so is a child
-                child_path = UrlPath(*path.parts[: len_selected + 1])
-                pathlist.append(child_path)
-
-                # if this child has >1 additional path segment, it is
-                # a directory.  So, mark it as a leaf directory from this
-                # limited tree view, so it is correctly classified by
-                # get_path_tree as a directory.
-                if len(path.parts) > len_selected + 1:
-                    leaf_directories.add(child_path)
+        # child_map is keyed by str, like workspace_child_map
+        for child_str in repo.child_map.get(str(selected_path), []):
+            child = UrlPath(child_str)
+            pathlist.append(child)
+            # if this child has children, it is a directory. So, mark it as a
+            # leaf directory from this limited tree view, so it is correctly
+            # classified by get_path_tree as a directory.
+            if child_str in repo.child_map:
+                leaf_directories.add(child)
     else:
         pathlist = repo.pathlist
 
@@ -565,6 +565,111 @@ def get_path_tree(
     return build_path_tree(path_parts, parent)
 
 
+class TreeFragmentCache:
+    """A small per-process LRU cache of the rendered html of file trees.
+
+    Rendering a big tree, one PathItem at a time, is a large part of the time
+    taken to render a full workspace or request page. But the html only
+    changes when the container's files or their statuses change, which the
+    caller's state_key must capture, or when different directories are
+    expanded.
+
+    The selected node is highlighted after rendering, by adding the selected
+    class to its link, so that selecting another file in the same directory
+    can still use the cached html.
+    """
+
+    template = renderers.RendererTemplate("file_browser/tree.html")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._cache: OrderedDict[Hashable, str] = OrderedDict()
+
+    def render(self, root: PathItem, state_key: Hashable | None = None) -> SafeString:
+        if state_key is None:
+            return self._render(root)
+
+        try:
+            selected_url = escape(root.get_selected().url())
+        except PathItem.PathNotFound:
+            selected_url = None
+
+        key = (state_key, self.template.content_hash, frozenset(expanded_paths(root)))
+        html = self._cache.pop(key, None)
+        if html is None:
+            metrics.CACHE_LOOKUPS.inc(cache="file_tree", result="miss")
+            html = self._render(root)
+            if selected_url:
+                # cache it unselected
+                html = html.replace(
+                    f' selected" href="{selected_url}"', f'" href="{selected_url}"', 1
+                )
+        else:
+            metrics.CACHE_LOOKUPS.inc(cache="file_tree", result="hit")
+
+        self._cache[key] = html
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+        if selected_url:
+            html = html.replace(
+                f'" href="{selected_url}"', f' selected" href="{selected_url}"', 1
+            )
+        return mark_safe(html)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _render(self, root: PathItem) -> SafeString:
+        return render_to_string(self.template.name, {"path": root.fake_parent()})
+
+
+def expanded_paths(node: PathItem):
+    for child in node.children:
+        if child.expanded:
+            yield child.relpath
+            yield from expanded_paths(child)
+
+
+# the html of big trees can be a few MB, so we only keep a few
+tree_fragments = TreeFragmentCache(size=16)
+
+
+def workspace_tree_key(workspace: Workspace) -> Hashable:
+    """The state that a workspace's rendered tree depends on.
+
+    It is the same in every process, so can be used in ETags.
+    """
+    state = (
+        "workspace",
+        workspace.name,
+        workspace.manifest_hash,
+        # includes metadata files, which aren't in the manifest, and depends on
+        # whether out of date action outputs are shown
+        sorted(workspace.workspace_files),
+        sorted(workspace.released_files),
+        workspace.current_request and workspace.current_request.version,
+    )
+    return hashlib.md5(repr(state).encode()).hexdigest()
+
+
+def request_tree_key(release_request: ReleaseRequest, user: User) -> Hashable:
+    """The state that a request's rendered tree depends on, for this user."""
+    return (
+        "request",
+        release_request.id,
+        release_request.version,
+        # the decisions and votes shown depend on the user
+        user.user_id,
+        permissions.user_can_review_request(user, release_request),
+    )
+
+
+def code_tree_key(repo: CodeRepo) -> Hashable:
+    # code at a commit never changes
+    return ("code", repo.workspace, repo.repo, repo.commit)
+
+
 def children_sort_key(node: PathItem):
     """Sort children first by directory, then files.
 
@@ -0,0 +1,400 @@
+"""
+Change generations for the workspace directories.
+
+A single watcher process (the watch_workspaces management command) watches
+WORKSPACE_DIR, and bumps a workspace's generation whenever anything in its
+metadata directory (i.e. its manifest or logs) changes, and the generation of
+the root, ".", whenever a workspace is added or removed. The generations are
+written to a small file, GENERATIONS_FILE, which every worker can read.
+
+This means that a worker can cache things derived from a workspace's files,
+like its parsed manifest, and check they are still fresh by comparing the
+generation it cached them at, which only needs a stat of the generations file,
+rather than re-stat-ing and re-reading the workspace's files.
+
+If the watcher isn't running, get_token() returns None, and callers should
+fall back to reading from disk.
+
+Callers must get the token *before* reading the files they cache, so that if
+they change in between, they are cached against the old token, and read
+again once the watcher has bumped it.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import logging
+import os
+import select
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+
+from airlock import metrics
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = "."
+
+# The watcher writes the generations file at least this often, so that readers
+# can tell that it is still running
+HEARTBEAT_INTERVAL = 5
+# Readers ignore the generations if the watcher hasn't written them for this
+# long, as changes may have been missed
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+
+
+# (stat key, contents) of the generations file, as last read by this process
+_generations: tuple[tuple[int, int, int], dict[str, Any]] | None = None
+
+
+def _read_generations() -> dict[str, Any] | None:
+    global _generations
+
+    try:
+        stat = os.stat(settings.GENERATIONS_FILE)
+    except FileNotFoundError:
+        return None
+
+    # the file is always replaced, rather than written in place, so this
+    # changes with each write
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _generations is None or _generations[0] != key:
+        try:
+            _generations = (
+                key,
+                json.loads(Path(settings.GENERATIONS_FILE).read_text()),
+            )
+        except (FileNotFoundError, json.JSONDecodeError):
+            # replaced since we stat-ed it, so we'll read it next time
+            return None
+
+    return _generations[1]
+
+
+def get_token(name: str) -> str | None:
+    """Return a token for the current generation of a workspace, or ROOT.
+
+    The token changes whenever the workspace changes. Returns None if the
+    watcher is not running.
+    """
+    generations = _read_generations()
+    if generations is None or time.time() - generations["heartbeat"] > STALE_AFTER:
+        return None
+    # the epoch changes each time the watcher starts, as it may have missed
+    # changes while it wasn't running
+    return f"{generations['epoch']}:{generations['generations'].get(name, 0)}"
+
+
+class GenerationCache:
+    """A small per-process LRU cache of values derived from a workspace's files.
+
+    Values are rebuilt when the workspace's generation changes, or every time
+    if the watcher is not running. Cached values are shared, and must not be
+    modified by callers.
+    """
+
+    def __init__(self, name: str, size: int):
+        # for metrics
+        self.name = name
+        self.size = size
+        # name -> (token, value), least recently used first
+        self._cache: OrderedDict[str, tuple[str, object]] = OrderedDict()
+
+    def get(self, name: str, build: Callable[[], object]):
+        token = get_token(name)
+        if token is None:
+            metrics.CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            return build()
+
+        cached = self._cache.pop(name, None)
+        if cached is not None and cached[0] == token:
+            metrics.CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+            value = cached[1]
+        else:
+            metrics.CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            value = build()
+
+        self._cache[name] = (token, value)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._cache.clear()
+
+
+class GenerationWriter:
+    """Used by the watcher to record and write out the generations."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        """Start a new epoch, which invalidates every cached value."""
+        self.epoch = uuid.uuid4().hex
+        self.generations: dict[str, int] = {}
+
+    def bump(self, name: str):
+        self.generations[name] = self.generations.get(name, 0) + 1
+
+    def write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "epoch": self.epoch,
+                    "heartbeat": time.time(),
+                    "generations": self.generations,
+                }
+            )
+        )
+        # replace, so readers never see a partial file
+        tmp_path.replace(self.path)
+
+
+# (directory, filename, mtime, size, inode) for each file in a metadata directory
+Fingerprint = tuple[tuple[str, str, int, int, int], ...]
+
+
+def _fingerprint(workspace_dir: Path) -> Fingerprint:
+    fingerprint = []
+    for dirpath, _, filenames in os.walk(workspace_dir / "metadata"):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except FileNotFoundError:
+                continue
+            fingerprint.append(
+                (dirpath, filename, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            )
+    return tuple(sorted(fingerprint))
+
+
+class PollingWatcher:
+    """Finds changes by re-scanning every workspace's metadata directory.
+
+    Used where inotify is not available. It's much more expensive than
+    inotify, but the cost is paid once, by the watcher, rather than by every
+    request.
+    """
+
+    def __init__(self, root: Path, interval: float):
+        self.root = root
+        self.interval = interval
+        self._fingerprints = self._scan()
+
+    def wait(self, timeout: float) -> set[str]:
+        """Wait for up to timeout seconds, and return the names that changed."""
+        time.sleep(min(self.interval, timeout))
+        fingerprints = self._scan()
+        changed = {
+            name
+            for name in fingerprints.keys() | self._fingerprints.keys()
+            if fingerprints.get(name) != self._fingerprints.get(name)
+        }
+        if fingerprints.keys() != self._fingerprints.keys():
+            changed.add(ROOT)
+        self._fingerprints = fingerprints
+        return changed
+
+    def _scan(self) -> dict[str, Fingerprint]:
+        fingerprints = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    fingerprints[entry.name] = _fingerprint(Path(entry.path))
+        return fingerprints
+
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# workspaces being added or removed
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+# a workspace's metadata directory being added or removed
+WORKSPACE_MASK = ROOT_MASK | IN_DELETE_SELF | IN_MOVE_SELF
+# anything in the metadata directory changing
+METADATA_MASK = WORKSPACE_MASK | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError(errno.ENOSYS, "inotify is not available")
+    return libc
+
+
+class InotifyWatcher:
+    """Finds changes using inotify, via libc.
+
+    inotify doesn't watch directories recursively, so we watch WORKSPACE_DIR,
+    each workspace directory, and everything in its metadata directory, adding
+    watches as directories are created.
+
+    If we hit the limit on inotify watches, workspaces we can't fully watch
+    are polled every poll_interval seconds instead, like PollingWatcher does.
+    """
+
+    def __init__(self, root: Path, poll_interval: float):
+        self.root = root
+        self.poll_interval = poll_interval
+        # workspace name -> fingerprint, for the workspaces we poll
+        self._polled: dict[str, Fingerprint] = {}
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise self._error()
+        # watch descriptor -> (workspace name, or ROOT, and directory)
+        self._watches: dict[int, tuple[str, Path]] = {}
+        try:
+            self._add_watch(ROOT, root, ROOT_MASK)
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        self._watch_workspace(entry.name)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        os.close(self._fd)
+
+    def wait(self, timeout: float) -> set[str]:
+        """Wait for up to timeout seconds, and return the names that changed."""
+        if self._polled:
+            timeout = min(timeout, self.poll_interval)
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        changed = self._poll()
+        if not readable:
+            return changed
+        # let a burst of events, like a job writing its outputs, arrive
+        time.sleep(0.1)
+
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            changed |= self._handle_events(data)
+
+    def _poll(self) -> set[str]:
+        changed: set[str] = set()
+        for name, fingerprint in list(self._polled.items()):
+            workspace_dir = self.root / name
+            if not workspace_dir.is_dir():
+                # removed, which the watch on the root will have seen
+                del self._polled[name]
+                continue
+            new_fingerprint = _fingerprint(workspace_dir)
+            if new_fingerprint != fingerprint:
+                self._polled[name] = new_fingerprint
+                changed.add(name)
+        return changed
+
+    def _handle_events(self, data: bytes) -> set[str]:
+        changed: set[str] = set()
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            child = data[pos : pos + length].rstrip(b"\0").decode()
+            pos += length
+
+            if mask & IN_Q_OVERFLOW:
+                # we've missed events, so we don't know what's changed
+                changed.add(ROOT)
+                changed.update(name for name, _ in self._watches.values())
+                continue
+
+            if mask & IN_IGNORED:
+                # the directory was removed
+                self._watches.pop(wd, None)
+                continue
+
+            if wd not in self._watches:  # pragma: no cover
+                # an event queued before its watch was removed
+                continue
+
+            name, directory = self._watches[wd]
+            created = mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR
+            if name == ROOT:
+                changed.add(ROOT)
+                changed.add(child)
+                if created:
+                    self._watch_workspace(child)
+            else:
+                changed.add(name)
+                if created:
+                    self._watch_metadata(name, directory / child)
+        return changed
+
+    def _watch_workspace(self, name: str):
+        workspace_dir = self.root / name
+        self._add_watch(name, workspace_dir, WORKSPACE_MASK)
+        self._watch_metadata(name, workspace_dir / "metadata")
+
+    def _watch_metadata(self, name: str, directory: Path):
+        if directory.parent == self.root / name and directory.name != "metadata":
+            # we only care about the metadata directory
+            return
+        for dirpath, _, _ in os.walk(directory):
+            self._add_watch(name, Path(dirpath), METADATA_MASK)
+
+    def _add_watch(self, name: str, directory: Path, mask: int):
+        wd = self._libc.inotify_add_watch(self._fd, bytes(directory), mask)
+        if wd < 0:
+            error = self._error()
+            if error.errno == errno.ENOENT:
+                # already removed again
+                return
+            if error.errno == errno.ENOSPC and name != ROOT:
+                # we've hit the limit on inotify watches
+                if name not in self._polled:
+                    logger.warning(
+                        f"Could not watch {directory} ({error}), polling {name}"
+                    )
+                    self._polled[name] = _fingerprint(self.root / name)
+                return
+            raise error
+        self._watches[wd] = (name, directory)
+
+    def _error(self) -> OSError:
+        code = ctypes.get_errno()
+        return OSError(code, os.strerror(code))
+
+
+def make_watcher(root: Path, poll_interval: float):
+    """Return an InotifyWatcher for root, or a PollingWatcher if we can't."""
+    try:
+        return InotifyWatcher(root, poll_interval)
+    except OSError as error:
+        # e.g. not on linux, or we've hit the limit on inotify watches
+        logger.warning(f"Could not use inotify ({error}), polling instead")
+        return PollingWatcher(root, poll_interval)
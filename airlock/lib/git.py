@@ -2,10 +2,15 @@
 Utility functions for interacting with git
 """
 
+import contextlib
+import json
 import logging
 import os
+import re
 import subprocess
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path, PurePath
 from subprocess import run as subprocess_run
 from urllib.parse import urlparse, urlunparse
@@ -35,22 +40,253 @@ def project_name_from_url(url):
     return name
 
 
+# Where we cache the file list for each commit, inside the local repo dir
+TREE_CACHE_DIR = "airlock-trees"
+# Where we cache highlighted code for each commit, inside the local repo dir
+HIGHLIGHT_CACHE_DIR = "airlock-highlight"
+
+
+def is_commit_sha(commit):
+    """Is this a full commit sha, rather than a branch name or abbreviation?
+
+    Only full shas are immutable, and safe to use in a filename.
+    """
+    return re.fullmatch(r"[0-9a-f]{40}|[0-9a-f]{64}", commit) is not None
+
+
 def list_files_from_repo(repo_url, commit_sha):
+    return get_repo_tree(repo_url, commit_sha)[0]
+
+
+# How many trees to keep in memory, per process
+TREE_MEMORY_CACHE_SIZE = 32
+
+# (repo_dir, commit_sha) -> (paths, child_map), least recently used first
+_repo_trees: OrderedDict = OrderedDict()
+# the prefetcher calls get_repo_tree from several threads
+_repo_trees_lock = threading.Lock()
+
+
+def get_repo_tree(repo_url, commit_sha):
+    """
+    Return (paths, child_map) for the files in `repo_url` as of `commit_sha`.
+
+    child_map maps each directory (with "." as the root) to a sorted list of
+    its immediate children, in the same format as Workspace.workspace_child_map,
+    so that we can find the children of a directory without scanning every path.
+
+    Commits are immutable, so this is cached on disk, keyed by the commit sha.
+    The most recently used trees are also kept in memory, so that browsing a
+    commit doesn't read and parse its whole tree on every request. The
+    returned values are shared between callers, and must not be modified.
+    """
+    repo_dir = get_local_repo_dir(repo_url)
+    # commit_sha comes from the url, so make sure it's safe to use in a filename
+    if not is_commit_sha(commit_sha):
+        return _build_repo_tree(repo_url, commit_sha)
+
+    key = (repo_dir, commit_sha)
+    with _repo_trees_lock:
+        tree = _repo_trees.pop(key, None)
+    if tree is None:
+        # may need to fetch the commit, so don't hold the lock while we do
+        tree = _read_cached_repo_tree(repo_url, repo_dir, commit_sha)
+    with _repo_trees_lock:
+        _repo_trees[key] = tree
+        while len(_repo_trees) > TREE_MEMORY_CACHE_SIZE:
+            _repo_trees.popitem(last=False)
+    return tree
+
+
+def _read_cached_repo_tree(repo_url, repo_dir, commit_sha):
+    cache_path = repo_dir / TREE_CACHE_DIR / f"{commit_sha}.json"
+    if cache_path.exists():
+        tree = json.loads(cache_path.read_text())
+        return [UrlPath(p) for p in tree["paths"]], tree["children"]
+
+    paths, child_map = _build_repo_tree(repo_url, commit_sha)
+
+    cache_path.parent.mkdir(exist_ok=True)
+    # write then rename, so other processes never read a partial file
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"paths": [str(p) for p in paths], "children": child_map})
+    )
+    tmp_path.replace(cache_path)
+
+    return paths, child_map
+
+
+def _build_repo_tree(repo_url, commit_sha):
+    paths = _list_files_from_repo(repo_url, commit_sha)
+
+    children = {}
+    for path in paths:
+        child = str(path)
+        for parent in path.parents:
+            children.setdefault(str(parent), set()).add(child)
+            child = str(parent)
+    child_map = {parent: sorted(c) for parent, c in children.items()}
+
+    return paths, child_map
+
+
+def _list_files_from_repo(repo_url, commit_sha):
     repo_dir = get_local_repo_dir(repo_url)
     try:
         ensure_commit_fetched(repo_dir, repo_url, commit_sha)
-        response = subprocess_run(
-            ["git", "ls-tree", "--name-only", "-r", commit_sha],
-            capture_output=True,
-            check=True,
-            cwd=repo_dir,
-        )
     except subprocess.SubprocessError:
         raise GitError(f"Error reading from {repo_url} @ {commit_sha}")
-    # return a list of UrlPaths
-    return [
-        UrlPath(line) for line in response.stdout.decode("utf8").strip().split("\n")
-    ]
+
+    batch = get_cat_file_batch(repo_dir)
+    # Equivalent to `git ls-tree --name-only -r`, but reading the trees from
+    # our long running cat-file process
+    paths = []
+    trees = [(UrlPath(), f"{commit_sha}^{{tree}}")]
+    while trees:
+        parent, tree = trees.pop()
+        obj = batch.read(tree)
+        if obj is None or obj[0] != "tree":
+            raise GitError(f"Error reading from {repo_url} @ {commit_sha}")
+        for mode, name, sha in _parse_tree(obj[1]):
+            if mode == b"40000":
+                trees.append((parent / name, sha))
+            else:
+                paths.append(parent / name)
+
+    # return a list of UrlPaths, in the same order as ls-tree
+    return sorted(paths, key=lambda p: str(p).encode("utf8"))
+
+
+def _parse_tree(data):
+    """Parse the binary format of a git tree object.
+
+    Each entry is `<mode> <name>\0<20 byte sha>`.
+    """
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        sha = data[nul + 1 : nul + 21].hex()
+        yield data[pos:space], data[space + 1 : nul].decode("utf8"), sha
+        pos = nul + 21
+
+
+# How long to keep an unused cat-file process around for
+CAT_FILE_IDLE_TIMEOUT = 60
+
+_cat_file_batches = {}
+_cat_file_batches_lock = threading.Lock()
+
+
+def get_cat_file_batch(repo_dir):
+    """Return the shared CatFileBatch for this repo_dir."""
+    with _cat_file_batches_lock:
+        batch = _cat_file_batches.get(repo_dir)
+        if batch is None:
+            batch = _cat_file_batches[repo_dir] = CatFileBatch(repo_dir)
+        return batch
+
+
+class CatFileBatch:
+    """
+    A long running `git cat-file --batch` process for a local repo.
+
+    Reading objects through this avoids starting a new git process for every
+    file and tree we read. Reads are serialised with a lock, so one process can
+    be shared between threads. The process is stopped after it has been idle
+    for `idle_timeout` seconds, and started again when next needed.
+    """
+
+    def __init__(self, repo_dir, idle_timeout=CAT_FILE_IDLE_TIMEOUT):
+        self.repo_dir = repo_dir
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._process = None
+        self._last_used = 0.0
+
+    def read(self, object_name):
+        """
+        Return (type, contents) for the named object, or None if it does not
+        exist. Object names can be anything `git cat-file` accepts, e.g.
+        `<commit>:<path>`.
+        """
+        if "\n" in object_name:
+            # cannot be sent in batch mode, and is not a valid path anyway
+            return None
+
+        with self._lock:
+            try:
+                return self._read(object_name)
+            except (OSError, ValueError) as e:
+                # the process has died or got out of sync, so start afresh
+                # next time
+                self._stop()
+                raise GitError(f"Error reading {object_name} from {self.repo_dir}: {e}")
+            finally:
+                self._last_used = time.monotonic()
+
+    def _read(self, object_name):
+        if self._process is not None and self._process.poll() is not None:
+            self._stop()
+        if self._process is None:
+            self._start()
+
+        self._process.stdin.write(object_name.encode("utf8") + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline()
+        if not header:
+            raise ValueError("unexpected end of output")
+
+        # `<sha> <type> <size>`, or `<name> missing` (or `ambiguous`), where
+        # the name may contain spaces
+        header = header.rstrip(b"\n")
+        if header.endswith((b" missing", b" ambiguous")):
+            return None
+
+        _, object_type, size = header.rsplit(b" ", 2)
+        contents = self._process.stdout.read(int(size))
+        # each object's contents is followed by a newline
+        self._process.stdout.read(1)
+        return object_type.decode(), contents
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.repo_dir,
+        )
+        # one thread for the life of the process, which stops it once idle
+        threading.Thread(
+            target=self._stop_when_idle,
+            args=(self._process,),
+            name="cat-file-reaper",
+            daemon=True,
+        ).start()
+
+    def _stop_when_idle(self, process):
+        while True:
+            with self._lock:
+                if self._process is not process:
+                    # already stopped, and possibly restarted with its own reaper
+                    return
+                idle = time.monotonic() - self._last_used
+                if idle >= self.idle_timeout:
+                    self._stop()
+                    return
+            time.sleep(self.idle_timeout - idle)
+
+    def _stop(self):
+        if self._process is not None:
+            # closing stdin tells git to exit, but it may have already died
+            with contextlib.suppress(OSError):
+                self._process.stdin.close()
+            self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
 
 
 ### end of airlock changes
@@ -94,6 +330,14 @@ def read_file_from_repo(repo_url, commit_sha, path):
     """
     repo_dir = get_local_repo_dir(repo_url)
     ensure_commit_fetched(repo_dir, repo_url, commit_sha)
+    ### airlock change: read blobs from a long running cat-file process
+    obj = get_cat_file_batch(repo_dir).read(f"{commit_sha}:{path}")
+    if obj is None:
+        raise GitFileNotFoundError(f"File '{path}' not found in repository")
+    object_type, contents = obj
+    if object_type == "blob":
+        return contents
+    ### end airlock change
     try:
         response = subprocess_run(
             ["git", "show", f"{commit_sha}:{path}"],
@@ -228,13 +472,33 @@ def get_local_repo_dir(repo_url):
     return config.GIT_REPO_DIR / Path(repo_name).with_suffix(".git")
 
 
+### airlock change: commits are immutable, so once we've seen that a commit has
+# been fetched, we don't need to keep checking. We only remember the most
+# recently seen commits, so that a long running process doesn't grow forever.
+FETCHED_COMMITS_CACHE_SIZE = 1024
+_fetched_commits: OrderedDict = OrderedDict()
+_fetched_commits_lock = threading.Lock()
+
+
+def _mark_commit_fetched(repo_dir, commit_sha):
+    with _fetched_commits_lock:
+        _fetched_commits[(repo_dir, commit_sha)] = True
+        while len(_fetched_commits) > FETCHED_COMMITS_CACHE_SIZE:
+            _fetched_commits.popitem(last=False)
+
+
 def ensure_commit_fetched(repo_dir, repo_url, commit_sha):
+    with _fetched_commits_lock:
+        if (repo_dir, commit_sha) in _fetched_commits:
+            _fetched_commits.move_to_end((repo_dir, commit_sha))
+            return
     ensure_git_init(repo_dir)
     # It's safe to keep re-fetching the same commit, but it requires
     # talking to the remote repo every time so it's better to avoid it if
     # we can
     if not commit_already_fetched(repo_dir, commit_sha):
         fetch_commit(repo_dir, repo_url, commit_sha)
+    _mark_commit_fetched(repo_dir, commit_sha)
 
 
 def ensure_git_init(repo_dir):
@@ -0,0 +1,170 @@
+import argparse
+import json
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from airlock.lib.git import get_repo_tree
+from services.tracing import instrument
+
+
+logger = logging.getLogger(__name__)
+
+# The longest we wait before retrying a commit that could not be fetched
+MAX_RETRY_DELAY = 60 * 60
+
+
+class Command(BaseCommand):
+    """
+    Watch workspace manifests for new commits, and fetch them into the local
+    repos in GIT_REPO_DIR ahead of anyone viewing their code.
+
+    Without this, the first view of a commit's code has to fetch it from
+    GitHub during the request.
+    """
+
+    def add_arguments(self, parser):
+        # In production, we want this check to run forever. Using a
+        # function means that we can test it on a finite number of loops.
+        parser.add_argument("--run-fn", default=lambda: True, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        run_fn = options["run_fn"]
+
+        logger.warning("Code prefetcher started: watching for new commits")
+
+        scanner = ManifestScanner()
+        # commits we have already fetched
+        done: set[tuple[str, str]] = set()
+        failed = FailedCommits(settings.CODE_PREFETCH_DELAY)
+
+        with ThreadPoolExecutor(
+            max_workers=settings.CODE_PREFETCH_CONCURRENCY
+        ) as executor:
+            while run_fn():  # pragma: no branch
+                new_commits = scanner.scan() - done - failed.waiting(time.monotonic())
+                # Fetches into the same local repo would contend for its lock
+                # files, so each repo's commits are fetched one at a time, and
+                # only different repos are fetched concurrently
+                by_repo: dict[str, list[str]] = defaultdict(list)
+                for repo, commit in sorted(new_commits):
+                    by_repo[repo].append(commit)
+
+                # wait for this batch to finish, which bounds the number of
+                # fetches in flight to the size of the pool
+                results = executor.map(
+                    prefetch_repo_commits, by_repo.keys(), by_repo.values()
+                )
+                for repo, fetched in zip(by_repo, results):
+                    for commit, ok in fetched.items():
+                        if ok:
+                            done.add((repo, commit))
+                            failed.remove((repo, commit))
+                        else:
+                            failed.add((repo, commit), time.monotonic())
+
+                time.sleep(settings.CODE_PREFETCH_DELAY)
+
+
+class FailedCommits:
+    """Track commits that could not be fetched, and when to next retry them.
+
+    The delay before retrying starts at `delay`, and doubles with each failure,
+    up to MAX_RETRY_DELAY, so that commits which will never be fetchable (e.g.
+    from a deleted repo) don't cost a fetch on every loop.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        # (repo, commit) -> (failures, retry after)
+        self._failures: dict[tuple[str, str], tuple[int, float]] = {}
+
+    def add(self, repo_commit: tuple[str, str], now: float):
+        failures = self._failures.get(repo_commit, (0, 0.0))[0] + 1
+        delay = min(self.delay * 2 ** (failures - 1), MAX_RETRY_DELAY)
+        self._failures[repo_commit] = (failures, now + delay)
+
+    def remove(self, repo_commit: tuple[str, str]):
+        self._failures.pop(repo_commit, None)
+
+    def waiting(self, now: float) -> set[tuple[str, str]]:
+        """The commits that should not be retried yet."""
+        return {
+            repo_commit
+            for repo_commit, (_, retry_after) in self._failures.items()
+            if retry_after > now
+        }
+
+
+class ManifestScanner:
+    """Find the (repo, commit) pairs referenced by workspace manifests.
+
+    Manifests are only re-read if they have changed since the last scan.
+    """
+
+    def __init__(self):
+        # manifest path -> ((mtime, size), commits)
+        self._manifests: dict[Path, tuple[tuple[int, int], set[tuple[str, str]]]] = {}
+
+    def scan(self) -> set[tuple[str, str]]:
+        manifests = {}
+        for manifest_path in settings.WORKSPACE_DIR.glob("*/metadata/manifest.json"):
+            try:
+                stat = manifest_path.stat()
+            except FileNotFoundError:  # pragma: no cover
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            previous = self._manifests.get(manifest_path)
+            if previous and previous[0] == key:
+                manifests[manifest_path] = previous
+            else:
+                manifests[manifest_path] = (key, get_manifest_commits(manifest_path))
+
+        # drops any manifests that have been removed
+        self._manifests = manifests
+        return {commit for _, commits in manifests.values() for commit in commits}
+
+
+def get_manifest_commits(manifest_path) -> set[tuple[str, str]]:
+    try:
+        manifest = json.loads(manifest_path.read_bytes())
+        outputs = manifest["outputs"].values()
+    except (OSError, ValueError, KeyError, AttributeError):
+        # Possibly part way through being written; we'll try again when it
+        # next changes
+        logger.warning("Could not read manifest %s", manifest_path)
+        return set()
+
+    return {
+        (output["repo"], output["commit"])
+        for output in outputs
+        if isinstance(output, dict) and output.get("repo") and output.get("commit")
+    }
+
+
+def prefetch_repo_commits(repo: str, commits: list[str]) -> dict[str, bool]:
+    """Fetch each of a repo's commits in turn, and return which succeeded."""
+    return {commit: prefetch_commit(repo, commit) for commit in commits}
+
+
+@instrument(func_attributes={"repo": "repo", "commit": "commit"})
+def prefetch_commit(repo: str, commit: str) -> bool:
+    """Fetch a commit and cache its file tree.
+
+    Returns False if it could not be fetched and should be retried later.
+    """
+    try:
+        get_repo_tree(repo, commit)
+    except Exception as error:
+        # Most likely a GitError, but we catch anything so that one bad commit
+        # doesn't stop the prefetcher
+        logger.error("Could not prefetch %s @ %s: %s", repo, commit, error)
+        return False
+
+    logger.info("Prefetched %s @ %s", repo, commit)
+    return True
@@ -8,9 +8,11 @@ from django.core.management.base import BaseCommand
 from opentelemetry import trace
 
 import old_api
+from airlock import metrics
 from airlock.business_logic import bll
 from airlock.enums import RequestStatus
 from airlock.types import UrlPath
+from services.profiling import profile
 from services.tracing import instrument
 from users.models import User
 
@@ -49,6 +51,7 @@ class Command(BaseCommand):
             if not approved_requests:
                 # No pending file uploads found; wait for UPLOAD_DELAY seconds
                 # before checking again
+                metrics.flush()
                 time.sleep(settings.UPLOAD_DELAY)
                 continue
 
@@ -71,6 +74,8 @@ class Command(BaseCommand):
                     file_for_upload = bll.register_file_upload_attempt(
                         approved_request, file_for_upload.relpath
                     )
+                    if file_for_upload.upload_attempts > 1:
+                        metrics.FILE_UPLOAD_RETRIES.inc()
 
                     with tracer.start_as_current_span(
                         "file_uploader",
@@ -83,9 +88,17 @@ class Command(BaseCommand):
                             "user_id": file_for_upload.released_by.user_id,
                         },
                     ) as span:
+                        start = time.perf_counter()
                         try:
-                            do_upload_task(file_for_upload, approved_request)
+                            with profile(
+                                "file_uploader",
+                                settings.PROFILE_THRESHOLD,
+                                settings.PROFILE_DIR,
+                                settings.PROFILE_INTERVAL,
+                            ):
+                                do_upload_task(file_for_upload, approved_request)
                         except Exception as error:
+                            metrics.FILE_UPLOADS.inc(outcome="error")
                             # The most likely error here is old_api.FileUploadError, however
                             # we catch any unexpected exception here so we don't stop the task runner
                             # from running
@@ -98,12 +111,19 @@ class Command(BaseCommand):
                                 file_for_upload.upload_attempts,
                                 str(error),
                             )
+                        else:
+                            metrics.FILE_UPLOADS.inc(outcome="success")
+                        metrics.FILE_UPLOAD_DURATION.observe(
+                            time.perf_counter() - start
+                        )
 
                 # After we've tried to upload all files for this request, check if
                 # there are any still pending and set the request status now, so it's
                 # done as soon as possible and doesn't have to wait on the next loop
                 get_upload_files_and_update_request_status(approved_request)
 
+            metrics.flush()
+
 
 @instrument
 def do_upload_task(file_for_upload, release_request):
@@ -0,0 +1,45 @@
+import argparse
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from airlock.lib import generations
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Watch WORKSPACE_DIR for changes, and record each workspace's change
+    generation in GENERATIONS_FILE, so that workers can cheaply check whether
+    what they have cached from a workspace's files is still fresh.
+
+    See airlock.lib.generations.
+    """
+
+    def add_arguments(self, parser):
+        # In production, we want this to run forever. Using a function means
+        # that we can test it on a finite number of loops.
+        parser.add_argument("--run-fn", default=lambda: True, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        run_fn = options["run_fn"]
+
+        watcher = generations.make_watcher(
+            settings.WORKSPACE_DIR, settings.WORKSPACE_WATCHER_POLL_INTERVAL
+        )
+        writer = generations.GenerationWriter(settings.GENERATIONS_FILE)
+        writer.write()
+        logger.warning(
+            "Workspace watcher started: %s, using %s",
+            settings.WORKSPACE_DIR,
+            type(watcher).__name__,
+        )
+
+        while run_fn():  # pragma: no branch
+            for name in watcher.wait(timeout=generations.HEARTBEAT_INTERVAL):
+                writer.bump(name)
+            # written even if nothing changed, as a heartbeat
+            writer.write()
@@ -0,0 +1,110 @@
+"""
+Airlock's metrics, which Prometheus can scrape from /metrics/.
+
+See services/metrics.py for how they are shared between processes.
+"""
+
+import time
+
+from django.conf import settings
+
+from airlock.enums import RequestStatus
+from services.metrics import REGISTRY, Counter, Histogram
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "airlock_http_request_duration_seconds",
+    "Time taken to respond to requests, by view and response status.",
+    labels=("view", "status"),
+)
+OUTBOUND_HTTP_REQUEST_DURATION = Histogram(
+    "airlock_outbound_http_request_duration_seconds",
+    "Time taken by calls to job-server, including any retries, by response "
+    "status, or 'error' if there was no response.",
+    labels=("status",),
+)
+FILE_UPLOADS = Counter(
+    "airlock_file_uploads_total",
+    "Files uploaded to job-server, by outcome.",
+    labels=("outcome",),
+)
+FILE_UPLOAD_DURATION = Histogram(
+    "airlock_file_upload_duration_seconds",
+    "Time taken to upload files to job-server.",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+FILE_UPLOAD_RETRIES = Counter(
+    "airlock_file_upload_retries_total",
+    "Upload attempts for files whose first attempt failed.",
+)
+REQUEST_STATUS_CHANGES = Counter(
+    "airlock_request_status_changes_total",
+    "Release requests moved into each status.",
+    labels=("status",),
+)
+FILE_RENDERS = Counter(
+    "airlock_file_renders_total",
+    "File contents served, by renderer, and whether they were rendered or "
+    "the browser's copy was still valid.",
+    labels=("renderer", "result"),
+)
+FILE_RENDER_DURATION = Histogram(
+    "airlock_file_render_duration_seconds",
+    "Time taken to render file contents, by renderer.",
+    labels=("renderer",),
+)
+CACHE_LOOKUPS = Counter(
+    "airlock_cache_lookups_total",
+    "Lookups in Airlock's caches, by cache and whether they hit.",
+    labels=("cache", "result"),
+)
+
+
+# when this process last wrote its metrics
+_last_flush: float | None = None
+
+
+def flush():
+    """Write this process's metrics, for the metrics endpoint to read."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    REGISTRY.flush(settings.METRICS_DIR)
+
+
+def maybe_flush():
+    """Flush, if we haven't for METRICS_FLUSH_INTERVAL seconds."""
+    if (
+        _last_flush is None
+        or time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+    ):
+        flush()
+
+
+def expose() -> str:
+    # this writes our own metrics first, so they are up to date
+    return REGISTRY.expose(settings.METRICS_DIR)
+
+
+def collect_release_requests():
+    # avoid a circular import, as the bll records metrics
+    from airlock.business_logic import bll
+
+    counts = bll.get_request_status_counts()
+    yield (
+        "airlock_release_requests",
+        "Release requests in each status.",
+        "gauge",
+        [
+            ("airlock_release_requests", {"status": status.name}, counts.get(status, 0))
+            for status in RequestStatus
+        ],
+    )
+    yield (
+        "airlock_file_upload_queue_depth",
+        "Released files waiting to be uploaded to job-server.",
+        "gauge",
+        [("airlock_file_upload_queue_depth", {}, bll.get_pending_upload_count())],
+    )
+
+
+REGISTRY.register_collector(collect_release_requests)
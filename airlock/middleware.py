@@ -1,18 +1,63 @@
+import heapq
 import logging
+import re
+import time
+from collections import Counter
 from typing import cast
 from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib import auth
+from django.db import connection
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.views.defaults import server_error
 from opentelemetry import trace
 
+from airlock import metrics
 from airlock.exceptions import RequestTimeout
+from services import memory
+from services.profiling import profile
 from users.auth import Level4AuthenticationBackend
 
 
+class SessionRefreshMiddleware:
+    """Periodically extend the expiry of the user's session.
+
+    Django can extend the session expiry on every request with
+    SESSION_SAVE_EVERY_REQUEST, but that writes the session to the db on every
+    request, including each file content load and htmx poll. Instead, we only
+    save an otherwise unchanged session once SESSION_REFRESH_INTERVAL has
+    passed since it was last saved.
+
+    This must come after SessionMiddleware, so that the session is saved after
+    we have marked it as modified.
+    """
+
+    REFRESHED_AT = "_session_refreshed_at"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = request.session
+        # empty sessions are not saved by Django
+        if not session.is_empty():
+            refreshed_at = session.get(self.REFRESHED_AT, 0)
+            if (
+                session.modified
+                or time.time() - refreshed_at > settings.SESSION_REFRESH_INTERVAL
+            ):
+                # marks the session as modified, so Django saves it with a new
+                # expiry date
+                session[self.REFRESHED_AT] = time.time()
+
+        return response
+
+
 class UserMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -28,17 +73,25 @@ class UserMiddleware:
 
         We refresh user data from job-server periodically, and also record some
         telemetry.
+
+        Recently expired user data is still used for this request while we
+        refresh it in the background, so that the user doesn't have to wait for
+        job-server. Once it is older than AIRLOCK_AUTHZ_HARD_TIMEOUT, we wait
+        for the refresh.
         """
         span = trace.get_current_span()
 
         if request.user.is_authenticated:
             span.set_attribute("username", request.user.username)
             span.set_attribute("user_id", request.user.user_id)
-            if self.backend.needs_refresh(request.user):
+            if self.backend.must_refresh(request.user):
                 span.set_attribute("auth_refresh", True)
                 user = self.backend.refresh(request)
                 if user:  # refresh may have failed for some reason
                     request.user = user
+            elif self.backend.needs_refresh(request.user):
+                span.set_attribute("auth_refresh_background", True)
+                self.backend.refresh_in_background(request.user)
         else:
             span.set_attribute("username", "anonymous")
             span.set_attribute("user_id", "anonymous")
@@ -84,3 +137,166 @@ class TimeoutExceptionMiddleware:
         return HttpResponse(
             default_response.content, status=504, content_type="text/html"
         )
+
+
+# Collapses the placeholders in an IN clause, so that queries that differ only
+# in the number of values have the same shape
+IN_PLACEHOLDERS = re.compile(r"\(%s(?:, %s)*\)")
+# Truncate statements longer than this when we add them to spans
+MAX_STATEMENT_LENGTH = 500
+
+
+class QueryRecorder:
+    """A database execute wrapper which records the queries run through it."""
+
+    def __init__(self, slowest: int):
+        self.count = 0
+        self.duration = 0.0
+        self._max_slowest = slowest
+        # min heap of (duration, sql), so the fastest is first
+        self._slowest: list[tuple[float, str]] = []
+        self.shapes: Counter[str] = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if len(self._slowest) < self._max_slowest:
+            heapq.heappush(self._slowest, (duration, sql))
+        elif self._max_slowest:
+            heapq.heappushpop(self._slowest, (duration, sql))
+        self.shapes[IN_PLACEHOLDERS.sub("(...)", sql)] += 1
+
+    def slowest(self) -> list[tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Return the shapes of the queries run at least threshold times."""
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryTracingMiddleware:
+    """Record the number and duration of each request's database queries.
+
+    These are added to the request's span, along with its slowest queries,
+    and any repeated queries, which usually mean we're loading something
+    lazily per item (i.e. an N+1 query).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(settings.QUERY_TRACING_SLOWEST)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        span = trace.get_current_span()
+        span.set_attribute("db.query_count", recorder.count)
+        span.set_attribute("db.duration_ms", recorder.duration * 1000)
+        if slowest := recorder.slowest():
+            span.set_attribute(
+                "db.slowest_queries",
+                [
+                    f"{duration * 1000:.2f}ms {sql[:MAX_STATEMENT_LENGTH]}"
+                    for duration, sql in slowest
+                ],
+            )
+
+        threshold = settings.QUERY_REPEAT_THRESHOLD
+        if threshold and (repeated := recorder.repeated(threshold)):
+            span.set_attribute("db.repeated_query", True)
+            span.set_attribute(
+                "db.repeated_queries",
+                [
+                    f"{count}x {shape[:MAX_STATEMENT_LENGTH]}"
+                    for shape, count in repeated
+                ],
+            )
+
+        return response
+
+
+class ProfilingMiddleware:
+    """Save a profile of requests slower than PROFILE_THRESHOLD, if it's set.
+
+    See services/profiling.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile(
+            f"{request.method} {request.path}",
+            settings.PROFILE_THRESHOLD,
+            settings.PROFILE_DIR,
+            settings.PROFILE_INTERVAL,
+        ):
+            return self.get_response(request)
+
+
+class MemoryTracingMiddleware:
+    """Record each request's memory use on its span, if MEMORY_TRACING is set.
+
+    Also periodically writes snapshots of the top allocators, if
+    MEMORY_SNAPSHOT_INTERVAL is set. See services/memory.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.snapshotter = None
+
+    def __call__(self, request):
+        if not settings.MEMORY_TRACING:
+            return self.get_response(request)
+
+        with memory.measure() as usage:
+            response = self.get_response(request)
+
+        span = trace.get_current_span()
+        span.set_attributes(usage.attributes())
+        if request.resolver_match:
+            span.set_attribute("memory.view", request.resolver_match.view_name)
+
+        if settings.MEMORY_SNAPSHOT_INTERVAL:
+            if self.snapshotter is None:
+                self.snapshotter = memory.Snapshotter(
+                    settings.MEMORY_SNAPSHOT_DIR, settings.MEMORY_SNAPSHOT_INTERVAL
+                )
+            self.snapshotter.maybe_snapshot()
+
+        return response
+
+
+class MetricsMiddleware:
+    """Record how long each view takes, and periodically write out this
+    process's metrics.
+
+    See airlock/metrics.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            view=match.view_name if match else "unknown",
+            status=response.status_code,
+        )
+        metrics.maybe_flush()
+        return response
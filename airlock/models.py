@@ -26,9 +26,13 @@ from airlock.enums import (
     Visibility,
     WorkspaceFileStatus,
 )
+from airlock.lib.generations import GenerationCache
 from airlock.lib.git import (
+    HIGHLIGHT_CACHE_DIR,
     GitError,
-    list_files_from_repo,
+    get_local_repo_dir,
+    get_repo_tree,
+    is_commit_sha,
     project_name_from_url,
     read_file_from_repo,
 )
@@ -148,6 +152,16 @@ class Project:
     is_ongoing: bool
     orgs: tuple[str, ...]
 
+    @classmethod
+    def from_metadata(cls, metadata: dict[str, Any]) -> Self:
+        """Build from a workspace's metadata from the job-server api."""
+        details = metadata.get("project_details", {})
+        return cls(
+            name=details.get("name", "Unknown project"),
+            is_ongoing=details.get("ongoing", True),
+            orgs=tuple(details.get("orgs", ())),
+        )
+
     def display_name(self):
         # helper for templates
         if not self.is_ongoing:
@@ -161,22 +175,46 @@ class Project:
 
 @dataclass(frozen=True, order=True)
 class WorkspaceListing:
-    """Lightweight workspace representation for the all-workspaces listing page.
+    """Lightweight workspace representation for the workspace listing pages.
 
     Avoids reading manifest.json, computing hashes, building file trees, or
     making database queries. Provides the same interface as Workspace for the
-    methods used by the all_workspaces_results.html template.
+    methods used by the all_workspaces_results.html and workspaces.html
+    templates. The project and archived status come from the user's workspace
+    metadata, if we have it.
     """
 
     name: str
+    project: Project = field(default=Project.from_metadata({}), compare=False)
+    archived: bool = field(default=False, compare=False)
+
+    @classmethod
+    def from_metadata(cls, name: str, metadata: dict[str, Any]) -> Self:
+        return cls(
+            name=name,
+            project=Project.from_metadata(metadata),
+            archived=bool(metadata.get("archived")),
+        )
 
     def get_url(self) -> str:
         return reverse("workspace_view", kwargs={"workspace_name": self.name})
 
+    def is_archived(self) -> bool:
+        return self.archived
+
     def display_name(self) -> str:
+        # helper for templates
+        if self.archived:
+            return f"{self.name} (ARCHIVED)"
         return self.name
 
 
+# Per-process caches of what we read from each workspace's metadata directory,
+# which are kept until the workspace changes. See airlock.lib.generations.
+_manifests = GenerationCache("manifest", size=32)
+_metadata_paths = GenerationCache("metadata_paths", size=32)
+
+
 @dataclass(order=True)
 class Workspace:
     """Simple wrapper around a workspace directory on disk.
@@ -230,7 +268,36 @@ class Workspace:
         if not root.exists():
             raise exceptions.WorkspaceNotFound(name)
 
-        manifest_path = root / "metadata/manifest.json"
+        manifest_hash, manifest = _manifests.get(name, lambda: cls.read_manifest(name))
+
+        if metadata is None:  # pragma: no cover
+            metadata = {}
+
+        valid_paths, out_of_date_action_count = (
+            cls.get_valid_filepaths_from_manifest_outputs(
+                manifest["outputs"],
+                include_out_of_date_action_outputs=include_out_of_date_action_outputs,
+            )
+        )
+
+        return cls(
+            name,
+            manifest=manifest,
+            metadata=metadata,
+            valid_paths=sorted(valid_paths),
+            current_request=current_request,
+            released_files=released_files or set(),
+            manifest_hash=manifest_hash,
+            out_of_date_action_count=out_of_date_action_count,
+        )
+
+    def __str__(self):
+        return self.get_id()
+
+    @staticmethod
+    def read_manifest(name) -> tuple[str, dict[str, Any]]:
+        """Return the hash and contents of a workspace's manifest file."""
+        manifest_path = settings.WORKSPACE_DIR / name / "metadata/manifest.json"
         if not manifest_path.exists():
             raise exceptions.ManifestFileError(f"{manifest_path} does not exist")
 
@@ -244,9 +311,6 @@ class Workspace:
                 f"Could not parse manifest.json file: {manifest_path}:\n{exc}"
             )
 
-        if metadata is None:  # pragma: no cover
-            metadata = {}
-
         if "outputs" not in manifest:
             # A manifest file should always have an outputs entry, but it's possible some
             # old workspaces may not; add a default and record the exception
@@ -258,29 +322,18 @@ class Workspace:
                 )
             )
 
-        valid_paths, out_of_date_action_count = (
-            cls.get_valid_filepaths_from_manifest_outputs(
-                manifest["outputs"],
-                include_out_of_date_action_outputs=include_out_of_date_action_outputs,
-            )
-        )
+        return manifest_hash, manifest
 
-        return cls(
-            name,
-            manifest=manifest,
-            metadata=metadata,
-            valid_paths=sorted(valid_paths),
-            current_request=current_request,
-            released_files=released_files or set(),
-            manifest_hash=manifest_hash,
-            out_of_date_action_count=out_of_date_action_count,
-        )
+    @staticmethod
+    def scan_metadata_dir(name):
+        """Return the paths of the files in a workspace's metadata directory.
 
-    def __str__(self):
-        return self.get_id()
+        Cached until the workspace changes, if the workspace watcher is running.
+        """
+        return _metadata_paths.get(name, lambda: Workspace._scan_metadata_dir(name))
 
     @staticmethod
-    def scan_metadata_dir(name):
+    def _scan_metadata_dir(name):
         """Use os.scandir to quickly walk the metadata directory file tree.
 
         Basically, its faster because it effectively just opens every directory,
@@ -373,12 +426,7 @@ class Workspace:
 
     @property
     def project(self) -> Project:
-        details = self.metadata.get("project_details", {})
-        return Project(
-            name=details.get("name", "Unknown project"),
-            is_ongoing=details.get("ongoing", True),
-            orgs=tuple(details.get("orgs", ())),
-        )
+        return Project.from_metadata(self.metadata)
 
     def is_archived(self):
         return self.metadata.get("archived")
@@ -540,6 +588,8 @@ class CodeRepo:
     commit: str
     directory: Path
     pathlist: list[UrlPath]
+    # directory path (with "." as the root) -> sorted list of its children
+    child_map: dict[str, list[str]]
 
     class RepoNotFound(Exception):
         pass
@@ -557,7 +607,7 @@ class CodeRepo:
             )
 
         try:
-            pathlist = list_files_from_repo(repo, commit)
+            pathlist, child_map = get_repo_tree(repo, commit)
         except GitError as exc:
             raise CodeRepo.CommitNotFound(str(exc))
 
@@ -568,6 +618,7 @@ class CodeRepo:
             commit=commit,
             directory=settings.GIT_REPO_DIR / workspace.name,
             pathlist=pathlist,
+            child_map=child_map,
         )
 
     def get_id(self) -> str:
@@ -625,12 +676,26 @@ class CodeRepo:
         # note: we don't actually need an explicit cache_id here, as the commit is
         # already in the url. But we want to add the template version to the
         # cache id, so pass an empty string.
-        return renderer_class.from_contents(
+        renderer = renderer_class.from_contents(
             contents=contents,
             relpath=relpath,
             cache_id="",
         )
 
+        # Branch names and abbreviated shas could point at different code later
+        if isinstance(renderer, renderers.CodeRenderer) and is_commit_sha(self.commit):
+            key = hashlib.sha256(
+                f"{relpath}:{renderers.HIGHLIGHTER_VERSION}".encode()
+            ).hexdigest()
+            renderer.highlight_cache = (
+                get_local_repo_dir(self.repo)
+                / HIGHLIGHT_CACHE_DIR
+                / self.commit
+                / f"{key}.html"
+            )
+
+        return renderer
+
     def get_file_metadata(self, relpath: UrlPath) -> FileMetadata | None:
         """Get the size of a file"""
         return None  # pragma: no cover
@@ -856,6 +921,8 @@ class ReleaseRequest:
     submitted_reviews: dict[str, str] = field(default_factory=dict)
     turn_reviewers: set[str] = field(default_factory=set)
     review_turn: int = 0
+    # increases whenever the request changes
+    version: int = 0
 
     @classmethod
     def from_dict(cls, attrs) -> Self:
@@ -3,10 +3,13 @@ import logging
 import requests
 from django.conf import settings
 
+from services import http
+
 
 logger = logging.getLogger(__name__)
 
-session = requests.Session()
+# seconds to wait for job-server to respond
+NOTIFICATION_TIMEOUT = 10
 
 
 def send_notification_event(event_json: str, username: str):
@@ -16,16 +19,21 @@ def send_notification_event(event_json: str, username: str):
         # local dev server in isolation
         logger.info("Would send notification: %s", event_json)
         return {"status": "ok"}
-    response = session.post(
-        url=f"{settings.AIRLOCK_API_ENDPOINT}/airlock/events/",
-        data=event_json,
-        headers={
-            "OS-User": username,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": settings.AIRLOCK_API_TOKEN,
-        },
-    )
+    try:
+        # Not retried, as sending an event twice could notify users twice
+        response = http.post(
+            url=f"{settings.AIRLOCK_API_ENDPOINT}/airlock/events/",
+            timeout=NOTIFICATION_TIMEOUT,
+            data=event_json,
+            headers={
+                "OS-User": username,
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Authorization": settings.AIRLOCK_API_TOKEN,
+            },
+        )
+    except (requests.ConnectionError, requests.Timeout) as exc:
+        return {"status": "error", "message": f"Error sending notification: {exc}"}
 
     # We expect to get a 201 back from job-server, even if it encountered an error in
     # processing the notification. If we get anything else, return it in the expected
@@ -4,7 +4,9 @@ import base64
 import csv
 import hashlib
 import mimetypes
+import os
 import re
+import time
 from dataclasses import dataclass
 from email.utils import formatdate
 from io import BytesIO, StringIO
@@ -20,8 +22,14 @@ from django.conf import settings
 from django.http import FileResponse, HttpResponseBase
 from django.template import loader
 from django.template.response import SimpleTemplateResponse
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
+from pygments import __version__ as pygments_version
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
 
+from airlock import metrics
 from airlock.types import UrlPath
 from airlock.utils import is_valid_file_type, summarize_csv, truncate_log_stream
 
@@ -29,6 +37,16 @@ from airlock.utils import is_valid_file_type, summarize_csv, truncate_log_stream
 # Marker for start of job summary written to the end of the job log files
 JOB_LOG_MARKER = "=============JOB SUMMARY============="
 
+# Part of the cache key for highlighted code. Bump the suffix if we change how
+# we highlight code, so that previously cached html is not used.
+HIGHLIGHTER_VERSION = f"pygments{pygments_version}-1"
+
+# Highlighting is slow for very large files, which we just show as plain text.
+# We've already decoded the file, so this is measured in characters.
+MAX_HIGHLIGHT_CHARS = 1_000_000
+
+HIGHLIGHT_CSS: str = HtmlFormatter().get_style_defs(".highlight")
+
 
 @dataclass
 class RendererTemplate:
@@ -104,11 +122,15 @@ class Renderer:
 
     def get_response(self):
         if self.template:
+            start = time.perf_counter()
             context = self.context()
             context.setdefault("filename", self.filename)
             response: HttpResponseBase = SimpleTemplateResponse(
                 self.template.template, context
             )
+            metrics.FILE_RENDER_DURATION.observe(
+                time.perf_counter() - start, renderer=type(self).__name__
+            )
         else:
             response = FileResponse(self.stream, filename=self.filename)
 
@@ -176,6 +198,49 @@ class TextRenderer(Renderer):
         }
 
 
+@dataclass
+class CodeRenderer(TextRenderer):
+    """
+    Render source code with server-side syntax highlighting.
+
+    Code at a given commit never changes, so the highlighted html can be
+    cached on disk by setting highlight_cache to a path unique to the commit,
+    path and HIGHLIGHTER_VERSION.
+    """
+
+    template = RendererTemplate("file_browser/file_content/code.html")
+
+    highlight_cache: Path | None = None
+
+    def context(self):
+        return {
+            "code": self.highlighted(),
+            "class": Path(self.filename).suffix.lstrip("."),
+            "highlight_css": mark_safe(HIGHLIGHT_CSS),
+        }
+
+    def highlighted(self) -> str:
+        if self.highlight_cache and self.highlight_cache.exists():
+            metrics.CACHE_LOOKUPS.inc(cache="highlighted_code", result="hit")
+            return mark_safe(self.highlight_cache.read_text())
+        metrics.CACHE_LOOKUPS.inc(cache="highlighted_code", result="miss")
+
+        html = highlight_code(self.stream.read(), self.filename)
+
+        if self.highlight_cache:
+            self.highlight_cache.parent.mkdir(parents=True, exist_ok=True)
+            # write then rename, so other processes never read a partial file
+            tmp_path = self.highlight_cache.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(html)
+            tmp_path.replace(self.highlight_cache)
+
+        return mark_safe(html)
+
+    @property
+    def cache_id(self):
+        return f"{super().cache_id}-{HIGHLIGHTER_VERSION}"
+
+
 class InvalidFileRenderer(Renderer):
     template = RendererTemplate("file_browser/file_content/text.html")
 
@@ -255,6 +320,22 @@ FILE_RENDERERS = {
 }
 
 
+# Code files we highlight, and the name of the pygments lexer to use. We don't
+# use pygments' own filename matching, as it also loads any lexer plugins
+# installed, which may not be importable.
+CODE_LEXERS = {
+    ".ado": "stata",
+    ".do": "stata",
+    ".js": "javascript",
+    ".py": "python",
+    ".r": "r",
+    ".R": "r",
+    ".sh": "bash",
+    ".sql": "sql",
+    ".toml": "toml",
+}
+
+
 def get_renderer(relpath: UrlPath, plaintext=False) -> type[Renderer]:
     if is_valid_file_type(UrlPath(relpath)):
         if plaintext:
@@ -271,6 +352,9 @@ def get_code_renderer(relpath: UrlPath, plaintext=False) -> type[Renderer]:
     if relpath.suffix in FILE_RENDERERS:
         return FILE_RENDERERS[relpath.suffix]
 
+    if relpath.suffix in CODE_LEXERS:
+        return CodeRenderer
+
     mtype, _ = mimetypes.guess_type(str(relpath), strict=False)
 
     if mtype is None:
@@ -282,6 +366,17 @@ def get_code_renderer(relpath: UrlPath, plaintext=False) -> type[Renderer]:
     return TextRenderer
 
 
+def highlight_code(code: str, filename: str) -> str:
+    """Return code as html, highlighted according to its filename."""
+    lexer_name = CODE_LEXERS.get(Path(filename).suffix)
+    if lexer_name is None or len(code) > MAX_HIGHLIGHT_CHARS:
+        return escape(code)
+    # keep leading and trailing blank lines, which pygments strips by default
+    lexer = get_lexer_by_name(lexer_name, stripnl=False)
+    formatter: HtmlFormatter[str] = HtmlFormatter(nowrap=True)
+    return highlight(code, lexer, formatter)
+
+
 def filesystem_key(stat) -> str:
     # Like whitenoise, use filesystem metadata rather than hash as it's faster
     return f"{int(stat.st_mtime):x}-{stat.st_size:x}"
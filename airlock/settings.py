@@ -101,7 +101,12 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "airlock.middleware.TimeoutExceptionMiddleware",
+    "airlock.middleware.QueryTracingMiddleware",
+    "airlock.middleware.ProfilingMiddleware",
+    "airlock.middleware.MemoryTracingMiddleware",
+    "airlock.middleware.MetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "airlock.middleware.SessionRefreshMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -266,10 +271,17 @@ SESSION_COOKIE_NAME = "airlock-sessionid"
 
 # login is painful, so reduce the frequency that users need to do it after inactivity.
 SESSION_COOKIE_AGE = 8 * 7 * 24 * 60 * 60  # 8 weeks
-SESSION_SAVE_EVERY_REQUEST = True  # 8 weeks of inactivity, not since login
+# We want 8 weeks of inactivity, not since login, but saving the session on every
+# request is a db write on every request. Instead, SessionRefreshMiddleware saves
+# the session if it hasn't been saved for SESSION_REFRESH_INTERVAL.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = 24 * 60 * 60  # 1 day
 
 # time before we refresh users authorisation
 AIRLOCK_AUTHZ_TIMEOUT = 15 * 60  # 15 minutes
+# time before we stop using users authorisation while it is refreshed in the
+# background, and wait for the refresh instead
+AIRLOCK_AUTHZ_HARD_TIMEOUT = 60 * 60  # 1 hour
 
 # Serve files from static dirs directly. This removes the need to run collectstatic
 # https://whitenoise.readthedocs.io/en/latest/django.html#WHITENOISE_USE_FINDERS
@@ -456,5 +468,68 @@ SCREENSHOT_DIR = BASE_DIR / "docs" / "screenshots"
 UPLOAD_DELAY = float(os.environ.get("AIRLOCK_UPLOAD_DELAY", 1))
 UPLOAD_RETRY_DELAY = float(os.environ.get("AIRLOCK_UPLOAD_RETRY_DELAY", 60))
 
+# Opt-in long-polling of upload progress. If set, the request page's upload
+# progress poll waits up to this many seconds for the request to change before
+# responding. Each waiting poll holds a worker, so only enable this with
+# threaded gunicorn workers.
+UPLOAD_POLL_WAIT = float(os.environ.get("AIRLOCK_UPLOAD_POLL_WAIT", 0))
+
+# How often the prefetch_code_commits command checks manifests for new commits,
+# and how many commits it fetches at once
+CODE_PREFETCH_DELAY = float(os.environ.get("AIRLOCK_CODE_PREFETCH_DELAY", 60))
+CODE_PREFETCH_CONCURRENCY = int(os.environ.get("AIRLOCK_CODE_PREFETCH_CONCURRENCY", 4))
+
+# The watch_workspaces command records when each workspace changes in this file,
+# so that workers can cache things read from workspace files. If it can't use
+# inotify, it polls for changes this often.
+GENERATIONS_FILE = WORK_DIR / os.environ.get(
+    "AIRLOCK_GENERATIONS_FILE", "workspace-generations.json"
+)
+WORKSPACE_WATCHER_POLL_INTERVAL = float(
+    os.environ.get("AIRLOCK_WORKSPACE_WATCHER_POLL_INTERVAL", 2)
+)
+
+# Read-only audit events (i.e. file views and downloads) are spooled to local
+# disk and bulk inserted into the database when either limit is reached, or
+# when the audit log is read.
+AUDIT_SPOOL_DIR = WORK_DIR / os.environ.get("AIRLOCK_AUDIT_SPOOL_DIR", "audit_spool")
+AUDIT_SPOOL_MAX_EVENTS = int(os.environ.get("AIRLOCK_AUDIT_SPOOL_MAX_EVENTS", 50))
+AUDIT_SPOOL_MAX_AGE = float(os.environ.get("AIRLOCK_AUDIT_SPOOL_MAX_AGE", 10))
+
+# QueryTracingMiddleware records this many of each request's slowest queries on
+# its span, and flags it if it runs the same query (with different parameters)
+# at least QUERY_REPEAT_THRESHOLD times, which is usually an N+1 query. Set
+# the threshold to 0 to disable this.
+QUERY_TRACING_SLOWEST = int(os.environ.get("AIRLOCK_QUERY_TRACING_SLOWEST", 5))
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("AIRLOCK_QUERY_REPEAT_THRESHOLD", 10))
+
+# Opt-in profiling of slow requests and uploads. If AIRLOCK_PROFILE_THRESHOLD is
+# set, those taking at least that many seconds have their profile saved in
+# PROFILE_DIR, linked from their span. See services/profiling.py.
+PROFILE_THRESHOLD = (
+    float(os.environ["AIRLOCK_PROFILE_THRESHOLD"])
+    if os.environ.get("AIRLOCK_PROFILE_THRESHOLD")
+    else None
+)
+PROFILE_DIR = WORK_DIR / os.environ.get("AIRLOCK_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.environ.get("AIRLOCK_PROFILE_INTERVAL", 0.005))
+
+# Opt-in memory telemetry. If AIRLOCK_MEMORY_TRACING is "True", each request's
+# change in RSS and peak allocations are added to its span. If
+# AIRLOCK_MEMORY_SNAPSHOT_INTERVAL is also set, the top allocators are written
+# to MEMORY_SNAPSHOT_DIR at most that often, in seconds. See services/memory.py.
+MEMORY_TRACING = os.environ.get("AIRLOCK_MEMORY_TRACING", "False") == "True"
+MEMORY_SNAPSHOT_INTERVAL = float(os.environ.get("AIRLOCK_MEMORY_SNAPSHOT_INTERVAL", 0))
+MEMORY_SNAPSHOT_DIR = WORK_DIR / os.environ.get(
+    "AIRLOCK_MEMORY_SNAPSHOT_DIR", "memory_snapshots"
+)
+
+# Each process writes its metrics to a file in here, and /metrics/ adds them up.
+# See services/metrics.py.
+METRICS_DIR = WORK_DIR / os.environ.get("AIRLOCK_METRICS_DIR", "metrics")
+# Workers write out their metrics at most this often, in seconds, rather than
+# after every request, and also when they are scraped or exit.
+METRICS_FLUSH_INTERVAL = float(os.environ.get("AIRLOCK_METRICS_FLUSH_INTERVAL", 10))
+
 # logs are truncated to this many
 MAX_LOG_BYTES = 10_000
@@ -1,6 +1,8 @@
 from django import template
 from django.utils.safestring import mark_safe
 
+from airlock.file_browser_api import tree_fragments
+
 
 register = template.Library()
 
@@ -17,3 +19,10 @@ ICON = """
 @register.simple_tag
 def datatable_sort_icon():
     return mark_safe(ICON)
+
+
+@register.simple_tag
+def file_tree(root, state_key=None):
+    """Render the file tree, using the cached html if state_key is given."""
+    # state_key is "" if the view doesn't provide one
+    return tree_fragments.render(root, state_key or None)
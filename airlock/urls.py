@@ -223,6 +223,7 @@ urlpatterns = [
         airlock.views.code.contents,
         name="code_contents",
     ),
+    path("metrics/", airlock.views.serve_metrics, name="metrics"),
     path(r"docs/", airlock.views.serve_docs, name="docs_home"),
     path(r"docs/<path:path>", airlock.views.serve_docs),
 ]
@@ -1,5 +1,6 @@
 from .auth import login, logout
 from .docs import serve_docs
+from .metrics import serve_metrics
 from .request import (
     file_approve,
     file_change_properties,
@@ -41,6 +42,7 @@ from .workspace import (
 __all__ = [
     "login",
     "logout",
+    "serve_metrics",
     "index",
     "all_workspaces_index",
     "file_approve",
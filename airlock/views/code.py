@@ -8,7 +8,7 @@ from django.views.decorators.vary import vary_on_headers
 
 from airlock import exceptions
 from airlock.business_logic import bll
-from airlock.file_browser_api import get_code_tree
+from airlock.file_browser_api import code_tree_key, get_code_tree
 from airlock.models import CodeRepo, Workspace
 from airlock.types import UrlPath
 from airlock.views.helpers import (
@@ -66,6 +66,7 @@ def view(request, workspace_name: str, commit: str, path: str = ""):
             "workspace": workspace,
             "repo": repo,
             "root": tree,
+            "tree_state_key": code_tree_key(repo),
             "path_item": path_item,
             "title": f"{repo.repo}@{commit[:7]}",
             "current_request": current_request,
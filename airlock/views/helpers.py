@@ -1,12 +1,20 @@
+import functools
+import hashlib
+import json
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
 
+from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.utils.safestring import mark_safe
 
-from airlock import exceptions
+from airlock import exceptions, metrics
 from airlock.business_logic import bll
 from airlock.file_browser_api import PathItem
 from airlock.types import UrlPath
@@ -82,6 +90,18 @@ def get_release_request_or_raise(user, request_id):
     return release_request
 
 
+def get_release_request_version_or_raise(user, request_id):
+    """Get the release request's version, converting any errors to http codes."""
+    try:
+        version = bll.get_release_request_version(request_id, user)
+    except exceptions.ReleaseRequestNotFound:
+        raise Http404()
+    except exceptions.WorkspacePermissionDenied:
+        raise PermissionDenied()
+
+    return version
+
+
 def download_file(abspath, filename=None):
     """Simple Helper to download file."""
     return FileResponse(abspath.open("rb"), as_attachment=True, filename=filename)
@@ -93,11 +113,75 @@ def serve_file(request, renderer):
     Handles sending 304 Not Modified if possible.
     """
 
+    renderer_name = type(renderer).__name__
     if request.headers.get("If-None-Match") == renderer.etag:
         response = HttpResponseNotModified(headers=renderer.headers())
+        metrics.FILE_RENDERS.inc(renderer=renderer_name, result="not_modified")
     else:
         response = renderer.get_response()
+        metrics.FILE_RENDERS.inc(renderer=renderer_name, result="rendered")
+
+    return response
+
+
+@functools.cache
+def templates_hash() -> str:
+    """A hash of the templates and built assets that pages are rendered with.
+
+    These only change when Airlock is deployed, so we only read them once.
+    """
+    md5 = hashlib.md5()
+    for path in sorted((settings.BASE_DIR / "airlock" / "templates").rglob("*")):
+        if path.is_file():
+            md5.update(path.read_bytes())
+    vite_config = cast(dict[str, Any], settings.DJANGO_VITE["default"])
+    manifest = cast(Path, vite_config["manifest_path"])
+    if manifest.exists():  # pragma: no branch
+        md5.update(manifest.read_bytes())
+    return md5.hexdigest()
+
+
+def page_etag(request, headers, *state) -> str | None:
+    """An ETag for a page, rendered from state for the current user.
+
+    headers are the request headers that the page varies on. The page also
+    depends on the url, the user's permissions, their CSRF token, which is in
+    the page's forms, and the templates.
+
+    Returns None if the page will show messages, as they are only shown once.
+    """
+    if len(messages.get_messages(request)):
+        return None
+
+    page = (
+        request.get_full_path(),
+        [request.headers.get(header) for header in headers],
+        request.user.user_id,
+        json.dumps(request.user.api_data, sort_keys=True),
+        request.META.get("CSRF_COOKIE"),
+        templates_hash(),
+        state,
+    )
+    return f'"{hashlib.md5(repr(page).encode()).hexdigest()}"'
+
+
+def not_modified(request, etag: str | None) -> HttpResponseNotModified | None:
+    """Return 304 Not Modified, if the client already has this version of the page."""
+    if etag is None or etag not in parse_etags(
+        request.headers.get("If-None-Match", "")
+    ):
+        return None
+    response = HttpResponseNotModified()
+    set_page_etag(response, etag)
+    return response
+
 
+def set_page_etag(response: HttpResponse, etag: str | None) -> HttpResponse:
+    if etag is not None:
+        response.headers["ETag"] = etag
+        # the page is for this user only, and they should always check with us
+        # that they have the latest version
+        patch_cache_control(response, private=True, no_cache=True)
     return response
 
 
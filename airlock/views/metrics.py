@@ -0,0 +1,23 @@
+from ipaddress import ip_address
+
+from django.http import Http404, HttpResponse
+
+from airlock import metrics
+
+from .helpers import login_exempt
+
+
+@login_exempt
+def serve_metrics(request):
+    """Serve our metrics in Prometheus's text format, to localhost only."""
+    try:
+        local = ip_address(request.META.get("REMOTE_ADDR", "")).is_loopback
+    except ValueError:
+        local = False
+    if not local:
+        raise Http404()
+
+    return HttpResponse(
+        metrics.expose(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,3 +1,5 @@
+import time
+
 import requests
 from django.conf import settings
 from django.contrib import messages
@@ -23,7 +25,7 @@ from airlock.enums import (
     Visibility,
     WorkspaceFileStatus,
 )
-from airlock.file_browser_api import get_request_tree
+from airlock.file_browser_api import get_request_tree, request_tree_key
 from airlock.forms import (
     AddFileForm,
     FileTypeFormSet,
@@ -44,7 +46,11 @@ from .helpers import (
     get_next_url_from_form,
     get_path_item_from_tree_or_404,
     get_release_request_or_raise,
+    get_release_request_version_or_raise,
+    not_modified,
+    page_etag,
     serve_file,
+    set_page_etag,
 )
 
 
@@ -320,11 +326,22 @@ def get_button_context(path_item, user, release_request, workspace):
 
 
 # we return different content if it is a HTMX request.
-@vary_on_headers("HX-Request")
+REQUEST_VIEW_HEADERS = ("HX-Request",)
+
+
+@vary_on_headers(*REQUEST_VIEW_HEADERS)
 @require_http_methods(["GET"])
 @instrument(func_attributes={"release_request": "request_id"})
 def request_view(request, request_id: str, path: str = ""):
     release_request = get_release_request_or_raise(request.user, request_id)
+    workspace = bll.get_workspace(release_request.workspace, request.user)
+
+    tree_state_key = request_tree_key(release_request, request.user)
+    etag = page_etag(
+        request, REQUEST_VIEW_HEADERS, tree_state_key, workspace.manifest_hash
+    )
+    if not_modified_response := not_modified(request, etag):
+        return not_modified_response
 
     relpath = UrlPath(path)
     template_dir = "file_browser/request/"
@@ -343,7 +360,6 @@ def request_view(request, request_id: str, path: str = ""):
     if path_item.is_directory() != is_directory_url:
         return redirect(path_item.url())
 
-    workspace = bll.get_workspace(release_request.workspace, request.user)
     # button context
     # get the information that the template needs in order to
     # generate the buttons shown at the top of the content panel
@@ -457,6 +473,7 @@ def request_view(request, request_id: str, path: str = ""):
         "workspace": workspace,
         "release_request": release_request,
         "root": tree,
+        "tree_state_key": tree_state_key,
         "path_item": path_item,
         "title": f"Request for {release_request.workspace} by {release_request.author}",
         "content_buttons": button_context,
@@ -470,7 +487,7 @@ def request_view(request, request_id: str, path: str = ""):
         "is_request_root": release_request.get_url() == request.path,
     }
 
-    return TemplateResponse(request, template, context)
+    return set_page_etag(TemplateResponse(request, template, context), etag)
 
 
 def _build_group_list_html(release_request, group_names):
@@ -1323,12 +1340,31 @@ def group_reset_votes(request, request_id, group):
     return redirect(release_request.get_url(group))
 
 
+# how often a waiting upload progress poll checks if the request has changed
+UPLOAD_POLL_CHECK_INTERVAL = 0.5
+
+
 def uploaded_files_count(request, request_id):
     """
     This view is called with htmx when a request is in the process of
     uploading files, so we can update the file count displayed on the request
     overview page.
+
+    The poll sends the version of the request that it was rendered from. If
+    the request hasn't changed since, we respond with 204 No Content, which
+    htmx ignores, without loading the whole request. With UPLOAD_POLL_WAIT set,
+    we first wait that long for it to change, so that the page is updated as
+    soon as it does.
     """
+    deadline = time.monotonic() + settings.UPLOAD_POLL_WAIT
+    while True:
+        version = get_release_request_version_or_raise(request.user, request_id)
+        if request.GET.get("version") != str(version):
+            break
+        if time.monotonic() >= deadline:
+            return HttpResponse(status=204)
+        time.sleep(UPLOAD_POLL_CHECK_INTERVAL)
+
     release_request = get_release_request_or_raise(request.user, request_id)
     if release_request.upload_in_progress():
         return TemplateResponse(
@@ -16,7 +16,7 @@ from opentelemetry import trace
 from airlock import exceptions, permissions, policies
 from airlock.business_logic import bll
 from airlock.enums import PathType, RequestFileType, WorkspaceFileStatus
-from airlock.file_browser_api import get_workspace_tree
+from airlock.file_browser_api import get_workspace_tree, workspace_tree_key
 from airlock.forms import (
     AddFileForm,
     FileFormSet,
@@ -31,7 +31,10 @@ from airlock.views.helpers import (
     get_next_url_from_form,
     get_path_item_from_tree_or_404,
     get_workspace_or_raise,
+    not_modified,
+    page_etag,
     serve_file,
+    set_page_etag,
 )
 from services.tracing import instrument
 
@@ -97,21 +100,7 @@ def all_workspaces_index(request):
         raise PermissionDenied()
 
     query = request.GET.get("q", "").strip()
-    all_workspaces = bll.get_all_workspaces()
-
-    if query:
-        filtered_workspaces = sorted(
-            [
-                workspace
-                for workspace in all_workspaces
-                if query.lower() in workspace.name.lower()
-            ],
-            key=lambda workspace: workspace.name,
-        )
-    else:
-        filtered_workspaces = sorted(
-            all_workspaces, key=lambda workspace: workspace.name
-        )
+    filtered_workspaces = bll.get_all_workspaces(query)
 
     if request.htmx:
         return TemplateResponse(
@@ -243,8 +232,16 @@ def get_nearest_parent_url(workspace, urlpath):
     )
 
 
-# we return different content depending on the HX-Request / HX-Target headers.
-@vary_on_headers("HX-Request", "HX-Target", "manifest-hash")
+# we return different content depending on these headers
+WORKSPACE_VIEW_HEADERS = (
+    "HX-Request",
+    "HX-Target",
+    "manifest-hash",
+    "X-Expanded-Paths",
+)
+
+
+@vary_on_headers(*WORKSPACE_VIEW_HEADERS)
 @instrument(func_attributes={"workspace": "workspace_name"})
 def workspace_view(request, workspace_name: str, path: str = ""):
     show_out_of_date_action_outputs = request.session.get(
@@ -290,6 +287,16 @@ def workspace_view(request, workspace_name: str, path: str = ""):
             response.headers["HX-Redirect"] = redirect_url
             return response
 
+    tree_state_key = workspace_tree_key(workspace)
+    etag = page_etag(
+        request,
+        WORKSPACE_VIEW_HEADERS,
+        tree_state_key,
+        show_out_of_date_action_outputs,
+    )
+    if not_modified_response := not_modified(request, etag):
+        return not_modified_response
+
     # X-Expanded-Paths is set by the out-of-date toggle to preserve folders
     # the user had open before the HTMX panel swap.
     try:
@@ -344,13 +351,14 @@ def workspace_view(request, workspace_name: str, path: str = ""):
             + f"?return_url={workspace.get_url(path)}"
         )
 
-    return TemplateResponse(
+    response = TemplateResponse(
         request,
         template,
         {
             "template_dir": template_dir,
             "workspace": workspace,
             "root": tree,
+            "tree_state_key": tree_state_key,
             "path_item": path_item,
             "title": f"Files for workspace {workspace.display_name()}",
             "current_request": workspace.current_request,
@@ -365,6 +373,7 @@ def workspace_view(request, workspace_name: str, path: str = ""):
             "out_of_date_action_count": workspace.out_of_date_action_count,
         },
     )
+    return set_page_etag(response, etag)
 
 
 @instrument(func_attributes={"workspace": "workspace_name"})
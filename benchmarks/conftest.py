@@ -0,0 +1,184 @@
+"""
+Benchmarks for Airlock's hot paths, run against synthetic data.
+
+These are not part of the test suite: run them with `just bench`. Each
+benchmark's median time is compared against the baseline for its scale, if
+one has been saved with `just bench --save-baseline`, and the run fails if it
+is more than --tolerance slower. Timings depend on the machine, so baselines
+are saved in the (untracked) work directory, rather than committed.
+"""
+
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+from benchmarks.synthetic import SCALES, Scale, create_workspace
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("airlock benchmarks")
+    group.addoption("--scale", choices=list(SCALES), default="small")
+    # override individual parts of the scale
+    for field in Scale.__dataclass_fields__:
+        group.addoption(f"--{field.replace('_', '-')}", type=int)
+    group.addoption("--rounds", type=int, default=5, help="timed runs of each")
+    group.addoption(
+        "--baseline-dir",
+        type=Path,
+        default=Path(settings.WORK_DIR) / "benchmarks",
+    )
+    group.addoption("--save-baseline", action="store_true")
+    group.addoption(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction slower than the baseline that counts as a regression",
+    )
+
+
+@dataclass
+class Result:
+    rounds: int
+    min: float
+    median: float
+    max: float
+
+
+class Benchmarks:
+    def __init__(self, config):
+        self.config = config
+        self.scale_name = config.getoption("scale")
+        self.scale = SCALES[self.scale_name].override(
+            **{field: config.getoption(field) for field in Scale.__dataclass_fields__}
+        )
+        self.results: dict[str, Result] = {}
+
+    @property
+    def baseline_path(self) -> Path:
+        name = self.scale_name
+        if self.scale != SCALES[self.scale_name]:
+            # custom scales are only compared against the same custom scale
+            name += "-" + "-".join(str(v) for v in asdict(self.scale).values())
+        return self.config.getoption("baseline_dir") / f"{name}.json"
+
+    def load_baseline(self) -> dict[str, dict[str, float]]:
+        if not self.baseline_path.exists():
+            return {}
+        return json.loads(self.baseline_path.read_text())
+
+    def save_baseline(self):
+        self.baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        self.baseline_path.write_text(
+            json.dumps(
+                {name: asdict(result) for name, result in self.results.items()},
+                indent=2,
+            )
+        )
+
+
+benchmarks_key = pytest.StashKey[Benchmarks]()
+
+
+def pytest_configure(config):
+    config.stash[benchmarks_key] = Benchmarks(config)
+
+
+@pytest.fixture(scope="session")
+def scale(pytestconfig) -> Scale:
+    return pytestconfig.stash[benchmarks_key].scale
+
+
+@pytest.fixture(scope="session", autouse=True)
+def benchmark_settings(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("benchmarks")
+    with override_settings(
+        WORK_DIR=tmp_path,
+        WORKSPACE_DIR=tmp_path / "workspaces",
+        REQUEST_DIR=tmp_path / "requests",
+        GIT_REPO_DIR=tmp_path / "repos",
+        AUDIT_SPOOL_DIR=tmp_path / "audit_spool",
+        GENERATIONS_FILE=tmp_path / "workspace-generations.json",
+    ):
+        settings.WORKSPACE_DIR.mkdir()
+        yield
+
+
+@pytest.fixture(scope="session")
+def workspace_dir(benchmark_settings, scale) -> Path:
+    return create_workspace("workspace", scale)
+
+
+@pytest.fixture
+def benchmark(request, pytestconfig):
+    """Time fn, and record its result.
+
+    setup, if given, is called before each run, untimed, and returns the
+    arguments to call fn with. Returns the result of the last run.
+    """
+    benchmarks = pytestconfig.stash[benchmarks_key]
+    rounds = pytestconfig.getoption("rounds")
+
+    def run(fn, setup=lambda: ()):
+        # a first untimed run, to warm up any caches
+        result = fn(*setup())
+        times = []
+        for _ in range(rounds):
+            args = setup()
+            start = time.perf_counter()
+            result = fn(*args)
+            times.append(time.perf_counter() - start)
+
+        benchmarks.results[request.node.name] = Result(
+            rounds=rounds,
+            min=min(times),
+            median=statistics.median(times),
+            max=max(times),
+        )
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    benchmarks = config.stash[benchmarks_key]
+    if not benchmarks.results:
+        return
+
+    baseline = benchmarks.load_baseline()
+    tolerance = config.getoption("tolerance")
+    regressions = []
+
+    terminalreporter.section(f"benchmarks: {benchmarks.scale_name} scale")
+    terminalreporter.write_line(
+        f"{'name':<60} {'min':>10} {'median':>10} {'max':>10} {'baseline':>10}"
+    )
+    for name, result in sorted(benchmarks.results.items()):
+        line = f"{name:<60} {result.min * 1000:>8.2f}ms {result.median * 1000:>8.2f}ms {result.max * 1000:>8.2f}ms"
+        if name in baseline:
+            base = baseline[name]["median"]
+            change = result.median / base - 1
+            line += f" {base * 1000:>8.2f}ms {change:+.0%}"
+            if change > tolerance:
+                regressions.append(name)
+                line += " REGRESSION"
+        terminalreporter.write_line(line)
+
+    if config.getoption("save_baseline"):
+        benchmarks.save_baseline()
+        terminalreporter.write_line(f"\nSaved baseline to {benchmarks.baseline_path}")
+    elif not baseline:
+        terminalreporter.write_line(
+            f"\nNo baseline at {benchmarks.baseline_path}, save one with --save-baseline"
+        )
+    elif regressions:
+        terminalreporter.write_line(
+            f"\n{len(regressions)} benchmarks more than {tolerance:.0%} slower than the baseline"
+        )
+        if terminalreporter._session.exitstatus == 0:
+            terminalreporter._session.exitstatus = 1
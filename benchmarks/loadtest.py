@@ -0,0 +1,456 @@
+"""
+Load test Airlock under gunicorn, with our production gunicorn.conf.py.
+
+Seeds a fresh work directory with synthetic workspaces and requests, starts
+gunicorn, and then runs increasing numbers of concurrent simulated users
+against it, each for a fixed duration. Researchers browse workspaces, and
+output checkers review requests, including the htmx polling of an approved
+request's upload progress. For each level of concurrency, it reports the
+p50/p95/p99 latency and throughput of each endpoint.
+
+Usage:
+
+    just loadtest --users 1,4,8,16 --duration 30
+
+Run with --help for all the options. It needs built assets, as it runs with
+DEBUG off, as in production.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+
+# run from the repo root, so gunicorn finds gunicorn.conf.py and the app
+ROOT = Path(__file__).parent.parent
+
+REQUEST_GROUP = "group"
+
+
+@dataclass
+class Target:
+    """What the simulated users browse."""
+
+    workspaces: dict[str, list[str]] = field(default_factory=dict)
+    # which the page sends with its htmx requests
+    manifest_hashes: dict[str, str] = field(default_factory=dict)
+    # request id -> its file paths
+    submitted_requests: dict[str, list[str]] = field(default_factory=dict)
+    # requests that are approved and uploading, so have their progress polled
+    approved_requests: list[str] = field(default_factory=list)
+    researchers: list[str] = field(default_factory=list)
+    checkers: list[str] = field(default_factory=list)
+
+
+def prepare(work_dir: Path, scale_name: str, workspace_count: int) -> Target:
+    """Configure Django to use work_dir, and seed it with synthetic data.
+
+    Must be called before anything else imports Django settings, as they are
+    read from the environment. The environment is then inherited by gunicorn.
+    """
+    os.environ.update(
+        {
+            "DJANGO_SETTINGS_MODULE": "airlock.settings",
+            "DJANGO_DEBUG": "False",
+            "AIRLOCK_WORK_DIR": str(work_dir),
+            "AIRLOCK_WORKSPACE_DIR": "workspaces",
+            "AIRLOCK_REQUEST_DIR": "requests",
+            "AIRLOCK_DEV_USERS_FILE": "dev_users.json",
+            "AIRLOCK_API_TOKEN": "",
+            "OTEL_EXPORTER_CONSOLE": "",
+        }
+    )
+    # don't send spans anywhere
+    os.environ.pop("OTEL_EXPORTER_OTLP_HEADERS", None)
+
+    import django
+    import responses
+
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from airlock.enums import RequestStatus
+    from benchmarks.synthetic import SCALES, create_workspace, output_path
+    from tests import factories
+
+    scale = SCALES[scale_name]
+    call_command("migrate", verbosity=0)
+    settings.WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
+
+    target = Target()
+    names = [f"workspace-{i}" for i in range(workspace_count)]
+    for name in names:
+        create_workspace(name, scale)
+        target.workspaces[name] = [
+            output_path(i, scale.depth) for i in range(scale.files)
+        ] + ["output/large.csv"]
+
+    dev_users = {}
+
+    def create_user(username, **kwargs):
+        api_user = factories.create_api_user(username=username, **kwargs)
+        dev_users[username] = {"token": username, "details": api_user}
+        return factories.create_airlock_user(username=username, **kwargs)
+
+    researchers = [create_user(f"researcher-{i}", workspaces=names) for i in range(4)]
+    checkers = [
+        create_user(f"checker-{i}", workspaces=names, output_checker=True)
+        for i in range(4)
+    ]
+    target.researchers = [user.username for user in researchers]
+    target.checkers = [user.username for user in checkers]
+    (work_dir / "dev_users.json").write_text(json.dumps(dev_users))
+
+    for i, name in enumerate(names):
+        # a request for review, of a few of the workspace's files
+        paths = target.workspaces[name][i * 10 : i * 10 + 10]
+        request = factories.create_request_at_status(
+            name,
+            author=researchers[i % len(researchers)],
+            status=RequestStatus.SUBMITTED,
+            files=[factories.request_file(REQUEST_GROUP, path) for path in paths],
+        )
+        target.submitted_requests[request.id] = paths
+
+    # and an approved request, for checkers to watch the progress of. No
+    # uploader is running, so it stays uploading.
+    paths = target.workspaces[names[0]][-11:-1]
+    with responses.RequestsMock() as rsps:
+        # approving a request creates the release in job-server
+        rsps.post(
+            f"{settings.AIRLOCK_API_ENDPOINT}/releases/workspace/{names[0]}",
+            status=201,
+            headers={"Release-Id": "approved-release"},
+        )
+        request = factories.create_request_at_status(
+            names[0],
+            author=researchers[1],
+            status=RequestStatus.APPROVED,
+            files=[
+                factories.request_file(REQUEST_GROUP, path, approved=True)
+                for path in paths
+            ],
+            checker=checkers[0],
+        )
+    target.approved_requests.append(request.id)
+
+    for name in names:
+        # creating the requests may have updated the manifests
+        manifest = settings.WORKSPACE_DIR / name / "metadata/manifest.json"
+        target.manifest_hashes[name] = hashlib.sha256(manifest.read_bytes()).hexdigest()
+
+    from airlock.business_logic import bll
+
+    bll.flush_audit_events()
+    return target
+
+
+class Gunicorn:
+    """Run gunicorn with our config, on a unix socket."""
+
+    def __init__(self, work_dir: Path, workers: int | None):
+        self.socket = work_dir / "gunicorn.sock"
+        self.log = work_dir / "gunicorn.log"
+        cmd = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            "gunicorn.conf.py",
+            "--bind",
+            f"unix:{self.socket}",
+            "airlock.wsgi",
+        ]
+        if workers:
+            cmd += ["--workers", str(workers)]
+        with self.log.open("w") as log:
+            self.process = subprocess.Popen(
+                cmd, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT
+            )
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(
+            transport=httpx.HTTPTransport(uds=str(self.socket)),
+            base_url="http://localhost",
+            timeout=60,
+        )
+
+    def wait_until_up(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited:\n{self.log.read_text()}")
+            try:
+                with self.client() as client:
+                    if client.get("/login/").status_code == 200:
+                        return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not start:\n{self.log.read_text()}")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, duration: float) -> dict[str, dict[str, float]]:
+        report = {}
+        all_latencies = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            report[endpoint] = summarise(latencies, self.errors[endpoint], duration)
+            all_latencies.extend(latencies)
+        report["TOTAL"] = summarise(all_latencies, sum(self.errors.values()), duration)
+        return report
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(0, int(len(values) * p / 100 + 0.5) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def summarise(latencies: list[float], errors: int, duration: float):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"count": 0, "errors": errors, "rps": 0.0}
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+class User:
+    """A simulated user, running scenarios until stopped."""
+
+    def __init__(self, gunicorn, target, stats, stop, username, think_time, rng):
+        self.client = gunicorn.client()
+        self.target = target
+        self.stats = stats
+        self.stop = stop
+        self.username = username
+        self.think_time = think_time
+        self.rng = rng
+
+    def get(self, endpoint: str, url: str, htmx=False, **headers):
+        if htmx:
+            headers["HX-Request"] = "true"
+        start = time.perf_counter()
+        try:
+            response = self.client.get(url, headers=headers)
+            # anything else, like a redirect to login, means something is wrong
+            ok = response.status_code == 200
+        except httpx.TransportError:
+            ok = False
+        self.stats.record(endpoint, time.perf_counter() - start, ok)
+
+    def think(self):
+        # wait around think_time, unless we've been stopped
+        self.stop.wait(self.rng.uniform(0.5, 1.5) * self.think_time)
+
+    def login(self):
+        self.client.get("/login/")
+        self.client.post(
+            "/login/",
+            data={
+                "user": self.username,
+                "token": self.username,
+                "csrfmiddlewaretoken": self.client.cookies["csrftoken"],
+            },
+        )
+
+    def run(self):
+        self.login()
+        while not self.stop.is_set():
+            self.scenario()
+        self.client.close()
+
+    def scenario(self):
+        raise NotImplementedError()
+
+
+class Researcher(User):
+    def scenario(self):
+        workspace = self.rng.choice(list(self.target.workspaces))
+        path = self.rng.choice(self.target.workspaces[workspace])
+        self.get("workspace_index", "/workspaces/")
+        self.think()
+        self.get("workspace_view", f"/workspaces/view/{workspace}/")
+        self.think()
+        # expanding a directory in the tree
+        directory = path.rsplit("/", 1)[0]
+        self.get(
+            "workspace_view (htmx)",
+            f"/workspaces/view/{workspace}/{directory}/",
+            htmx=True,
+            **{"manifest-hash": self.target.manifest_hashes[workspace]},
+        )
+        self.think()
+        self.get("workspace_view (file)", f"/workspaces/view/{workspace}/{path}")
+        # the file's contents, loaded in an iframe
+        self.get("workspace_contents", f"/workspaces/content/{workspace}/{path}")
+        self.think()
+
+
+class Checker(User):
+    def scenario(self):
+        request_id = self.rng.choice(list(self.target.submitted_requests))
+        self.get("requests_for_output_checker", "/requests/output_checker")
+        self.think()
+        self.get("request_view", f"/requests/view/{request_id}/")
+        self.think()
+        for path in self.rng.sample(self.target.submitted_requests[request_id], 3):
+            self.get(
+                "request_view (file)",
+                f"/requests/view/{request_id}/{REQUEST_GROUP}/{path}",
+            )
+            self.get(
+                "request_contents",
+                f"/requests/content/{request_id}/{REQUEST_GROUP}/{path}",
+            )
+            self.think()
+
+        # watch an approved request's files uploading, which the page polls
+        # for every second
+        request_id = self.rng.choice(self.target.approved_requests)
+        self.get("request_view (uploading)", f"/requests/view/{request_id}/")
+        for _ in range(5):
+            self.get(
+                "uploaded_files_count",
+                f"/requests/{request_id}/uploaded-files-count",
+                htmx=True,
+            )
+            self.stop.wait(1)
+
+
+def run_level(gunicorn, target, users, duration, think_time, checker_fraction):
+    stats = Stats()
+    stop = threading.Event()
+    threads = []
+    for i in range(users):
+        rng = random.Random(i)
+        if i < round(users * checker_fraction):
+            cls, usernames = Checker, target.checkers
+        else:
+            cls, usernames = Researcher, target.researchers
+        user = cls(
+            gunicorn,
+            target,
+            stats,
+            stop,
+            usernames[i % len(usernames)],
+            think_time,
+            rng,
+        )
+        threads.append(threading.Thread(target=user.run))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return stats.report(duration)
+
+
+def print_report(users: int, report: dict[str, dict[str, float]]):
+    print(f"\n{users} concurrent users")
+    print(
+        f"{'endpoint':<30} {'count':>7} {'errors':>7} {'req/s':>7} "
+        f"{'p50':>9} {'p95':>9} {'p99':>9}"
+    )
+    for endpoint, row in report.items():
+        line = f"{endpoint:<30} {row['count']:>7} {row['errors']:>7} {row['rps']:>7.1f}"
+        if row["count"]:
+            line += "".join(f" {row[p] * 1000:>7.0f}ms" for p in ("p50", "p95", "p99"))
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="small", help="see benchmarks/synthetic.py")
+    parser.add_argument("--workspaces", type=int, default=5)
+    parser.add_argument(
+        "--users",
+        default="1,4,8,16",
+        help="comma separated numbers of concurrent users to run, in turn",
+    )
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="mean seconds between actions"
+    )
+    parser.add_argument(
+        "--checkers", type=float, default=0.5, help="fraction of users reviewing"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="override gunicorn.conf.py's number of workers"
+    )
+    parser.add_argument("--output", type=Path, help="also write the results as json")
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the work directory afterwards"
+    )
+    args = parser.parse_args(argv)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="airlock-loadtest-"))
+    print(f"Seeding {work_dir}")
+    target = prepare(work_dir, args.scale, args.workspaces)
+
+    gunicorn = Gunicorn(work_dir, args.workers)
+    results = {}
+    try:
+        gunicorn.wait_until_up()
+        for users in [int(n) for n in args.users.split(",")]:
+            report = run_level(
+                gunicorn,
+                target,
+                users,
+                args.duration,
+                args.think_time,
+                args.checkers,
+            )
+            print_report(users, report)
+            results[users] = report
+    finally:
+        gunicorn.stop()
+        if args.keep:
+            print(f"\nLeft work directory in {work_dir}")
+        else:
+            shutil.rmtree(work_dir)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
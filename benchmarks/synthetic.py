@@ -0,0 +1,141 @@
+"""
+Build synthetic workspaces and databases, at a configurable scale, for the
+benchmarks to run against.
+"""
+
+import json
+import random
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from django.conf import settings
+
+from tests import factories
+from tests.functional.csv_generator import records_to_csv
+
+
+@dataclass(frozen=True)
+class Scale:
+    # number of output files in the workspace
+    files: int
+    # depth of the directories they are in
+    depth: int
+    # number of highly sensitive outputs, which are in the manifest but never
+    # in the tree, so only add to the manifest's size
+    hidden_outputs: int
+    # size of the csv and log files we render
+    csv_rows: int
+    csv_cols: int
+    log_lines: int
+    # number of requests in the database, each with files_per_request files
+    requests: int
+    files_per_request: int
+
+    def override(self, **kwargs) -> "Scale":
+        return replace(self, **{k: v for k, v in kwargs.items() if v is not None})
+
+
+SCALES = {
+    "small": Scale(
+        files=200,
+        depth=2,
+        hidden_outputs=100,
+        csv_rows=1_000,
+        csv_cols=5,
+        log_lines=1_000,
+        requests=100,
+        files_per_request=10,
+    ),
+    # roughly the size of a large real workspace
+    "medium": Scale(
+        files=2_000,
+        depth=4,
+        hidden_outputs=2_000,
+        csv_rows=20_000,
+        csv_cols=10,
+        log_lines=20_000,
+        requests=1_000,
+        files_per_request=20,
+    ),
+    "large": Scale(
+        files=20_000,
+        depth=6,
+        hidden_outputs=20_000,
+        csv_rows=100_000,
+        csv_cols=20,
+        log_lines=100_000,
+        requests=10_000,
+        files_per_request=20,
+    ),
+}
+
+# directories per level of the tree
+FANOUT = 5
+# a mix of the kinds of values summarize_csv looks for
+CSV_VALUES = ["0", "3", "9", "15", "1.5", "[REDACTED]", "<=7", "", "NaN", "text"]
+
+
+def output_path(i: int, depth: int) -> str:
+    """Return the path of the i'th output, spreading them across directories."""
+    dirs = [f"dir{(i // FANOUT**level) % FANOUT}" for level in range(depth - 1)]
+    suffix = (".csv", ".txt", ".html")[i % 3]
+    return "/".join(["output", *dirs, f"file{i}{suffix}"])
+
+
+def write_csv(path: Path, rows: int, cols: int):
+    rng = random.Random(rows)
+    records = [["name", *[f"col{c}" for c in range(1, cols)]]]
+    for row in range(rows):
+        records.append(
+            [f"row{row}", *(rng.choice(CSV_VALUES) for _ in range(cols - 1))]
+        )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(records_to_csv(records))
+
+
+def write_log(path: Path, lines: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as f:
+        for line in range(lines):
+            # job logs are coloured with ANSI codes
+            f.write(f"\x1b[32m2024-01-01 00:00:00\x1b[0m line {line} of the log\n")
+
+
+def create_workspace(name: str, scale: Scale) -> Path:
+    """Write a workspace with scale.files outputs, and its manifest.
+
+    Also writes a large csv output, output/large.csv, and a large log,
+    metadata/large.log.
+    """
+    root = settings.WORKSPACE_DIR / name
+
+    paths = [output_path(i, scale.depth) for i in range(scale.files)]
+    for i, path in enumerate(paths):
+        abspath = root / path
+        abspath.parent.mkdir(parents=True, exist_ok=True)
+        if path.endswith(".csv"):
+            write_csv(abspath, rows=10, cols=3)
+        else:
+            abspath.write_text(f"output {i}\n")
+    write_csv(root / "output/large.csv", scale.csv_rows, scale.csv_cols)
+    paths.append("output/large.csv")
+
+    for i in range(50):
+        write_log(root / f"metadata/action_{i}.log", lines=10)
+    write_log(root / "metadata/large.log", scale.log_lines)
+
+    # update_manifest keeps any outputs already in the manifest, so start with
+    # the highly sensitive ones
+    hidden = {
+        f"hidden/file{i}.arrow": {
+            "level": "highly_sensitive",
+            "excluded": False,
+            "size": 1,
+            "timestamp": 1,
+            "content_hash": f"hash{i}",
+        }
+        for i in range(scale.hidden_outputs)
+    }
+    (root / "metadata/manifest.json").write_text(json.dumps({"outputs": hidden}))
+    factories.update_manifest(name, files=paths)
+    return root
@@ -0,0 +1,42 @@
+import pytest
+
+from airlock.enums import RequestStatus
+from local_db import data_access
+from tests import factories
+
+
+pytestmark = pytest.mark.django_db
+
+dal = data_access.LocalDBDataAccessLayer()
+
+
+@pytest.fixture(scope="module")
+def user(django_db_setup, django_db_blocker, scale):
+    with factories.seeded_db(
+        django_db_blocker, "benchmark-user", scale.requests, scale.files_per_request
+    ) as user:
+        yield user
+
+
+QUERIES = {
+    "get_release_request": ["request1"],
+    "get_requests_for_workspace": ["workspace1"],
+    "get_requests_by_status": [RequestStatus.SUBMITTED, RequestStatus.REVIEWED],
+    "get_released_files_for_workspace": ["workspace1"],
+    "get_released_files_for_request": ["request1"],
+}
+
+USER_QUERIES = {
+    "get_active_requests_for_workspace_by_user": ["workspace0"],
+    "get_requests_authored_by_user": [],
+}
+
+
+@pytest.mark.parametrize("method", QUERIES)
+def test_dal_query(user, benchmark, method):
+    benchmark(getattr(dal, method), lambda: QUERIES[method])
+
+
+@pytest.mark.parametrize("method", USER_QUERIES)
+def test_dal_query_for_user(user, benchmark, method):
+    benchmark(getattr(dal, method), lambda: [*USER_QUERIES[method], user])
@@ -0,0 +1,46 @@
+import csv
+
+import pytest
+
+from airlock.renderers import CSVRenderer, LogRenderer
+from airlock.types import UrlPath
+from airlock.utils import summarize_csv
+
+
+@pytest.fixture(scope="module")
+def csv_contents(workspace_dir):
+    return (workspace_dir / "output/large.csv").read_bytes()
+
+
+@pytest.fixture(scope="module")
+def log_contents(workspace_dir):
+    return (workspace_dir / "metadata/large.log").read_bytes()
+
+
+def test_summarize_csv(csv_contents, benchmark):
+    reader = csv.reader(csv_contents.decode().splitlines())
+    headers = next(reader)
+    rows = list(enumerate(reader, start=1))
+
+    summary = benchmark(summarize_csv, lambda: (headers, rows))
+    assert summary["rows"]
+
+
+def test_csv_renderer_context(csv_contents, benchmark):
+    def setup():
+        renderer = CSVRenderer.from_contents(
+            csv_contents, UrlPath("large.csv"), "cache-id"
+        )
+        return (renderer,)
+
+    benchmark(CSVRenderer.context, setup)
+
+
+def test_log_renderer_context(log_contents, benchmark):
+    def setup():
+        renderer = LogRenderer.from_contents(
+            log_contents, UrlPath("large.log"), "cache-id"
+        )
+        return (renderer,)
+
+    benchmark(LogRenderer.context, setup)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+from opentelemetry import trace
+
+from services.tracing import instrument
+
+
+CALLS = 10_000
+
+
+@dataclass
+class Instance:
+    workspace: str = "workspace"
+
+    @instrument(func_attributes={"workspace": "workspace", "path": "path"})
+    def method(self, path, page=1):
+        return path
+
+
+@instrument(
+    existing_tracer=trace.NoOpTracer(),
+    func_attributes={"workspace": "workspace", "path": "path"},
+)
+def not_recording(workspace, path):
+    return path
+
+
+def call_many(fn, *args):
+    for _ in range(CALLS):
+        fn(*args)
+
+
+def test_instrument_overhead(benchmark):
+    benchmark(call_many, lambda: (Instance().method, "output/file.txt"))
+
+
+def test_instrument_overhead_not_recording(benchmark):
+    benchmark(call_many, lambda: (not_recording, "workspace", "output/file.txt"))
@@ -0,0 +1,41 @@
+from django.conf import settings
+
+from airlock.file_browser_api import get_workspace_tree
+from airlock.lib.generations import GenerationWriter
+from airlock.models import Workspace
+
+
+def test_from_directory(workspace_dir, benchmark):
+    workspace = benchmark(Workspace.from_directory, lambda: ("workspace",))
+    assert workspace.manifest["outputs"]
+
+
+def test_from_directory_watched(workspace_dir, benchmark):
+    # with the workspace watcher running, the manifest is only read once
+    GenerationWriter(settings.GENERATIONS_FILE).write()
+    try:
+        benchmark(Workspace.from_directory, lambda: ("workspace",))
+    finally:
+        settings.GENERATIONS_FILE.unlink()
+
+
+def test_workspace_files(workspace_dir, scale, benchmark):
+    def setup():
+        return (Workspace.from_directory("workspace"),)
+
+    files = benchmark(lambda workspace: workspace.workspace_files, setup)
+    assert len(files) > scale.files
+
+
+def test_get_workspace_tree(workspace_dir, benchmark):
+    def setup():
+        return (Workspace.from_directory("workspace"),)
+
+    benchmark(get_workspace_tree, setup)
+
+
+def test_get_workspace_tree_selected_only(workspace_dir, benchmark):
+    def setup():
+        return (Workspace.from_directory("workspace"), "output/large.csv", True)
+
+    benchmark(get_workspace_tree, setup)
@@ -8,5 +8,7 @@ export PYTHONUNBUFFERED=TRUE  # make sure the log output lines don't clobber eac
 ./manage.py migrate
 
 run-one-constantly ./manage.py run_file_uploader &
+run-one-constantly ./manage.py prefetch_code_commits &
+run-one-constantly ./manage.py watch_workspaces &
 
 exec "$@"
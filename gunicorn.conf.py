@@ -25,6 +25,27 @@ def post_fork(server, worker):
     tracing.setup_default_tracing()
 
 
+# Remove the metrics written by workers from a previous run, which would
+# otherwise be included forever. Other processes, like the file uploader, may
+# have started before us, so we only remove those that are no longer running.
+def on_starting(server):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airlock.settings")
+    from django.conf import settings
+
+    from services.metrics import REGISTRY
+
+    REGISTRY.remove_dead(settings.METRICS_DIR)
+
+
+# write out any audit events and metrics this worker has buffered before it exits
+def worker_exit(server, worker):
+    from airlock import metrics
+    from airlock.business_logic import bll
+
+    bll.flush_audit_events()
+    metrics.flush()
+
+
 # track this worker is currently handling an actual request
 def pre_request(worker, req):
     global _http_request
@@ -0,0 +1,171 @@
+"""
+A durable local spool for buffering read-only audit events.
+
+Every file view in the UI generates an audit event, and writing each one
+synchronously takes the SQLite write lock on the request path. Instead, these
+events are appended to a per-process spool file on local disk, and bulk
+inserted into the database in batches.
+
+Spool files are append-only JSON lines. To flush, a process atomically renames
+a spool file out of the way, takes an exclusive lock on it to wait for any
+writer that opened it before the rename, inserts its contents and then deletes
+it. Any process can flush any spool file, so a flush always picks up events
+buffered by every worker, including those left behind by a process that
+crashed.
+
+Each record has a kind, e.g. its audit event type. Appending a record also
+creates an empty marker file for its kind, which a flush removes, so readers
+can cheaply check whether there are spooled records of the kinds they need,
+without reading the spool.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SUFFIX = ".jsonl"
+FLUSHING_SUFFIX = ".flushing"
+PENDING_SUFFIX = ".pending"
+
+Record = dict[str, Any]
+
+
+def _inode(path: Path) -> int | None:
+    try:
+        return path.stat().st_ino
+    except FileNotFoundError:
+        return None
+
+
+class AuditSpool:
+    """Buffers JSON-serialisable records on disk until they are flushed."""
+
+    def __init__(self):
+        # Tracks events written by this process since the last flush, used to
+        # decide when a flush is due. Other processes flushing our spool just
+        # means our next flush will find less to do.
+        self._pending = 0
+        self._oldest: float | None = None
+
+    @property
+    def directory(self) -> Path:
+        # Read on each use rather than cached, as tests use a different
+        # directory for each test.
+        return Path(settings.AUDIT_SPOOL_DIR)
+
+    def append(self, record: Record, kind: str) -> bool:
+        """Durably append a record of this kind to this process's spool.
+
+        Returns True if the spool is due to be flushed.
+        """
+        line = json.dumps(record) + "\n"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}{SPOOL_SUFFIX}"
+
+        while True:
+            with path.open("a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                # A flush may have claimed the file between us opening it and
+                # acquiring the lock, in which case we start a new one.
+                if os.fstat(f.fileno()).st_ino != _inode(path):
+                    continue
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                break
+
+        # after writing the record, so that a flush which removes the marker
+        # always claims the record too
+        self._marker(kind).touch()
+
+        now = time.monotonic()
+        self._pending += 1
+        if self._oldest is None:
+            self._oldest = now
+
+        return (
+            self._pending >= settings.AUDIT_SPOOL_MAX_EVENTS
+            or now - self._oldest >= settings.AUDIT_SPOOL_MAX_AGE
+        )
+
+    def has_pending(self, kinds: Iterable[str]) -> bool:
+        """Return whether records of any of these kinds may be spooled, by any
+        process.
+
+        Callers can use this to avoid a flush, and the database write it does,
+        when there is nothing they need in the spool.
+        """
+        return any(self._marker(kind).exists() for kind in kinds)
+
+    def _marker(self, kind: str) -> Path:
+        return self.directory / f"{kind}{PENDING_SUFFIX}"
+
+    def flush(self, insert: Callable[[list[Record]], None]) -> int:
+        """Pass all spooled records to insert(), and remove them from the spool.
+
+        Returns the number of records flushed.
+        """
+        self._pending = 0
+        self._oldest = None
+
+        if not self.directory.exists():
+            return 0
+
+        # before claiming the spool files, so that a record appended after we
+        # have claimed its file leaves its marker in place
+        for marker in self.directory.glob(f"*{PENDING_SUFFIX}"):
+            marker.unlink(missing_ok=True)
+
+        for path in self.directory.glob(f"*{SPOOL_SUFFIX}"):
+            claimed = path.with_name(f"{path.stem}-{uuid.uuid4().hex}{FLUSHING_SUFFIX}")
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                # another process claimed it first
+                continue
+
+        # This includes files claimed by other processes, including any that
+        # crashed part way through a flush.
+        return sum(
+            self._flush_file(path, insert)
+            for path in sorted(self.directory.glob(f"*{FLUSHING_SUFFIX}"))
+        )
+
+    def _flush_file(self, path: Path, insert: Callable[[list[Record]], None]) -> int:
+        try:
+            f = path.open()
+        except FileNotFoundError:
+            return 0
+
+        with f:
+            # Waits for any in-progress write, or another process flushing
+            # this file.
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_nlink == 0:
+                # already flushed by another process while we waited
+                return 0
+
+            records: list[Record] = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a partial line left by a process that crashed mid-write
+                    logger.warning(f"Skipping invalid audit spool line in {path}")
+
+            if records:
+                insert(records)
+            path.unlink()
+
+        return len(records)
@@ -1,4 +1,8 @@
+from datetime import datetime
+from typing import Any
+
 from django.db import transaction
+from django.db.models import Count, F
 from django.utils import timezone
 
 from airlock import exceptions, permissions
@@ -13,11 +17,13 @@ from airlock.enums import (
 )
 from airlock.models import AuditEvent
 from airlock.types import UrlPath
+from local_db.audit_spool import AuditSpool
 from local_db.models import (
     AuditLog,
     FileGroupComment,
     FileGroupMetadata,
     FileReview,
+    ReleasedFile,
     RequestFileMetadata,
     RequestMetadata,
 )
@@ -29,6 +35,9 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
     Implementation of DataAccessLayerProtocol using local_db models to store data
     """
 
+    def __init__(self):
+        self._audit_spool = AuditSpool()
+
     def create_release_request(
         self,
         workspace: str,
@@ -69,6 +78,17 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
     def get_release_request(self, request_id: str):
         return self._find_metadata(request_id).to_dict()
 
+    def get_release_request_version(self, request_id: str) -> tuple[str, int]:
+        try:
+            return RequestMetadata.objects.values_list("workspace", "version").get(
+                id=request_id
+            )
+        except RequestMetadata.DoesNotExist:
+            raise exceptions.ReleaseRequestNotFound(request_id)
+
+    def _bump_version(self, request_id: str):
+        RequestMetadata.objects.filter(id=request_id).update(version=F("version") + 1)
+
     def get_active_requests_for_workspace_by_user(self, workspace: str, user: User):
         # Requests in these statuses are still editable by either an
         # author or a reviewer, and are considered active
@@ -104,17 +124,30 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
 
     def get_released_files_for_workspace(self, workspace: str):
         return set(
-            RequestFileMetadata.objects.filter(
-                request__workspace=workspace, released_at__isnull=False
-            ).values_list("file_id", flat=True)
+            ReleasedFile.objects.filter(workspace=workspace).values_list(
+                "file_id", flat=True
+            )
         )
 
     def get_requests_by_status(self, *states: RequestStatus):
         return [
             metadata.to_dict()
-            for metadata in RequestMetadata.objects.filter(status__in=states)
+            for metadata in RequestMetadata.objects.filter(status__in=states).order_by(
+                "created_at"
+            )
         ]
 
+    def count_requests_by_status(self):
+        counts = RequestMetadata.objects.values("status").annotate(count=Count("id"))
+        return {row["status"]: row["count"] for row in counts}
+
+    def count_files_pending_upload(self):
+        return RequestFileMetadata.objects.filter(
+            request__status=RequestStatus.APPROVED,
+            released_at__isnull=False,
+            uploaded=False,
+        ).count()
+
     def set_status(self, request_id: str, status: RequestStatus, audit: AuditEvent):
         with transaction.atomic():
             # persist state change
@@ -123,6 +156,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             if status == RequestStatus.SUBMITTED:
                 metadata.last_submitted_at = audit.created_at
             metadata.save()
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def record_review(self, request_id: str, reviewer: User):
@@ -131,6 +165,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             metadata = self._find_metadata(request_id)
             metadata.submitted_reviews[reviewer.user_id] = timezone.now().isoformat()
             metadata.save()
+            self._bump_version(request_id)
 
     def start_new_turn(self, request_id: str):
         with transaction.atomic():
@@ -139,6 +174,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             metadata.submitted_reviews = {}
             metadata.review_turn += 1
             metadata.save()
+            self._bump_version(request_id)
 
     def add_file_to_request(
         self,
@@ -189,6 +225,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
                     f"(in file group '{existing_file.filegroup.name}')"
                 )
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
         # Return updated FileGroups data
@@ -219,6 +256,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
                 raise exceptions.FileNotFound(relpath)
 
             request_file.delete()
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
         # Return updated FileGroups data
@@ -247,6 +285,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             request_file.filetype = RequestFileType.WITHDRAWN
             request_file.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
         # Return updated FileGroups data
@@ -273,6 +312,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             request_file.filetype = filetype
             request_file.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
         # Return updated FileGroups data
         metadata = self._find_metadata(request_id)
@@ -291,7 +331,12 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             request_file.released_at = timezone.now()
             request_file.released_by = user.user_id
             request_file.save()
+            ReleasedFile.objects.get_or_create(
+                workspace=request_file.request.workspace,
+                file_id=request_file.file_id,
+            )
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def get_released_files_for_request(self, request_id: str):
@@ -309,6 +354,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             request_file.upload_attempts += 1
             request_file.upload_attempted_at = timezone.now()
             request_file.save()
+            self._bump_version(request_id)
         return request_file.to_dict()
 
     def register_file_upload(
@@ -324,6 +370,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             request_file.uploaded_at = timezone.now()
             request_file.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def approve_file(
@@ -348,6 +395,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             review.review_turn = review_turn
             review.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def request_changes_to_file(
@@ -370,6 +418,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             review.review_turn = review_turn
             review.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def reset_review_file(
@@ -388,6 +437,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
 
             review.delete()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def mark_file_undecided(
@@ -409,10 +459,11 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             review.review_turn = review_turn
             review.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
-    def _create_audit_log(self, audit: AuditEvent) -> AuditLog:
-        event = AuditLog.objects.create(
+    def _audit_log_fields(self, audit: AuditEvent) -> dict[str, Any]:
+        return dict(
             type=audit.type,
             user=audit.user.user_id,
             workspace=audit.workspace,
@@ -420,13 +471,55 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             path=str(audit.path) if audit.path else None,
             extra=audit.extra,
             created_at=audit.created_at,
+            review_turn=(
+                int(audit.extra["review_turn"])
+                if "review_turn" in audit.extra
+                else None
+            ),
+            group=audit.extra.get("group"),
         )
+
+    def _create_audit_log(self, audit: AuditEvent) -> AuditLog:
+        event = AuditLog.objects.create(**self._audit_log_fields(audit))
         return event
 
     def audit_event(self, audit: AuditEvent):
         with transaction.atomic():
+            if audit.request:
+                self._bump_version(audit.request)
             self._create_audit_log(audit)
 
+    # The read-only events that are buffered in the audit spool, rather than
+    # written as they happen
+    SPOOLED_EVENTS = {
+        AuditEventType.WORKSPACE_FILE_VIEW,
+        AuditEventType.REQUEST_FILE_VIEW,
+        AuditEventType.REQUEST_FILE_DOWNLOAD,
+    }
+
+    def buffer_audit_event(self, audit: AuditEvent):
+        record = self._audit_log_fields(audit)
+        record["type"] = audit.type.name
+        record["created_at"] = audit.created_at.isoformat()
+        if self._audit_spool.append(record, kind=audit.type.name):
+            self.flush_audit_events()
+
+    def flush_audit_events(self):
+        self._audit_spool.flush(self._insert_spooled_audit_logs)
+
+    def _insert_spooled_audit_logs(self, records: list[dict[str, Any]]):
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(
+                AuditLog(
+                    **{
+                        **record,
+                        "type": AuditEventType[record["type"]],
+                        "created_at": datetime.fromisoformat(record["created_at"]),
+                    }
+                )
+                for record in records
+            )
+
     def get_audit_log(
         self,
         user: str | None = None,
@@ -436,6 +529,13 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
         exclude: set[AuditEventType] | None = None,
         size: int | None = None,
     ) -> list[AuditEvent]:
+        # Ensure buffered events are included. Flushing takes the write lock,
+        # so we only do it if there are buffered events this query could
+        # return.
+        included = self.SPOOLED_EVENTS - (exclude or set())
+        if self._audit_spool.has_pending(event_type.name for event_type in included):
+            self.flush_audit_events()
+
         qs = AuditLog.objects.all().order_by("-created_at")
 
         # TODO: we probably will need pagination?
@@ -449,7 +549,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             qs = qs.filter(request=request)
 
         if group:
-            qs = qs.filter(extra__group=group)
+            qs = qs.filter(group=group)
 
         if exclude:
             qs = qs.exclude(type__in=exclude)
@@ -474,10 +574,13 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
         ]
 
     def hide_audit_events_for_turn(self, request_id: str, review_turn: int):
+        # ensure buffered events for this turn are also hidden
+        self.flush_audit_events()
         with transaction.atomic():
-            AuditLog.objects.filter(
-                request=request_id, extra__review_turn=str(review_turn)
-            ).update(hidden=True)
+            AuditLog.objects.filter(request=request_id, review_turn=review_turn).update(
+                hidden=True
+            )
+            self._bump_version(request_id)
 
     def _get_filegroup(self, request_id: str, group: str):
         try:
@@ -498,6 +601,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             filegroup.context = context
             filegroup.controls = controls
             filegroup.save()
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def group_comment_create(
@@ -521,6 +625,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
                 review_turn=review_turn,
             )
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def group_comment_delete(
@@ -548,6 +653,7 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
                 )
             comment.delete()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
 
     def group_comment_visibility_public(
@@ -581,4 +687,5 @@ class LocalDBDataAccessLayer(DataAccessLayerProtocol):
             comment.visibility = Visibility.PUBLIC
             comment.save()
 
+            self._bump_version(request_id)
             self._create_audit_log(audit)
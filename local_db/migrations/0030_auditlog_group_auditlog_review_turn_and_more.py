@@ -0,0 +1,50 @@
+# Generated by Django 6.0.7 on 2026-10-18 21:36
+
+from django.db import migrations, models
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+
+def backfill_review_turn_and_group(apps, schema_editor):  # pragma: no cover
+    AuditLog = apps.get_model("local_db", "AuditLog")
+
+    # KT() extracts a key from the json field, or NULL if it isn't present
+    AuditLog.objects.update(
+        review_turn=Cast(KT("extra__review_turn"), models.IntegerField()),
+        group=KT("extra__group"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("local_db", "0029_requestmetadata_last_submitted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="group",
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="review_turn",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["request", "review_turn"], name="local_db_au_request_27ea1d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["request", "group"], name="local_db_au_request_5aa493_idx"
+            ),
+        ),
+        migrations.RunPython(
+            code=backfill_review_turn_and_group,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
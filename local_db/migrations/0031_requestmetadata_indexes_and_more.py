@@ -0,0 +1,44 @@
+# Generated by Django 6.0.7 on 2026-10-18 21:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("local_db", "0030_auditlog_group_auditlog_review_turn_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="requestfilemetadata",
+            index=models.Index(
+                condition=models.Q(("released_at__isnull", False)),
+                fields=["request", "file_id"],
+                name="local_db_released_files_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestmetadata",
+            index=models.Index(
+                fields=["workspace", "author", "status"],
+                name="local_db_re_workspa_ce75a0_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestmetadata",
+            index=models.Index(
+                fields=["workspace", "created_at"],
+                name="local_db_re_workspa_8ac322_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestmetadata",
+            index=models.Index(
+                fields=["author", "status"], name="local_db_re_author_4422ce_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestmetadata",
+            index=models.Index(fields=["status"], name="local_db_re_status_6a82ce_idx"),
+        ),
+    ]
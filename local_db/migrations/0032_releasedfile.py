@@ -0,0 +1,50 @@
+# Generated by Django 6.0.7 on 2026-10-18 21:38
+
+from django.db import migrations, models
+
+
+def backfill_released_files(apps, schema_editor):  # pragma: no cover
+    RequestFileMetadata = apps.get_model("local_db", "RequestFileMetadata")
+    ReleasedFile = apps.get_model("local_db", "ReleasedFile")
+
+    released = (
+        RequestFileMetadata.objects.filter(released_at__isnull=False)
+        .values_list("request__workspace", "file_id")
+        .distinct()
+    )
+    ReleasedFile.objects.bulk_create(
+        ReleasedFile(workspace=workspace, file_id=file_id)
+        for workspace, file_id in released
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("local_db", "0031_requestmetadata_indexes_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReleasedFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("workspace", models.TextField()),
+                ("file_id", models.TextField()),
+            ],
+            options={
+                "unique_together": {("workspace", "file_id")},
+            },
+        ),
+        migrations.RunPython(
+            code=backfill_released_files,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
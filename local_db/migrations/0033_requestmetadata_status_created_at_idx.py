@@ -0,0 +1,22 @@
+# Generated by Django 6.0.7 on 2026-10-18 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("local_db", "0032_releasedfile"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="requestmetadata",
+            name="local_db_re_status_6a82ce_idx",
+        ),
+        migrations.AddIndex(
+            model_name="requestmetadata",
+            index=models.Index(
+                fields=["status", "created_at"], name="local_db_re_status_e27623_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.7 on 2026-10-19 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("local_db", "0033_requestmetadata_status_created_at_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="requestmetadata",
+            name="version",
+            field=models.IntegerField(default=0),
+        ),
+    ]
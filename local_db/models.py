@@ -99,6 +99,19 @@ class RequestMetadata(models.Model):
     # comma-separated list of submitted reviewers' user ids
     # we need to store this at the end of a turn
     turn_reviewers = models.TextField(null=True)
+    # incremented whenever the request, its files, or its audit log change, so
+    # that callers can cheaply tell if it has changed
+    version = models.IntegerField(default=0)
+
+    class Meta:
+        # These are designed around the DAL's queries, see
+        # tests/local_db/test_query_plans.py
+        indexes = [
+            models.Index(fields=["workspace", "author", "status"]),
+            models.Index(fields=["workspace", "created_at"]),
+            models.Index(fields=["author", "status"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
 
     def get_filegroups_to_dict(self):
         return {
@@ -123,6 +136,7 @@ class RequestMetadata(models.Model):
             turn_reviewers=set(self.turn_reviewers.split(","))
             if self.turn_reviewers
             else set(),
+            version=self.version,
         )
 
 
@@ -215,6 +229,15 @@ class RequestFileMetadata(models.Model):
 
     class Meta:
         unique_together = ("relpath", "request")
+        indexes = [
+            # Only released files, which are a small fraction of the table. This
+            # includes file_id so released file hashes can be read from the index.
+            models.Index(
+                fields=["request", "file_id"],
+                condition=models.Q(released_at__isnull=False),
+                name="local_db_released_files_idx",
+            ),
+        ]
 
     def to_dict(self):
         return dict(
@@ -239,6 +262,22 @@ class RequestFileMetadata(models.Model):
         )
 
 
+class ReleasedFile(models.Model):
+    """The id of a file that has been released from a workspace.
+
+    This duplicates data in RequestFileMetadata, but means we can look up all
+    the files released from a workspace from a single index, without joining
+    across all of its requests' files. It is kept up to date by the DAL's
+    release_file().
+    """
+
+    workspace = models.TextField()
+    file_id = models.TextField()
+
+    class Meta:
+        unique_together = ("workspace", "file_id")
+
+
 class FileReview(models.Model):
     """An output checker's review of a file"""
 
@@ -274,12 +313,18 @@ class AuditLog(models.Model):
     extra = models.JSONField(default=dict)
     created_at = models.DateTimeField(default=timezone.now)
     hidden = models.BooleanField(default=False)
+    # These are also present in extra, but are stored as columns so that we can
+    # index them
+    review_turn = models.IntegerField(null=True)
+    group = models.TextField(null=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["user"]),
             models.Index(fields=["workspace"]),
             models.Index(fields=["request"]),
+            models.Index(fields=["request", "review_turn"]),
+            models.Index(fields=["request", "group"]),
         ]
 
     # TODO: pretend to be append-only by overriding save() and delete()?
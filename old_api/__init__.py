@@ -3,13 +3,16 @@ import logging
 from datetime import UTC, datetime
 from pathlib import Path
 
-import requests
 from django.conf import settings
 
 from old_api.schema import FileList, FileMetadata, UrlFileName
+from services import http
 
 
-session = requests.Session()
+# seconds to wait for job-server to respond
+RELEASE_TIMEOUT = 15
+# job-server stores the file before responding
+UPLOAD_TIMEOUT = 300
 
 logger = logging.getLogger(__name__)
 
@@ -43,8 +46,12 @@ def create_filelist(paths, release_request):
 
 def get_or_create_release(workspace_name, release_request_id, release_json, username):
     """API call to job server to get or create a release."""
-    response = session.post(
+    # job-server returns the existing release if there is one, so this is
+    # safe to retry
+    response = http.post(
         url=f"{settings.AIRLOCK_API_ENDPOINT}/releases/workspace/{workspace_name}",
+        timeout=RELEASE_TIMEOUT,
+        retry=True,
         data=release_json,
         headers={
             "OS-User": username,
@@ -69,8 +76,11 @@ def get_or_create_release(workspace_name, release_request_id, release_json, user
 
 def upload_file(release_id, workspace, relpath, abspath, username):
     """Upload file to job server."""
-    response = session.post(
+    # Not retried here, as the file is streamed. The file uploader retries
+    # failed uploads itself.
+    response = http.post(
         url=f"{settings.AIRLOCK_API_ENDPOINT}/releases/release/{release_id}",
+        timeout=UPLOAD_TIMEOUT,
         data=abspath.open("rb"),
         headers={
             "OS-User": username,
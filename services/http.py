@@ -0,0 +1,123 @@
+"""
+A shared HTTP client for our calls to job-server.
+
+All calls have a timeout, so that a hung job-server can't hang our workers
+until gunicorn kills them. Connections are pooled and kept alive between calls.
+
+Calls which are safe to repeat can ask to be retried, with backoff, if they
+fail to connect or job-server is temporarily unavailable. A retrying call
+never takes longer than RETRY_DEADLINE in total.
+"""
+
+import time
+
+import requests
+from opentelemetry import trace
+from requests.adapters import HTTPAdapter
+
+from airlock import metrics
+
+
+# Time to wait for a connection to be established. The time to wait for a
+# response varies by endpoint, so is passed by the caller.
+CONNECT_TIMEOUT = 5
+
+# Each gunicorn worker is single threaded, but background threads also make
+# calls (e.g. user authz refreshes)
+POOL_SIZE = 4
+
+# Retrying calls make up to this many attempts, if they fail to connect or get
+# one of these statuses. We don't retry read timeouts, as job-server is
+# already slow, and retrying would only make us wait longer.
+RETRY_ATTEMPTS = 3
+RETRY_STATUSES = {502, 503, 504}
+# seconds to wait before the first retry, doubling for each one after
+RETRY_BACKOFF = 0.5
+# The most time a retrying call can take across all its attempts, including
+# backoff, so that it stays well under gunicorn's 30s worker timeout
+RETRY_DEADLINE = 20
+
+
+def _make_session() -> requests.Session:
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _make_session()
+
+
+def post(
+    url: str, *, timeout: float, retry: bool = False, **kwargs
+) -> requests.Response:
+    """POST to url, waiting at most timeout seconds for a response.
+
+    Only pass retry=True if the call is idempotent, and its data can be sent
+    more than once (i.e. is not a stream). Each attempt of a retrying call
+    waits at most timeout seconds, or whatever is left of RETRY_DEADLINE.
+    """
+    # The requests instrumentation records each attempt; this span covers all
+    # of them, including time spent backing off.
+    tracer = trace.get_tracer("http")
+    with tracer.start_as_current_span(
+        "http_post", attributes={"url": url, "timeout": timeout, "retry": retry}
+    ) as span:
+        start = time.monotonic()
+        # failed calls are recorded too, as they are often the slowest
+        status = "error"
+        try:
+            if retry:
+                response, attempts = _post_with_retry(url, timeout, **kwargs)
+            else:
+                response = session.post(
+                    url, timeout=(CONNECT_TIMEOUT, timeout), **kwargs
+                )
+                attempts = 1
+            status = str(response.status_code)
+        finally:
+            elapsed = time.monotonic() - start
+            metrics.OUTBOUND_HTTP_REQUEST_DURATION.observe(elapsed, status=status)
+        span.set_attribute("status_code", response.status_code)
+        span.set_attribute("attempts", attempts)
+        span.set_attribute("elapsed_ms", elapsed * 1000)
+        return response
+
+
+def _post_with_retry(
+    url: str, timeout: float, **kwargs
+) -> tuple[requests.Response, int]:
+    deadline = time.monotonic() + RETRY_DEADLINE
+    attempt = 1
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            response = session.post(
+                url,
+                timeout=(min(CONNECT_TIMEOUT, remaining), min(timeout, remaining)),
+                **kwargs,
+            )
+        except requests.ConnectionError:
+            # Note: this includes ConnectTimeout, but not ReadTimeout
+            if not _can_retry(attempt, deadline):
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or not _can_retry(
+                attempt, deadline
+            ):
+                return response, attempt
+
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+def _backoff(attempt: int) -> float:
+    return float(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+def _can_retry(attempt: int, deadline: float) -> bool:
+    # only retry if there is time left for another attempt after backing off
+    return attempt < RETRY_ATTEMPTS and time.monotonic() + _backoff(attempt) < deadline
@@ -0,0 +1,112 @@
+"""
+Memory telemetry, to find out which requests make our workers grow.
+
+For each measured block, we record the change in the process's resident set
+size (RSS), which is what the OS sees, and the peak memory allocated by Python
+during the block, from tracemalloc, which catches short lived allocations that
+RSS doesn't show.
+
+tracemalloc slows down every allocation, so this is opt-in. The peak is per
+process, so it is only accurate when each process handles one request at a
+time, as our gunicorn sync workers do.
+"""
+
+import os
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+
+# frames of traceback tracemalloc records for each allocation
+TRACEBACK_FRAMES = 5
+
+
+def rss_bytes() -> int | None:
+    """The process's current resident set size, or None if we can't tell."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:  # pragma: nocover
+        # not linux
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class MemoryUsage:
+    rss_before: int | None = None
+    rss_after: int | None = None
+    # peak bytes allocated during the block, above what was allocated before it
+    peak_allocated: int = 0
+
+    @property
+    def rss_delta(self) -> int | None:
+        if self.rss_before is None or self.rss_after is None:  # pragma: nocover
+            return None
+        return self.rss_after - self.rss_before
+
+    def attributes(self) -> dict[str, int]:
+        attributes = {"memory.peak_allocated_bytes": self.peak_allocated}
+        if self.rss_after is not None:  # pragma: no branch
+            attributes["memory.rss_bytes"] = self.rss_after
+        rss_delta = self.rss_delta
+        if rss_delta is not None:  # pragma: no branch
+            attributes["memory.rss_delta_bytes"] = rss_delta
+        return attributes
+
+
+@contextmanager
+def measure() -> Iterator[MemoryUsage]:
+    """Measure the memory used by the block, starting tracemalloc if needed."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEBACK_FRAMES)
+
+    usage = MemoryUsage(rss_before=rss_bytes())
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    try:
+        yield usage
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        usage.peak_allocated = max(peak - before, 0)
+        usage.rss_after = rss_bytes()
+
+
+class Snapshotter:
+    """Periodically write the top allocating lines of code to a file.
+
+    Call maybe_snapshot() regularly, e.g. after each request; it takes a
+    snapshot the first time, and then once interval seconds have passed since
+    the last one.
+    """
+
+    def __init__(self, directory: Path, interval: float, top: int = 25):
+        self.directory = directory
+        self.interval = interval
+        self.top = top
+        self.last: float | None = None
+
+    def maybe_snapshot(self) -> Path | None:
+        now = time.monotonic()
+        if not tracemalloc.is_tracing():
+            return None
+        if self.last is not None and now - self.last < self.interval:
+            return None
+        self.last = now
+        return self.snapshot()
+
+    def snapshot(self) -> Path:
+        statistics = tracemalloc.take_snapshot().statistics("traceback")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = time.strftime("%Y%m%dT%H%M%S")
+        path = self.directory / f"{timestamp}-{os.getpid()}.txt"
+
+        lines = [f"rss: {rss_bytes()} bytes", ""]
+        for stat in statistics[: self.top]:
+            lines.append(f"{stat.size} bytes in {stat.count} blocks")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        path.write_text("\n".join(lines) + "\n")
+        return path
@@ -0,0 +1,218 @@
+"""
+A small metrics registry, exposed in Prometheus's text format.
+
+Each gunicorn worker, and the file uploader, is a separate process, so each
+keeps its metrics in memory, and writes them to its own file in a shared
+directory when flush() is called. Exposing the metrics adds up the files from
+every process. This is the same approach as prometheus_client's multiprocess
+mode, without the dependency.
+
+Values that are cheaper to read when scraped than to keep up to date, like
+the number of requests in each status, are provided by collectors.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+
+# (sample name, sorted (label, value) pairs)
+SampleKey = tuple[str, tuple[tuple[str, str], ...]]
+# (metric name, documentation, kind, [(sample name, labels, value)])
+Family = tuple[str, str, str, list[tuple[str, dict[str, str], float]]]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], Iterable[Family]]] = []
+        self._values: dict[SampleKey, float] = defaultdict(float)
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def register(self, metric: "Metric"):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a function that returns metrics when they are scraped."""
+        self.collectors.append(collector)
+
+    def add(self, key: SampleKey, amount: float):
+        with self._lock:
+            self._values[key] += amount
+            self._dirty = True
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._dirty = True
+
+    def flush(self, directory: Path):
+        """Write this process's values to its file, if they have changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            samples = [
+                [name, labels, value] for (name, labels), value in self._values.items()
+            ]
+            self._dirty = False
+
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        # write then rename, so the endpoint never reads a partial file
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(samples))
+        tmp_path.replace(path)
+
+    def remove_dead(self, directory: Path):
+        """Remove the files written by processes that are no longer running.
+
+        Their values would otherwise be included forever.
+        """
+        for path in directory.glob("*.json"):
+            try:
+                os.kill(int(path.stem), 0)
+            except ProcessLookupError:
+                path.unlink(missing_ok=True)
+            except (ValueError, PermissionError):
+                # not a pid, or a process we can't signal, but which exists
+                continue
+
+    def read(self, directory: Path) -> dict[SampleKey, float]:
+        """Add up the values written by every process."""
+        totals: dict[SampleKey, float] = defaultdict(float)
+        for path in directory.glob("*.json"):
+            try:
+                samples = json.loads(path.read_text())
+            except (OSError, ValueError):  # pragma: nocover
+                # removed, or from an older version
+                continue
+            for name, labels, value in samples:
+                totals[(name, tuple(tuple(pair) for pair in labels))] += value
+        return totals
+
+    def expose(self, directory: Path) -> str:
+        """Return every process's metrics, in Prometheus's text format."""
+        self.flush(directory)
+        totals = self.read(directory)
+
+        lines = []
+        for metric in self.metrics.values():
+            samples = [
+                (name, dict(labels), value)
+                for (name, labels), value in sorted(totals.items(), key=sample_order)
+                if metric.owns(name)
+            ]
+            lines.extend(
+                format_family(metric.name, metric.documentation, metric.kind, samples)
+            )
+
+        for collector in self.collectors:
+            for family in collector():
+                lines.extend(format_family(*family))
+
+        return "\n".join(lines) + "\n"
+
+
+def sample_order(item: tuple[SampleKey, float]):
+    # histogram buckets are ordered by their upper bound, rather than as strings
+    (name, labels), _ = item
+    bound = dict(labels).get("le")
+    others = tuple(pair for pair in labels if pair[0] != "le")
+    return (name, others, float(bound) if bound else 0.0)
+
+
+def format_family(name, documentation, kind, samples) -> list[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for sample_name, labels, value in samples:
+        lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+    return lines
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{escape(str(value))}"' for key, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.registry = registry
+        registry.register(self)
+
+    def owns(self, sample_name: str) -> bool:
+        return sample_name == self.name
+
+    def label_pairs(self, labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {labels}")
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry.add((self.name, self.label_pairs(labels)), amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def owns(self, sample_name: str) -> bool:
+        return sample_name in (
+            f"{self.name}_bucket",
+            f"{self.name}_sum",
+            f"{self.name}_count",
+        )
+
+    def observe(self, value: float, **labels):
+        pairs = self.label_pairs(labels)
+        # buckets are cumulative, so the value counts in every bucket it fits
+        for bound in self.buckets:
+            if value <= bound:
+                le = (("le", format_value(bound)),)
+                self.registry.add((f"{self.name}_bucket", pairs + le), 1)
+        self.registry.add((f"{self.name}_sum", pairs), value)
+        self.registry.add((f"{self.name}_count", pairs), 1)
@@ -0,0 +1,112 @@
+"""
+A sampling profiler, to find out where the time goes in slow requests and
+uploads in production, where we can't attach a debugger.
+
+While a profiled block runs, a background thread samples the stack of the
+thread running it every interval seconds. If the block takes longer than the
+threshold, the samples are saved in collapsed stack format (one
+"frame;frame;frame count" line per unique stack), which can be opened in
+https://www.speedscope.app or turned into a flamegraph, and the file's path
+is added to the current span.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from opentelemetry import trace
+
+
+DEFAULT_INTERVAL = 0.005
+# only keep this many profiles, deleting the oldest
+MAX_PROFILES = 100
+
+
+class Sampler:
+    """Samples the stack of a thread, from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:  # pragma: no branch
+                self.stacks[collapse(frame)] += 1
+
+
+def collapse(frame) -> str:
+    """Return the stack ending at frame, outermost first, separated by ;"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def save(directory: Path, name: str, duration: float, stacks: Counter[str]) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^\w.-]+", "_", name).strip("_")[:100]
+    timestamp = time.strftime("%Y%m%dT%H%M%S")
+    path = directory / (
+        f"{timestamp}-{os.getpid()}-{slug}-{duration * 1000:.0f}ms.collapsed.txt"
+    )
+    path.write_text(
+        "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    )
+
+    profiles = sorted(directory.glob("*.collapsed.txt"), key=os.path.getmtime)
+    for old in profiles[:-MAX_PROFILES]:
+        old.unlink(missing_ok=True)
+
+    return path
+
+
+@contextmanager
+def profile(
+    name: str,
+    threshold: float | None,
+    directory: Path,
+    interval: float = DEFAULT_INTERVAL,
+) -> Iterator[None]:
+    """Profile the block, and save the profile if it takes at least threshold
+    seconds. Does nothing if threshold is None.
+    """
+    if threshold is None:
+        yield
+        return
+
+    sampler = Sampler(threading.get_ident(), interval)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        stacks = sampler.stop()
+        if duration >= threshold and stacks:
+            path = save(directory, name, duration, stacks)
+            span = trace.get_current_span()
+            span.set_attribute("profile.path", str(path))
+            span.set_attribute("profile.samples", stacks.total())
@@ -9,6 +9,10 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
 
+# marks a parameter that wasn't passed, and has no default
+_MISSING = object()
+
+
 def get_provider():
     # https://github.com/open-telemetry/semantic-conventions/tree/main/docs/resource#service
     resource = Resource.create(
@@ -104,64 +108,80 @@ def instrument(
             os.environ.get("OTEL_SERVICE_NAME", "airlock")
         )
         name = span_name or func.__qualname__
-        attributes_dict = attributes or {}
         func_signature = signature(func)
         default_params = {
             param_name: param.default
             for param_name, param in func_signature.parameters.items()
             if param and param.default is not Parameter.empty
         }
-
-        @wraps(func)
-        def wrap_with_span(*args, **kwargs):
-            bound_args = func_signature.bind(*args, **kwargs).arguments
-            if "request" in bound_args:
-                user = bound_args["request"].user
+        # work out where each parameter is in the positional args now, rather
+        # than binding the arguments on every call
+        positions = {
+            param_name: index
+            for index, (param_name, param) in enumerate(
+                func_signature.parameters.items()
+            )
+            if param.kind
+            in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+        }
+        has_request = "request" in func_signature.parameters
+
+        def get_argument(parameter_name, args, kwargs):
+            # Find the value of this parameter by (in order):
+            # 1) the function kwargs directly; if a function signature takes a parameter
+            # like `**kwargs`, we can retrieve a named parameter from the keyword arguments
+            # there
+            # 2) the positional args, if it was passed positionally
+            # 3) the parameter default value, if there is one
+            if parameter_name in kwargs:
+                return kwargs[parameter_name]
+            index = positions.get(parameter_name)
+            if index is not None and index < len(args):
+                return args[index]
+            return default_params.get(parameter_name, _MISSING)
+
+        def get_attributes(args, kwargs):
+            # a new dict for each call, as calls may be concurrent
+            span_attributes = dict(attributes or {})
+            if has_request:
+                user = get_argument("request", args, kwargs).user
                 if user and user.is_authenticated:
-                    attributes_dict["user_id"] = user.user_id
-                    attributes_dict["username"] = user.username
+                    span_attributes["user_id"] = user.user_id
+                    span_attributes["username"] = user.username
                 else:  # pragma: nocover
-                    attributes_dict["user_id"] = "anonymous"
-                    attributes_dict["username"] = "anonymous"
-
-            if func_attributes is not None:
-                bound_args = func_signature.bind(*args, **kwargs).arguments
-                for attribute, parameter_name in func_attributes.items():
-                    # Find the value of this parameter by(in order):
-                    # 1) the function kwargs directly; if a function signature takes a parameter
-                    # like `**kwargs`, we can retrieve a named parameter from the keyword arguments
-                    # there
-                    # 2) the bound args retrieved from the function signature; this will find any
-                    # explicity passed values when the function was called.
-                    # 3) the parameter default value, if there is one
+                    span_attributes["user_id"] = "anonymous"
+                    span_attributes["username"] = "anonymous"
+
+            for attribute, parameter_name in (func_attributes or {}).items():
+                func_arg = get_argument(parameter_name, args, kwargs)
+                if func_arg is _MISSING:
                     # 4) the attribute on the class instance, if there is one
-                    # 5) Finally, raises an exception if we can't find a value for the expected parameter
-                    if parameter_name in kwargs:
-                        func_arg = kwargs[parameter_name]
-                    elif parameter_name in bound_args:
-                        func_arg = bound_args[parameter_name]
-                    elif parameter_name in default_params:
-                        func_arg = default_params[parameter_name]
-                    elif "self" in bound_args and hasattr(
-                        bound_args["self"], parameter_name
-                    ):
-                        func_arg = getattr(bound_args["self"], parameter_name)
-                    else:
+                    instance = get_argument("self", args, kwargs)
+                    if instance is _MISSING or not hasattr(instance, parameter_name):
+                        # 5) Finally, raises an exception if we can't find a value
+                        # for the expected parameter
                         raise AttributeError(
                             f"Expected argument {parameter_name} not found in function signature"
                         )
-                    attributes_dict[attribute] = str(func_arg)
+                    func_arg = getattr(instance, parameter_name)
+                span_attributes[attribute] = str(func_arg)
 
-            # Add attributes to the current (parent) span before we start the child span
-            span = trace.get_current_span()
-            span.set_attributes(attributes_dict)
+            return span_attributes
 
+        @wraps(func)
+        def wrap_with_span(*args, **kwargs):
+            parent = trace.get_current_span()
             with tracer.start_as_current_span(
                 name,
                 set_status_on_exception=set_status_on_exception,
                 record_exception=record_exception,
-                attributes=attributes_dict,
-            ):
+            ) as span:
+                # don't bother working out the attributes if no one will see them
+                if span.is_recording():
+                    span_attributes = get_attributes(args, kwargs)
+                    # Add attributes to the current (parent) span too
+                    parent.set_attributes(span_attributes)
+                    span.set_attributes(span_attributes)
                 return func(*args, **kwargs)
 
         return wrap_with_span
@@ -10,6 +10,8 @@ import airlock.business_logic
 import old_api
 import services.tracing as tracing
 import tests.factories
+from airlock import file_browser_api
+from services import metrics
 
 
 # set up tracing for tests
@@ -29,6 +31,16 @@ def clear_all_traces():
     test_exporter.clear()
 
 
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.REGISTRY.reset()
+
+
+@pytest.fixture(autouse=True)
+def clear_tree_fragments():
+    file_browser_api.tree_fragments.clear()
+
+
 # mark every test with django_db
 def pytest_collection_modifyitems(config, items):
     for item in items:
@@ -50,6 +62,11 @@ def temp_test_settings(settings, tmp_path):
     settings.WORKSPACE_DIR = tmp_path / "workspaces"
     settings.REQUEST_DIR = tmp_path / "requests"
     settings.GIT_REPO_DIR = tmp_path / "repos"
+    settings.AUDIT_SPOOL_DIR = tmp_path / "audit_spool"
+    settings.PROFILE_DIR = tmp_path / "profiles"
+    settings.MEMORY_SNAPSHOT_DIR = tmp_path / "memory_snapshots"
+    settings.METRICS_DIR = tmp_path / "metrics"
+    settings.GENERATIONS_FILE = tmp_path / "workspace-generations.json"
     settings.WORKSPACE_DIR.mkdir(parents=True)
     settings.REQUEST_DIR.mkdir(parents=True)
     settings.GIT_REPO_DIR.mkdir(parents=True)
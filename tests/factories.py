@@ -3,11 +3,14 @@ import json
 import subprocess
 import tempfile
 import typing
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from hashlib import file_digest, sha256
 from pathlib import Path
 
 from django.conf import settings
+from django.db import connection
+from django.utils import timezone
 
 from airlock import exceptions
 from airlock.business_logic import bll
@@ -26,6 +29,7 @@ from airlock.models import (
     Workspace,
 )
 from airlock.types import UrlPath
+from local_db import models
 from users.models import User
 
 
@@ -913,3 +917,74 @@ def delete_workspace_files(workspace):
         filepath.rmdir()
 
     assert not list(non_metadata_workspace_filepaths(workspace))
+
+
+def seed_requests(author: str, count: int, files_per_request: int):
+    """Bulk create count requests, each with files_per_request files.
+
+    This is much faster than creating them via the bll, for tests and
+    benchmarks that need a realistically sized database.
+    """
+    # most requests in a long-running backend have been released
+    statuses = list(RequestStatus) + [RequestStatus.RELEASED] * 20
+    authors = [author] + [f"other-user{i}" for i in range(19)]
+
+    requests = models.RequestMetadata.objects.bulk_create(
+        models.RequestMetadata(
+            id=f"request{i}",
+            workspace=f"workspace{i % 50}",
+            author=authors[i % len(authors)],
+            status=statuses[i % len(statuses)],
+        )
+        for i in range(count)
+    )
+    groups = models.FileGroupMetadata.objects.bulk_create(
+        models.FileGroupMetadata(request=request, name="group") for request in requests
+    )
+    files = models.RequestFileMetadata.objects.bulk_create(
+        models.RequestFileMetadata(
+            request=group.request,
+            filegroup=group,
+            relpath=f"output/file{i}.csv",
+            file_id=f"hash{group.request.id}-{i}",
+            timestamp=0,
+            size=1,
+            job_id="job",
+            commit="abcdefgh" * 5,
+            repo="http://example.com/org/repo",
+            # most files in a request are never released
+            released_at=timezone.now() if i % 10 == 0 else None,
+        )
+        for group in groups
+        for i in range(files_per_request)
+    )
+
+    models.ReleasedFile.objects.bulk_create(
+        models.ReleasedFile(workspace=f.request.workspace, file_id=f.file_id)
+        for f in files
+        if f.released_at
+    )
+
+    # give the query planner realistic statistics
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+@contextmanager
+def seeded_db(django_db_blocker, username: str, count: int, files_per_request: int):
+    """Seed the database with requests authored by a new user, for a module
+    scoped fixture, and remove them afterwards.
+
+    Seeding takes a while, so this is done once, outside of each test's
+    transaction.
+    """
+    with django_db_blocker.unblock():
+        user = create_airlock_user(username=username)
+        seed_requests(user.user_id, count, files_per_request)
+
+    yield user
+
+    with django_db_blocker.unblock():
+        models.ReleasedFile.objects.all().delete()
+        models.RequestMetadata.objects.all().delete()
+        user.delete()
@@ -17,7 +17,7 @@ from hypothesis.strategies import (
 )
 
 
-def _records_to_csv(rows, lineterminator):
+def records_to_csv(rows, lineterminator="\n"):
     """
     Convert the results into a csv string
     """
@@ -136,7 +136,7 @@ def csv_file(
     # Whether the line terminator is \r\n (excel, windows) or \n (linux/unix)
     lineterminator = draw(sampled_from(["\r\n", "\n"]))
 
-    return _records_to_csv(
+    return records_to_csv(
         rows=rows,
         lineterminator=lineterminator,
     )
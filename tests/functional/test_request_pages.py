@@ -1132,11 +1132,14 @@ def test_request_uploaded_files_counts(
     uploaded_files_count_el = page.locator("#uploaded-files-count")
     uploaded_files_count_parent_el = uploaded_files_count_el.locator("..")
 
+    # the poll url includes the request's version
+    poll_url = re.compile(
+        re.escape(release_request.uploaded_files_count_url()) + r"\?version=\d+"
+    )
+
     def assert_still_uploading(uploaded_count):
         expect(uploaded_files_count_el).to_contain_text(str(uploaded_count))
-        expect(uploaded_files_count_parent_el).to_have_attribute(
-            "hx-get", release_request.uploaded_files_count_url()
-        )
+        expect(uploaded_files_count_parent_el).to_have_attribute("hx-get", poll_url)
 
     assert_still_uploading(0)
 
@@ -1174,9 +1177,7 @@ def test_request_uploaded_files_counts(
     # htmx attributes on the parent element anymore
     # the release files button is not visible because the release is now complete
     expect(uploaded_files_count_el).to_contain_text("3")
-    expect(uploaded_files_count_parent_el).not_to_have_attribute(
-        "hx-get", release_request.uploaded_files_count_url()
-    )
+    expect(uploaded_files_count_parent_el).not_to_have_attribute("hx-get", poll_url)
 
 
 def test_file_browser_expand_collapse(live_server, page, context):
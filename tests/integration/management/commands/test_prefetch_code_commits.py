@@ -0,0 +1,167 @@
+import json
+import shutil
+from collections import OrderedDict
+from unittest.mock import Mock, patch
+
+import pytest
+from django.core.management import call_command
+
+from airlock.lib import git
+from airlock.management.commands import prefetch_code_commits
+from airlock.management.commands.prefetch_code_commits import (
+    FailedCommits,
+    ManifestScanner,
+)
+from tests import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+def write_manifest(settings, workspace, content):
+    manifest_path = settings.WORKSPACE_DIR / workspace / "metadata/manifest.json"
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(content)
+    return manifest_path
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    # a local repo standing in for GitHub
+    repo = factories.create_repo("workspace")
+    # create_repo has already fetched the commit, so start with an empty local
+    # copy, as if it was new
+    local_repo_dir = git.get_local_repo_dir(repo.repo)
+    # the cat-file process would still be reading the deleted repo
+    git.get_cat_file_batch(local_repo_dir)._stop()
+    shutil.rmtree(local_repo_dir)
+    monkeypatch.setattr(git, "_fetched_commits", OrderedDict())
+    monkeypatch.setattr(git, "_repo_trees", OrderedDict())
+    return repo
+
+
+def test_prefetch_code_commits(repo, settings, caplog):
+    settings.CODE_PREFETCH_DELAY = 0
+    bad_commit = "0" * 40
+    write_manifest(
+        settings,
+        "other",
+        json.dumps({"outputs": {"foo.txt": {"repo": repo.repo, "commit": bad_commit}}}),
+    )
+
+    run_fn = Mock(side_effect=[True, True, False])
+    call_command("prefetch_code_commits", run_fn=run_fn)
+
+    local_repo_dir = git.get_local_repo_dir(repo.repo)
+    assert git.commit_already_fetched(local_repo_dir, repo.commit)
+    assert (local_repo_dir / git.TREE_CACHE_DIR / f"{repo.commit}.json").exists()
+
+    # the good commit is fetched once, the bad one is retried on each loop
+    assert caplog.text.count(f"Prefetched {repo.repo} @ {repo.commit}") == 1
+    assert caplog.text.count(f"Could not prefetch {repo.repo} @ {bad_commit}") == 2
+
+
+def test_prefetch_code_commits_backs_off_failed_commits(repo, settings, caplog):
+    settings.CODE_PREFETCH_DELAY = 10
+    bad_commit = "0" * 40
+    write_manifest(
+        settings,
+        "other",
+        json.dumps({"outputs": {"foo.txt": {"repo": repo.repo, "commit": bad_commit}}}),
+    )
+
+    with patch.object(prefetch_code_commits, "time") as mock_time:
+        mock_time.monotonic.return_value = 100.0
+        run_fn = Mock(side_effect=[True, True, False])
+        call_command("prefetch_code_commits", run_fn=run_fn)
+
+    # the second loop is within the retry delay, so doesn't try again
+    assert caplog.text.count(f"Could not prefetch {repo.repo} @ {bad_commit}") == 1
+
+
+def test_prefetch_code_commits_groups_by_repo(settings):
+    settings.CODE_PREFETCH_DELAY = 0
+    write_manifest(
+        settings,
+        "workspace",
+        json.dumps(
+            {
+                "outputs": {
+                    "a.txt": {"repo": "repo1", "commit": "abc"},
+                    "b.txt": {"repo": "repo1", "commit": "def"},
+                    "c.txt": {"repo": "repo2", "commit": "ghi"},
+                },
+            }
+        ),
+    )
+
+    calls = []
+
+    def prefetch_repo_commits(repo, commits):
+        calls.append((repo, commits))
+        return {commit: True for commit in commits}
+
+    with patch.object(
+        prefetch_code_commits, "prefetch_repo_commits", prefetch_repo_commits
+    ):
+        run_fn = Mock(side_effect=[True, True, False])
+        call_command("prefetch_code_commits", run_fn=run_fn)
+
+    # one task per repo, and fetched commits are not fetched again
+    assert sorted(calls) == [("repo1", ["abc", "def"]), ("repo2", ["ghi"])]
+
+
+def test_failed_commits():
+    failed = FailedCommits(delay=10)
+    key = ("repo", "abc")
+    assert failed.waiting(0) == set()
+
+    failed.add(key, now=0)
+    assert failed.waiting(9) == {key}
+    assert failed.waiting(10) == set()
+
+    # the delay doubles with each failure
+    failed.add(key, now=10)
+    assert failed.waiting(29) == {key}
+    assert failed.waiting(30) == set()
+
+    # up to a maximum
+    for _ in range(20):
+        failed.add(key, now=0)
+    assert failed.waiting(prefetch_code_commits.MAX_RETRY_DELAY) == set()
+
+    failed.remove(key)
+    assert failed.waiting(0) == set()
+
+
+def test_manifest_scanner(settings, caplog):
+    scanner = ManifestScanner()
+    assert scanner.scan() == set()
+
+    manifest_path = write_manifest(
+        settings,
+        "workspace",
+        json.dumps(
+            {
+                "repo": None,
+                "outputs": {
+                    "a.txt": {"repo": "repo1", "commit": "abc"},
+                    "b.txt": {"repo": "repo1", "commit": "abc"},
+                    "c.txt": {"repo": "repo2", "commit": "def"},
+                    "d.txt": {"repo": None, "commit": None},
+                },
+            }
+        ),
+    )
+    write_manifest(settings, "broken", "{not json")
+
+    assert scanner.scan() == {("repo1", "abc"), ("repo2", "def")}
+    assert "Could not read manifest" in caplog.text
+
+    # unchanged manifests are not re-read
+    caplog.clear()
+    assert scanner.scan() == {("repo1", "abc"), ("repo2", "def")}
+    assert "Could not read manifest" not in caplog.text
+
+    manifest_path.unlink()
+    assert scanner.scan() == set()
@@ -8,6 +8,7 @@ from airlock.enums import AuditEventType, RequestStatus
 from airlock.management.commands.run_file_uploader import do_upload_task
 from airlock.types import UrlPath
 from old_api import FileUploadError
+from services import metrics
 from tests import factories
 from tests.conftest import get_trace
 
@@ -157,6 +158,55 @@ def test_run_file_uploader_command(upload_files_stubber, bll):
     }
 
 
+def test_run_file_uploader_command_profiling(upload_files_stubber, bll, settings):
+    settings.PROFILE_THRESHOLD = 0
+    settings.PROFILE_INTERVAL = 0.001
+    setup_release_request(upload_files_stubber, bll)
+
+    run_fn = Mock(side_effect=[True, False])
+    call_command("run_file_uploader", run_fn=run_fn)
+
+    profiles = list(settings.PROFILE_DIR.iterdir())
+    uploads = [span for span in get_trace() if span.name == "file_uploader"]
+    assert len(uploads) == 3
+    # uploads may be too quick to be sampled, and have no profile
+    assert {
+        span.attributes["profile.path"]
+        for span in uploads
+        if "profile.path" in span.attributes
+    } == {str(path) for path in profiles}
+
+
+def test_run_file_uploader_command_metrics(upload_files_stubber, bll, settings):
+    release_request, _ = setup_release_request(
+        upload_files_stubber, bll, response_statuses=[201, 500, 201]
+    )
+    assert bll.get_pending_upload_count() == 3
+
+    run_fn = Mock(side_effect=[True, False])
+    call_command("run_file_uploader", run_fn=run_fn)
+
+    assert bll.get_pending_upload_count() == 1
+    values = metrics.REGISTRY.read(settings.METRICS_DIR)
+    assert values[("airlock_file_uploads_total", (("outcome", "success"),))] == 2
+    assert values[("airlock_file_uploads_total", (("outcome", "error"),))] == 1
+    assert values[("airlock_file_upload_duration_seconds_count", ())] == 3
+    assert ("airlock_file_upload_retries_total", ()) not in values
+
+
+def test_run_file_uploader_command_metrics_retries(upload_files_stubber, bll, settings):
+    settings.UPLOAD_RETRY_DELAY = 0
+    setup_release_request(
+        upload_files_stubber, bll, response_statuses=[500, 201, 201, 201]
+    )
+
+    run_fn = Mock(side_effect=[True, True, False])
+    call_command("run_file_uploader", run_fn=run_fn)
+
+    values = metrics.REGISTRY.read(settings.METRICS_DIR)
+    assert values[("airlock_file_upload_retries_total", ())] == 1
+
+
 @patch("airlock.management.commands.run_file_uploader.time.sleep")
 def test_run_file_uploader_command_no_tasks(mock_sleep, settings):
     run_fn = Mock(side_effect=[True, False])
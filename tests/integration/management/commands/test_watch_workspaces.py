@@ -0,0 +1,41 @@
+import json
+from unittest.mock import Mock
+
+from django.core.management import call_command
+
+from airlock.lib import generations
+from airlock.lib.generations import ROOT
+
+
+def test_watch_workspaces(settings, monkeypatch):
+    monkeypatch.setattr(generations, "HEARTBEAT_INTERVAL", 0.1)
+    workspace_dir = settings.WORKSPACE_DIR
+
+    def run():
+        # make changes on each loop, for the watcher to see
+        if run_fn.call_count == 1:
+            (workspace_dir / "workspace").mkdir()
+        elif run_fn.call_count == 2:
+            (workspace_dir / "workspace/metadata").mkdir()
+        return run_fn.call_count <= 3
+
+    run_fn = Mock(side_effect=run)
+    call_command("watch_workspaces", run_fn=run_fn)
+
+    data = json.loads(settings.GENERATIONS_FILE.read_text())
+    assert data["generations"] == {ROOT: 1, "workspace": 2}
+    assert generations.get_token("workspace") == f"{data['epoch']}:2"
+
+
+def test_watch_workspaces_polling(settings, monkeypatch, caplog):
+    def load_libc():
+        raise OSError("no inotify")
+
+    monkeypatch.setattr(generations, "_load_libc", load_libc)
+    settings.WORKSPACE_WATCHER_POLL_INTERVAL = 0
+    run_fn = Mock(side_effect=[True, False])
+    call_command("watch_workspaces", run_fn=run_fn)
+
+    assert "using PollingWatcher" in caplog.text
+    data = json.loads(settings.GENERATIONS_FILE.read_text())
+    assert data["generations"] == {}
@@ -1,13 +1,21 @@
 import time
+import tracemalloc
 
 import pytest
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
 from django.urls import path
 from opentelemetry import trace
 
+from airlock import metrics
 from airlock.exceptions import RequestTimeout
+from airlock.middleware import QueryRecorder, SessionRefreshMiddleware
 from airlock.views.helpers import login_exempt
+from services.metrics import REGISTRY
 from tests import factories
 from tests.conftest import get_trace
+from users import auth
+from users.models import User
 
 
 @pytest.mark.django_db
@@ -21,7 +29,7 @@ def test_middleware_expired_user_prod(airlock_client, settings, auth_api_stubber
     refresh = user.last_refresh
 
     # skip some time
-    user.last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_TIMEOUT)
+    user.last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_HARD_TIMEOUT)
     user.save()
 
     new_workspaces = user.workspaces.copy()
@@ -56,7 +64,7 @@ def test_middleware_expired_user_dev(airlock_client, settings):
     refresh = user.last_refresh
 
     # skip some time
-    user.last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_TIMEOUT)
+    user.last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_HARD_TIMEOUT)
     user.save()
 
     response = airlock_client.get("/workspaces/view/workspace/")
@@ -68,7 +76,7 @@ def test_middleware_expired_user_dev(airlock_client, settings):
 
 @pytest.mark.django_db
 def test_middleware_expired_error(airlock_client, settings, auth_api_stubber):
-    last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_TIMEOUT)
+    last_refresh = time.time() - (2 * settings.AIRLOCK_AUTHZ_HARD_TIMEOUT)
     user = factories.create_airlock_user(last_refresh=last_refresh)
     airlock_client.login_with_user(user)
     auth_api_stubber("authorise", status=500)
@@ -76,6 +84,91 @@ def test_middleware_expired_error(airlock_client, settings, auth_api_stubber):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_middleware_stale_user_refreshed_in_background(
+    airlock_client, settings, auth_api_stubber, monkeypatch
+):
+    # run the background refresh immediately
+    monkeypatch.setattr(
+        auth.background_refresher, "submit", lambda user_id, fn: bool(fn())
+    )
+    user = factories.create_airlock_user(
+        last_refresh=time.time() - (2 * settings.AIRLOCK_AUTHZ_TIMEOUT)
+    )
+    airlock_client.login_with_user(user)
+    factories.create_workspace("new_workspace")
+    refresh = user.last_refresh
+
+    new_workspaces = user.workspaces.copy()
+    new_workspaces["new_workspace"] = factories.create_api_workspace()
+    auth_api_stubber(
+        "authorise",
+        json={
+            "username": user.username,
+            "output_checker": user.output_checker,
+            "workspaces": new_workspaces,
+        },
+    )
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        response = airlock_client.get("/workspaces/view/new_workspace/")
+
+    # this request still uses the stale data
+    assert response.status_code == 403
+    traces = {span.name: span.attributes for span in get_trace()}
+    assert traces["mock_django_span"]["auth_refresh_background"] is True
+
+    # but it has been refreshed for the next one
+    user.refresh_from_db()
+    assert user.last_refresh > refresh
+    response = airlock_client.get("/workspaces/view/new_workspace/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_session_refresh_middleware(airlock_client, settings):
+    airlock_client.login(workspaces=["workspace"])
+    factories.create_workspace("workspace")
+    session_key = airlock_client.session.session_key
+
+    def expire_date():
+        return Session.objects.get(pk=session_key).expire_date
+
+    # first request after login saves the session with a refresh time
+    airlock_client.get("/workspaces/")
+    refreshed_at = airlock_client.session[SessionRefreshMiddleware.REFRESHED_AT]
+    expiry = expire_date()
+
+    # session is not saved again until the refresh interval has passed
+    airlock_client.get("/workspaces/")
+    assert expire_date() == expiry
+    assert airlock_client.session[SessionRefreshMiddleware.REFRESHED_AT] == refreshed_at
+
+    session = airlock_client.session
+    session[SessionRefreshMiddleware.REFRESHED_AT] = (
+        time.time() - settings.SESSION_REFRESH_INTERVAL - 1
+    )
+    session.save()
+    expiry = expire_date()
+
+    airlock_client.get("/workspaces/")
+    assert expire_date() > expiry
+    assert airlock_client.session[SessionRefreshMiddleware.REFRESHED_AT] > refreshed_at
+
+
+@pytest.mark.django_db
+def test_session_refresh_middleware_no_session(client):
+    response = client.get("/login/")
+    assert response.status_code == 200
+    assert not Session.objects.exists()
+
+
+def without_query_attributes(attributes):
+    # these are tested separately, below
+    return {k: v for k, v in attributes.items() if not k.startswith("db.")}
+
+
 @pytest.mark.django_db
 def test_middleware_user_trace(airlock_client):
     user = factories.create_airlock_user(workspaces=["workspace"])
@@ -92,7 +185,7 @@ def test_middleware_user_trace(airlock_client):
     assert response.status_code == 200
 
     traces = {span.name: span.attributes for span in get_trace()}
-    assert traces["mock_django_span"] == {
+    assert without_query_attributes(traces["mock_django_span"]) == {
         "workspace": "workspace",
         "username": user.username,
         "user_id": user.user_id,
@@ -115,7 +208,7 @@ def test_middleware_user_trace_with_no_user(airlock_client):
 
     assert response.status_code == 200
     traces = {span.name: span.attributes for span in get_trace()}
-    assert traces["mock_django_span"] == {
+    assert without_query_attributes(traces["mock_django_span"]) == {
         "user_id": "anonymous",
         "username": "anonymous",
     }
@@ -127,8 +220,25 @@ def timeout(request):
     raise RequestTimeout("timeout")
 
 
+@login_exempt
+def repeated_queries(request):
+    for i in range(3):
+        User.objects.filter(user_id=f"user{i}").first()
+    return HttpResponse("ok")
+
+
+@login_exempt
+def slow(request):
+    time.sleep(0.05)
+    return HttpResponse("ok")
+
+
 # note: we need to use login, as the user middleware expects that to exist
-urlpatterns = [path("login/", timeout, name="login")]
+urlpatterns = [
+    path("login/", timeout, name="login"),
+    path("repeated-queries/", repeated_queries),
+    path("slow/", slow, name="slow"),
+]
 
 
 def test_timeout_exception_middleware(airlock_client, settings):
@@ -142,3 +252,138 @@ def test_timeout_exception_middleware(airlock_client, settings):
 
     spans = get_trace()
     assert spans[0].attributes["timeout"]
+
+
+@pytest.mark.django_db
+def test_query_tracing_middleware(airlock_client, settings):
+    settings.QUERY_TRACING_SLOWEST = 2
+    airlock_client.login(workspaces=["workspace"])
+    factories.create_workspace("workspace")
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        response = airlock_client.get("/workspaces/view/workspace/")
+
+    assert response.status_code == 200
+    attributes = get_trace()[-1].attributes
+    assert attributes["db.query_count"] > 2
+    assert attributes["db.duration_ms"] > 0
+    assert len(attributes["db.slowest_queries"]) == 2
+    assert "db.repeated_query" not in attributes
+
+
+@pytest.mark.django_db
+def test_query_tracing_middleware_repeated_queries(airlock_client, settings):
+    settings.ROOT_URLCONF = "tests.integration.test_middleware"
+    settings.QUERY_REPEAT_THRESHOLD = 3
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        airlock_client.get("/repeated-queries/")
+
+    attributes = get_trace()[-1].attributes
+    assert attributes["db.repeated_query"] is True
+    assert len(attributes["db.repeated_queries"]) == 1
+    assert attributes["db.repeated_queries"][0].startswith("3x SELECT")
+
+
+def test_profiling_middleware(airlock_client, settings):
+    settings.ROOT_URLCONF = "tests.integration.test_middleware"
+    settings.PROFILE_THRESHOLD = 0.01
+    settings.PROFILE_INTERVAL = 0.001
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        airlock_client.get("/slow/")
+
+    (path,) = settings.PROFILE_DIR.iterdir()
+    assert "-GET_slow-" in path.name
+    traces = {span.name: span.attributes for span in get_trace()}
+    assert traces["mock_django_span"]["profile.path"] == str(path)
+
+
+@pytest.fixture
+def stop_tracemalloc():
+    yield
+    tracemalloc.stop()
+
+
+def test_memory_tracing_middleware(airlock_client, settings, stop_tracemalloc):
+    settings.ROOT_URLCONF = "tests.integration.test_middleware"
+    settings.MEMORY_TRACING = True
+    settings.MEMORY_SNAPSHOT_INTERVAL = 60
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        airlock_client.get("/slow/")
+    # only the first request writes a snapshot
+    airlock_client.get("/slow/")
+
+    traces = {span.name: span.attributes for span in get_trace()}
+    attributes = traces["mock_django_span"]
+    assert attributes["memory.view"] == "slow"
+    assert attributes["memory.peak_allocated_bytes"] > 0
+    assert attributes["memory.rss_bytes"] > 0
+    assert "memory.rss_delta_bytes" in attributes
+    assert len(list(settings.MEMORY_SNAPSHOT_DIR.iterdir())) == 1
+
+
+def test_memory_tracing_middleware_not_found(
+    airlock_client, settings, stop_tracemalloc
+):
+    settings.ROOT_URLCONF = "tests.integration.test_middleware"
+    settings.MEMORY_TRACING = True
+
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("mock_django_span"):
+        response = airlock_client.get("/not-found/")
+
+    assert response.status_code == 404
+    traces = {span.name: span.attributes for span in get_trace()}
+    attributes = traces["mock_django_span"]
+    assert "memory.view" not in attributes
+    assert attributes["memory.peak_allocated_bytes"] > 0
+    assert not settings.MEMORY_SNAPSHOT_DIR.exists()
+
+
+@pytest.mark.django_db
+def test_metrics_middleware_flush_interval(airlock_client, settings, monkeypatch):
+    settings.METRICS_FLUSH_INTERVAL = 60
+    monkeypatch.setattr(metrics, "_last_flush", None)
+    key = (
+        "airlock_http_request_duration_seconds_count",
+        (("status", "404"), ("view", "unknown")),
+    )
+
+    airlock_client.get("/not-a-page/")
+    assert REGISTRY.read(settings.METRICS_DIR)[key] == 1
+
+    # not written again until the interval has passed
+    airlock_client.get("/not-a-page/")
+    assert REGISTRY.read(settings.METRICS_DIR)[key] == 1
+
+    monkeypatch.setattr(metrics, "_last_flush", time.monotonic() - 60)
+    airlock_client.get("/not-a-page/")
+    assert REGISTRY.read(settings.METRICS_DIR)[key] == 3
+
+
+def test_query_recorder():
+    recorder = QueryRecorder(slowest=2)
+    recorder.record("SELECT * FROM t WHERE id IN (%s, %s)", 0.3)
+    recorder.record("SELECT * FROM t WHERE id IN (%s)", 0.1)
+    recorder.record("SELECT * FROM u", 0.2)
+    recorder.record("SELECT * FROM t WHERE id = %s", 0.4)
+
+    assert recorder.count == 4
+    assert recorder.duration == pytest.approx(1.0)
+    assert recorder.slowest() == [
+        (0.4, "SELECT * FROM t WHERE id = %s"),
+        (0.3, "SELECT * FROM t WHERE id IN (%s, %s)"),
+    ]
+    assert recorder.repeated(2) == [("SELECT * FROM t WHERE id IN (...)", 2)]
+
+
+def test_query_recorder_no_slowest():
+    recorder = QueryRecorder(slowest=0)
+    recorder.record("SELECT 1", 0.1)
+    assert recorder.slowest() == []
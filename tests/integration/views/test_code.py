@@ -146,6 +146,22 @@ def test_code_contents_file_yaml(airlock_client):
     assert b'<pre class="yaml">yaml: true</pre>' in response.content
 
 
+def test_code_contents_file_highlighted(airlock_client):
+    airlock_client.login(output_checker=True)
+    repo = factories.create_repo(
+        "workspace", files=[("analysis/script.py", "import os\n")]
+    )
+    url = f"/code/contents/workspace/{repo.commit}/analysis/script.py"
+
+    response = airlock_client.get(url)
+    assert response.status_code == 200
+    assert '<span class="kn">import</span>' in response.rendered_content
+    etag = response.headers["ETag"]
+
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
 def test_code_contents_directory(airlock_client):
     airlock_client.login(output_checker=True)
     repo = factories.create_repo("workspace", files=[("somedir/foo.txt", "")])
@@ -1,6 +1,7 @@
 import os
 from email.utils import formatdate
 
+from django.contrib import messages
 from django.contrib.messages.api import get_messages
 from django.contrib.messages.storage.session import SessionStorage
 from django.contrib.sessions.backends.db import SessionStore
@@ -13,6 +14,37 @@ from django.test import RequestFactory
 
 from airlock import forms, renderers
 from airlock.views import helpers
+from tests import factories
+
+
+def test_templates_hash():
+    helpers.templates_hash.cache_clear()
+    assert helpers.templates_hash() == helpers.templates_hash()
+    assert helpers.templates_hash.cache_info().hits == 1
+
+
+def test_page_etag(rf):
+    request = rf.get("/")
+    request.user = factories.create_airlock_user()
+    request.session = SessionStore()
+    request._messages = SessionStorage(request)
+
+    etag = helpers.page_etag(request, ["HX-Request"], "state")
+    assert etag == helpers.page_etag(request, ["HX-Request"], "state")
+    assert etag != helpers.page_etag(request, ["HX-Request"], "other")
+    assert helpers.not_modified(request, etag) is None
+
+    request = rf.get("/", headers={"If-None-Match": etag})
+    request.user = factories.create_airlock_user()
+    request.session = SessionStore()
+    request._messages = SessionStorage(request)
+    response = helpers.not_modified(request, etag)
+    assert response is not None
+    assert response.status_code == 304
+
+    messages.info(request, "a message")
+    assert helpers.page_etag(request, ["HX-Request"], "state") is None
+    assert helpers.not_modified(request, None) is None
 
 
 def test_serve_file(tmp_path, rf):
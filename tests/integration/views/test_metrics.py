@@ -0,0 +1,40 @@
+import pytest
+
+from airlock.enums import RequestStatus
+from tests import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_metrics(airlock_client):
+    factories.create_release_request("workspace")
+    factories.create_request_at_status(
+        "other-workspace",
+        RequestStatus.SUBMITTED,
+        files=[factories.request_file()],
+    )
+    # a request we haven't routed, before the scrape
+    airlock_client.get("/not-a-page/")
+
+    response = airlock_client.get("/metrics/")
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    lines = response.content.decode().splitlines()
+    assert "# TYPE airlock_http_request_duration_seconds histogram" in lines
+    assert (
+        'airlock_http_request_duration_seconds_count{status="404",view="unknown"} 1'
+        in lines
+    )
+    assert 'airlock_request_status_changes_total{status="SUBMITTED"} 1' in lines
+    assert 'airlock_release_requests{status="PENDING"} 1' in lines
+    assert 'airlock_release_requests{status="SUBMITTED"} 1' in lines
+    assert 'airlock_release_requests{status="RELEASED"} 0' in lines
+    assert "airlock_file_upload_queue_depth 0" in lines
+
+
+@pytest.mark.parametrize("remote_addr", ["10.0.0.1", "not-an-ip"])
+def test_metrics_not_local(airlock_client, remote_addr):
+    response = airlock_client.get("/metrics/", REMOTE_ADDR=remote_addr)
+    assert response.status_code == 404
@@ -17,6 +17,7 @@ from airlock.enums import (
     Visibility,
 )
 from airlock.types import UrlPath
+from airlock.views import request as request_views
 from tests import factories
 from tests.conftest import get_trace
 
@@ -618,6 +619,104 @@ def test_request_view_with_approved_request(
         assert button_label not in response.rendered_content
 
 
+def test_uploaded_files_count(mock_old_api, airlock_client, bll):
+    airlock_client.login(username="output-checker-0", output_checker=True)
+    release_request = factories.create_request_at_status(
+        "workspace",
+        status=RequestStatus.APPROVED,
+        files=[
+            factories.request_file(approved=True, path="test1.txt", contents="1"),
+            factories.request_file(
+                approved=True, path="test2.txt", contents="2", uploaded=True
+            ),
+        ],
+    )
+    url = release_request.uploaded_files_count_url()
+
+    response = airlock_client.get(url)
+    assert response.status_code == 200
+    assert response.context["upload_in_progress"]
+    poll_url = f"{url}?version={release_request.version}"
+    assert poll_url in response.rendered_content
+
+    # the request hasn't changed since the poll was rendered
+    response = airlock_client.get(poll_url)
+    assert response.status_code == 204
+
+    # a file is uploaded
+    bll.register_file_upload(
+        release_request, UrlPath("test1.txt"), release_request.author
+    )
+    response = airlock_client.get(poll_url)
+    assert response.status_code == 200
+    assert response.context["release_request"].uploaded_files_count() == 2
+
+
+def test_uploaded_files_count_long_poll(mock_old_api, airlock_client, bll, settings):
+    settings.UPLOAD_POLL_WAIT = 60
+    airlock_client.login(username="output-checker-0", output_checker=True)
+    release_request = factories.create_request_at_status(
+        "workspace",
+        status=RequestStatus.APPROVED,
+        files=[factories.request_file(approved=True, path="test1.txt")],
+    )
+    poll_url = f"{release_request.uploaded_files_count_url()}?version={release_request.version}"
+
+    def upload(interval):
+        bll.register_file_upload(
+            release_request, UrlPath("test1.txt"), release_request.author
+        )
+
+    # the file is uploaded while the poll waits
+    with patch("airlock.views.request.time.sleep", side_effect=upload) as sleep:
+        response = airlock_client.get(poll_url)
+
+    sleep.assert_called_once()
+    assert response.status_code == 200
+    assert response.context["release_request"].uploaded_files_count() == 1
+
+
+def test_uploaded_files_count_long_poll_timeout(
+    mock_old_api, airlock_client, settings, monkeypatch
+):
+    settings.UPLOAD_POLL_WAIT = 0.05
+    monkeypatch.setattr(request_views, "UPLOAD_POLL_CHECK_INTERVAL", 0.01)
+    airlock_client.login(username="output-checker-0", output_checker=True)
+    release_request = factories.create_request_at_status(
+        "workspace",
+        status=RequestStatus.APPROVED,
+        files=[factories.request_file(approved=True, path="test1.txt")],
+    )
+
+    response = airlock_client.get(
+        f"{release_request.uploaded_files_count_url()}?version={release_request.version}"
+    )
+    assert response.status_code == 204
+
+
+def test_uploaded_files_count_released(mock_old_api, airlock_client):
+    airlock_client.login(username="output-checker-0", output_checker=True)
+    release_request = factories.create_request_at_status(
+        "workspace",
+        status=RequestStatus.RELEASED,
+        files=[factories.request_file(approved=True, uploaded=True)],
+    )
+
+    response = airlock_client.get(release_request.uploaded_files_count_url())
+    assert response.headers["HX-Redirect"] == release_request.get_url()
+
+
+def test_uploaded_files_count_permission_denied(airlock_client):
+    airlock_client.login(username="other", workspaces=["other"])
+    release_request = factories.create_release_request("workspace")
+
+    response = airlock_client.get(release_request.uploaded_files_count_url())
+    assert response.status_code == 403
+
+    response = airlock_client.get("/requests/no_such_request/uploaded-files-count")
+    assert response.status_code == 404
+
+
 @pytest.mark.parametrize("status", list(RequestStatus))
 def test_request_view_with_authored_request_file(mock_old_api, airlock_client, status):
     airlock_client.login(output_checker=True, workspaces=["workspace"])
@@ -694,6 +793,30 @@ def test_request_view_with_submitted_file_changes_requested(airlock_client):
     assert "Changes requested" in response.rendered_content
 
 
+def test_request_view_not_modified(airlock_client):
+    airlock_client.login(output_checker=True)
+    release_request = factories.create_release_request("workspace")
+    factories.add_request_file(release_request, "group", "file.txt")
+    url = f"/requests/view/{release_request.id}/group/file.txt"
+
+    # the first response sets the CSRF cookie, which the page depends on
+    airlock_client.get(url)
+    response = airlock_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "HX-Request" in response.headers["Vary"]
+
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # changing the request changes the page
+    factories.add_request_file(release_request, "group", "other.txt")
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
 def test_request_view_with_404(airlock_client):
     airlock_client.login(output_checker=True)
     release_request = factories.create_release_request("workspace")
@@ -383,6 +383,74 @@ def test_workspace_view_with_invalid_path_redirects_to_nearest_parent(airlock_cl
     )
 
 
+def test_workspace_view_not_modified(airlock_client):
+    airlock_client.login(output_checker=True)
+    workspace = factories.create_workspace("workspace")
+    factories.write_workspace_file(workspace, "file.txt", "foobar")
+    url = "/workspaces/view/workspace/file.txt"
+
+    # the first response sets the CSRF cookie, which the page depends on
+    airlock_client.get(url)
+    response = airlock_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "X-Expanded-Paths" in response.headers["Vary"]
+
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # the htmx version of the page is different
+    response = airlock_client.get(
+        url,
+        headers={
+            "If-None-Match": etag,
+            "HX-Request": "true",
+            "manifest-hash": workspace.manifest_hash,
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # and so is the page for another user
+    airlock_client.login(username="other", output_checker=True)
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_workspace_view_not_modified_workspace_changed(airlock_client):
+    airlock_client.login(output_checker=True)
+    workspace = factories.create_workspace("workspace")
+    factories.write_workspace_file(workspace, "file.txt", "foobar")
+    url = "/workspaces/view/workspace/file.txt"
+    airlock_client.get(url)
+    etag = airlock_client.get(url).headers["ETag"]
+
+    factories.write_workspace_file(workspace, "other.txt", "other")
+    response = airlock_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_workspace_view_not_modified_with_messages(airlock_client):
+    airlock_client.login(output_checker=True)
+    workspace = factories.create_workspace("workspace")
+    factories.write_workspace_file(workspace, "subdir/file.txt", "foobar")
+    etag = airlock_client.get("/workspaces/view/workspace/subdir/").headers["ETag"]
+
+    # redirects to subdir/, with an error message
+    response = airlock_client.get(
+        "/workspaces/view/workspace/subdir/no_such_file.txt",
+        headers={"If-None-Match": etag},
+        follow=True,
+    )
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert "is not a valid file or directory path" in response.rendered_content
+
+
 def test_workspace_view_redirects_to_directory(airlock_client):
     airlock_client.login(output_checker=True)
     workspace = factories.create_workspace("workspace")
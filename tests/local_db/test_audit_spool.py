@@ -0,0 +1,183 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from local_db import audit_spool
+from local_db.audit_spool import AuditSpool
+
+
+@pytest.fixture
+def spool(settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 100
+    settings.AUDIT_SPOOL_MAX_AGE = 100
+    return AuditSpool()
+
+
+def write_spool_file(settings, name, lines):
+    settings.AUDIT_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = settings.AUDIT_SPOOL_DIR / name
+    path.write_text("".join(lines))
+    return path
+
+
+def test_append_and_flush(spool, settings):
+    assert not spool.append({"a": 1}, kind="a")
+    assert not spool.append({"a": 2}, kind="a")
+
+    spool_file = settings.AUDIT_SPOOL_DIR / f"{os.getpid()}.jsonl"
+    assert spool_file.read_text() == '{"a": 1}\n{"a": 2}\n'
+
+    inserted: list[dict[str, int]] = []
+    assert spool.flush(inserted.extend) == 2
+    assert inserted == [{"a": 1}, {"a": 2}]
+    assert list(settings.AUDIT_SPOOL_DIR.iterdir()) == []
+
+    # nothing left to flush
+    assert spool.flush(inserted.extend) == 0
+    assert len(inserted) == 2
+
+
+def test_append_syncs_to_disk(spool, settings, monkeypatch):
+    synced: list[int] = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    spool.append({"a": 1}, kind="a")
+    assert len(synced) == 1
+
+
+def test_append_due_max_events(spool, settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 2
+    assert not spool.append({"a": 1}, kind="a")
+    assert spool.append({"a": 2}, kind="a")
+
+    spool.flush(lambda records: None)
+    assert not spool.append({"a": 3}, kind="a")
+
+
+def test_append_due_max_age(spool, settings):
+    settings.AUDIT_SPOOL_MAX_AGE = 0
+    assert spool.append({"a": 1}, kind="a")
+
+
+def test_append_spool_claimed_while_opening(spool, settings, monkeypatch):
+    inodes = iter([None])
+    original = audit_spool._inode
+
+    # simulate a flush renaming the file after we opened it
+    def _inode(path):
+        return next(inodes, original(path))
+
+    monkeypatch.setattr(audit_spool, "_inode", _inode)
+    spool.append({"a": 1}, kind="a")
+
+    inserted: list[dict[str, int]] = []
+    spool.flush(inserted.extend)
+    # the record was written exactly once
+    assert inserted == [{"a": 1}]
+
+
+def test_has_pending(spool, settings):
+    assert not spool.has_pending(["a", "b"])
+
+    spool.append({"a": 1}, kind="a")
+    assert spool.has_pending(["a", "b"])
+    assert not spool.has_pending(["b"])
+
+    spool.flush(lambda records: None)
+    assert not spool.has_pending(["a"])
+
+
+def test_has_pending_appended_during_flush(spool, settings):
+    spool.append({"a": 1}, kind="a")
+
+    # another process appends after we have claimed the spool file
+    def insert(records):
+        spool.append({"a": 2}, kind="a")
+
+    spool.flush(insert)
+    assert spool.has_pending(["a"])
+
+    inserted: list[dict[str, int]] = []
+    spool.flush(inserted.extend)
+    assert inserted == [{"a": 2}]
+
+
+def test_flush_no_directory(spool, settings):
+    assert not settings.AUDIT_SPOOL_DIR.exists()
+    assert spool.flush(lambda records: None) == 0
+
+
+def test_flush_includes_other_processes_and_crashed_flushes(spool, settings, caplog):
+    write_spool_file(settings, "1.jsonl", ['{"a": 1}\n'])
+    # left behind part way through a flush, with a partially written line
+    write_spool_file(settings, "2-abc.flushing", ['{"a": 2}\n', '{"a": '])
+
+    inserted: list[dict[str, int]] = []
+    assert spool.flush(inserted.extend) == 2
+    assert sorted(r["a"] for r in inserted) == [1, 2]
+    assert list(settings.AUDIT_SPOOL_DIR.iterdir()) == []
+    assert "Skipping invalid audit spool line" in caplog.text
+
+
+def test_flush_insert_error_keeps_records(spool, settings):
+    spool.append({"a": 1}, kind="a")
+
+    def insert(records):
+        raise Exception("database is locked")
+
+    with pytest.raises(Exception, match="database is locked"):
+        spool.flush(insert)
+
+    inserted: list[dict[str, int]] = []
+    assert spool.flush(inserted.extend) == 1
+    assert inserted == [{"a": 1}]
+
+
+def test_flush_spool_claimed_by_other_process(spool, settings, monkeypatch):
+    spool.append({"a": 1}, kind="a")
+
+    def rename(self, target):
+        raise FileNotFoundError(self)
+
+    monkeypatch.setattr(Path, "rename", rename)
+    inserted: list[dict[str, int]] = []
+    assert spool.flush(inserted.extend) == 0
+    assert inserted == []
+
+
+def test_flush_file_already_flushed(spool, settings, monkeypatch):
+    path = write_spool_file(settings, "1-abc.flushing", ['{"a": 1}\n'])
+
+    class Unlinked:
+        st_nlink = 0
+
+    monkeypatch.setattr(os, "fstat", lambda fd: Unlinked)
+    assert spool._flush_file(path, lambda records: None) == 0
+    assert spool._flush_file(path.with_name("missing.flushing"), print) == 0
+
+
+def test_flush_empty_file(spool, settings):
+    write_spool_file(settings, "1.jsonl", [])
+    inserted: list[dict[str, int]] = []
+    assert spool.flush(inserted.append) == 0
+    # insert is not called with nothing to insert
+    assert inserted == []
+    assert list(settings.AUDIT_SPOOL_DIR.iterdir()) == []
+
+
+def test_inode(tmp_path):
+    assert audit_spool._inode(tmp_path) == tmp_path.stat().st_ino
+    assert audit_spool._inode(tmp_path / "missing") is None
+
+
+def test_spool_records_are_json_lines(spool, settings):
+    spool.append(
+        {"type": "WORKSPACE_FILE_VIEW", "extra": {"group": "g"}},
+        kind="WORKSPACE_FILE_VIEW",
+    )
+    spool_file = settings.AUDIT_SPOOL_DIR / f"{os.getpid()}.jsonl"
+    assert json.loads(spool_file.read_text()) == {
+        "type": "WORKSPACE_FILE_VIEW",
+        "extra": {"group": "g"},
+    }
@@ -84,6 +84,146 @@ def test_get_audit_log(test_audits, kwargs, expected_audits):
     ]
 
 
+def test_audit_log_review_turn_and_group_columns():
+    factories.create_audit_event(
+        AuditEventType.REQUEST_FILE_VIEW, extra={"group": "g1", "review_turn": "2"}
+    )
+    factories.create_audit_event(
+        AuditEventType.REQUEST_FILE_VIEW, extra={"group": "g2", "review_turn": "3"}
+    )
+    factories.create_audit_event(AuditEventType.WORKSPACE_FILE_VIEW, request=None)
+
+    assert list(
+        models.AuditLog.objects.order_by("id").values_list("review_turn", "group")
+    ) == [(2, "g1"), (3, "g2"), (None, None)]
+
+    audits = dal.get_audit_log(request="request", group="g1")
+    assert [a.extra["group"] for a in audits] == ["g1"]
+
+    dal.hide_audit_events_for_turn("request", 3)
+    assert list(
+        models.AuditLog.objects.order_by("id").values_list("hidden", flat=True)
+    ) == [False, True, False]
+
+
+def test_buffer_audit_event(settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 100
+    user = factories.create_airlock_user(username="user")
+    audit = AuditEvent(
+        type=AuditEventType.REQUEST_FILE_VIEW,
+        user=user,
+        workspace="workspace",
+        request="request",
+        path=UrlPath("group/foo.txt"),
+        extra={"group": "group", "review_turn": "1"},
+    )
+    dal.buffer_audit_event(audit)
+
+    # spooled, but not yet written to the db
+    assert not models.AuditLog.objects.exists()
+
+    # reading the audit log writes out buffered events first
+    assert dal.get_audit_log(request="request") == [audit]
+    assert models.AuditLog.objects.count() == 1
+
+
+def test_get_audit_log_only_flushes_if_needed(settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 100
+    user = factories.create_airlock_user(username="user")
+
+    def buffer_event(event_type):
+        dal.buffer_audit_event(
+            AuditEvent(
+                type=event_type,
+                user=user,
+                workspace="workspace",
+                request="request",
+                path=UrlPath("group/foo.txt"),
+            )
+        )
+
+    views = {
+        AuditEventType.WORKSPACE_FILE_VIEW,
+        AuditEventType.REQUEST_FILE_VIEW,
+    }
+    buffer_event(AuditEventType.REQUEST_FILE_VIEW)
+
+    # the query excludes the buffered event, so we don't write it
+    assert dal.get_audit_log(request="request", exclude=views) == []
+    assert not models.AuditLog.objects.exists()
+
+    # but we do if it could include a buffered event
+    buffer_event(AuditEventType.REQUEST_FILE_DOWNLOAD)
+    audits = dal.get_audit_log(request="request", exclude=views)
+    assert [a.type for a in audits] == [AuditEventType.REQUEST_FILE_DOWNLOAD]
+    assert models.AuditLog.objects.count() == 2
+
+
+def test_buffer_audit_event_flushes_when_full(settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 2
+    audits = [
+        AuditEvent(
+            type=AuditEventType.WORKSPACE_FILE_VIEW,
+            user=factories.create_airlock_user(username="user"),
+            workspace="workspace",
+            path=UrlPath(f"foo{i}.txt"),
+        )
+        for i in range(3)
+    ]
+
+    dal.buffer_audit_event(audits[0])
+    assert models.AuditLog.objects.count() == 0
+    dal.buffer_audit_event(audits[1])
+    assert models.AuditLog.objects.count() == 2
+    dal.buffer_audit_event(audits[2])
+    assert models.AuditLog.objects.count() == 2
+
+
+def test_hide_audit_events_for_turn_includes_buffered_events(settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 100
+    user = factories.create_airlock_user(username="user")
+    audit = AuditEvent(
+        type=AuditEventType.REQUEST_FILE_VIEW,
+        user=user,
+        workspace="workspace",
+        request="request",
+        path=UrlPath("group/foo.txt"),
+        extra={"group": "group", "review_turn": "1"},
+    )
+    dal.buffer_audit_event(audit)
+
+    dal.hide_audit_events_for_turn("request", 1)
+
+    assert models.AuditLog.objects.get().hidden
+
+
+def test_get_released_files_for_workspace(mock_old_api):
+    for workspace, files in [
+        # the same contents under two paths, which is recorded once
+        ("workspace", [("foo.txt", "foo"), ("copy/foo.txt", "foo")]),
+        ("workspace", [("bar.txt", "bar")]),
+        ("other", [("baz.txt", "baz")]),
+    ]:
+        factories.create_request_at_status(
+            workspace,
+            RequestStatus.RELEASED,
+            files=[
+                factories.request_file(path=path, contents=contents, approved=True)
+                for path, contents in files
+            ],
+        )
+
+    released = dal.get_released_files_for_workspace("workspace")
+    file_ids = models.RequestFileMetadata.objects.filter(
+        request__workspace="workspace"
+    ).values_list("file_id", flat=True)
+    assert len(file_ids) == 3
+    assert released == set(file_ids)
+    assert len(released) == 2
+    assert models.ReleasedFile.objects.filter(workspace="workspace").count() == 2
+    assert len(dal.get_released_files_for_workspace("other")) == 1
+
+
 def test_delete_file_from_request_bad_state():
     author = factories.create_airlock_user()
     release_request = factories.create_request_at_status(
@@ -285,3 +425,42 @@ def test_group_comment_modify_bad_params(comment_modify_function, audit_event):
     )
     with pytest.raises(exceptions.APIException):
         comment_modify_function(release_request.id, "group", "1", other, audit)
+
+
+def test_release_request_version():
+    author = factories.create_airlock_user(username="author", workspaces=["workspace"])
+    release_request = factories.create_release_request("workspace", user=author)
+    assert dal.get_release_request_version(release_request.id) == ("workspace", 0)
+
+    factories.add_request_file(release_request, "group", "file.txt")
+    _, version = dal.get_release_request_version(release_request.id)
+    assert version > 0
+    assert dal.get_release_request(release_request.id)["version"] == version
+
+    dal.register_file_upload_attempt(release_request.id, UrlPath("file.txt"))
+    assert dal.get_release_request_version(release_request.id)[1] == version + 1
+
+    dal.audit_event(
+        AuditEvent.from_request(
+            release_request, AuditEventType.REQUEST_EARLY_RETURN, user=author
+        )
+    )
+    assert dal.get_release_request_version(release_request.id)[1] == version + 2
+
+    dal.hide_audit_events_for_turn(release_request.id, 0)
+    assert dal.get_release_request_version(release_request.id)[1] == version + 3
+
+    # audit events for workspaces don't change any request
+    dal.audit_event(
+        AuditEvent(
+            type=AuditEventType.WORKSPACE_FILE_VIEW,
+            user=author,
+            workspace="workspace",
+        )
+    )
+    assert dal.get_release_request_version(release_request.id)[1] == version + 3
+
+
+def test_release_request_version_not_found():
+    with pytest.raises(exceptions.ReleaseRequestNotFound):
+        dal.get_release_request_version("no_such_request")
@@ -0,0 +1,88 @@
+"""
+Check that the DAL's frequently run queries use indexes, against a database
+seeded with a realistic number of requests and files.
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from airlock.enums import RequestStatus
+from local_db import data_access
+from tests import factories
+
+
+dal = data_access.LocalDBDataAccessLayer()
+
+REQUEST_COUNT = 1000
+FILES_PER_REQUEST = 20
+
+
+@pytest.fixture(scope="module")
+def seeded_db(django_db_setup, django_db_blocker):
+    with factories.seeded_db(
+        django_db_blocker, "query-plan-user", REQUEST_COUNT, FILES_PER_REQUEST
+    ) as user:
+        yield user
+
+
+def get_query_plan(func, *args):
+    """Return the query plan for the first query run by func.
+
+    Any later queries are for building the returned dicts, which all look up
+    rows by primary or foreign key.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        func(*args)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[0]['sql']}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@pytest.mark.parametrize(
+    "method,args",
+    [
+        ("get_released_files_for_workspace", ["workspace1"]),
+        ("get_released_files_for_request", ["request1"]),
+        ("get_requests_for_workspace", ["workspace1"]),
+        ("get_requests_by_status", [RequestStatus.SUBMITTED, RequestStatus.REVIEWED]),
+    ],
+)
+def test_query_plans_use_indexes(seeded_db, method, args):
+    plan = get_query_plan(getattr(dal, method), *args)
+    assert plan
+    for step in plan:
+        assert not step.startswith("SCAN"), plan
+
+
+@pytest.mark.parametrize(
+    "method,args",
+    [
+        ("get_active_requests_for_workspace_by_user", ["workspace0"]),
+        ("get_requests_authored_by_user", []),
+    ],
+)
+def test_query_plans_use_indexes_for_user(seeded_db, method, args):
+    plan = get_query_plan(getattr(dal, method), *args, seeded_db)
+    assert plan
+    for step in plan:
+        assert not step.startswith("SCAN"), plan
+
+
+def test_requests_by_status_query_does_not_sort(seeded_db):
+    # For a single status, the index is already in created_at order. For
+    # several, SQLite still has to merge them, but only sorts the matching rows.
+    plan = get_query_plan(dal.get_requests_by_status, RequestStatus.RETURNED)
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_released_files_query_uses_partial_index(seeded_db):
+    plan = get_query_plan(dal.get_released_files_for_request, "request1")
+    assert any("local_db_released_files_idx" in step for step in plan)
+
+
+def test_released_files_for_workspace_query_uses_covering_index(seeded_db):
+    plan = get_query_plan(dal.get_released_files_for_workspace, "workspace1")
+    assert len(plan) == 1
+    assert "USING COVERING INDEX" in plan[0]
@@ -0,0 +1,135 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from airlock import metrics
+from services import http
+from services.metrics import REGISTRY
+from tests.conftest import get_trace
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Respond to each POST with the next (status, delay) from the server's list."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, delay = self.server.responses.pop(0)  # type: ignore[attr-defined]
+        self.server.requests += 1  # type: ignore[attr-defined]
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.responses = []  # type: ignore[attr-defined]
+    server.requests = 0  # type: ignore[attr-defined]
+    server.url = f"http://127.0.0.1:{server.server_port}/"  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(http, "RETRY_BACKOFF", 0)
+
+
+def test_post(stub_server):
+    stub_server.responses = [(201, 0)]
+    response = http.post(stub_server.url, timeout=5, data="data")
+    assert response.status_code == 201
+
+    span = get_trace()[-1]
+    assert span.name == "http_post"
+    assert span.attributes["url"] == stub_server.url
+    assert span.attributes["status_code"] == 201
+    assert span.attributes["retry"] is False
+    assert span.attributes["attempts"] == 1
+
+
+def test_post_timeout(stub_server):
+    stub_server.responses = [(201, 1)]
+    with pytest.raises(requests.Timeout):
+        http.post(stub_server.url, timeout=0.1)
+
+
+def test_post_metrics(stub_server, settings):
+    stub_server.responses = [(201, 0), (503, 0), (201, 1)]
+    http.post(stub_server.url, timeout=5)
+    http.post(stub_server.url, timeout=5)
+    with pytest.raises(requests.Timeout):
+        http.post(stub_server.url, timeout=0.1)
+
+    metrics.flush()
+    values = REGISTRY.read(settings.METRICS_DIR)
+    name = "airlock_outbound_http_request_duration_seconds_count"
+    assert values[(name, (("status", "201"),))] == 1
+    assert values[(name, (("status", "503"),))] == 1
+    assert values[(name, (("status", "error"),))] == 1
+
+
+def test_post_not_retried_by_default(stub_server):
+    stub_server.responses = [(503, 0), (201, 0)]
+    response = http.post(stub_server.url, timeout=5)
+    assert response.status_code == 503
+    assert stub_server.requests == 1
+
+
+def test_post_retry(stub_server):
+    stub_server.responses = [(503, 0), (502, 0), (201, 0)]
+    response = http.post(stub_server.url, timeout=5, retry=True, data="data")
+    assert response.status_code == 201
+    assert stub_server.requests == 3
+    assert get_trace()[-1].attributes["attempts"] == 3
+
+
+def test_post_retry_gives_up(stub_server):
+    stub_server.responses = [(503, 0)] * 3
+    response = http.post(stub_server.url, timeout=5, retry=True)
+    assert response.status_code == 503
+    assert stub_server.requests == 3
+
+
+def test_post_retry_connection_error():
+    # nothing listening on this port
+    with pytest.raises(requests.ConnectionError):
+        http.post("http://127.0.0.1:1/", timeout=5, retry=True)
+
+
+def test_post_retry_does_not_retry_read_timeout(stub_server):
+    stub_server.responses = [(201, 1)] * 3
+    with pytest.raises(requests.Timeout):
+        http.post(stub_server.url, timeout=0.2, retry=True)
+    assert stub_server.requests == 1
+
+
+def test_post_retry_deadline(stub_server, monkeypatch):
+    monkeypatch.setattr(http, "RETRY_DEADLINE", 0.5)
+    stub_server.responses = [(503, 0.3)] * 3
+
+    start = time.monotonic()
+    # the second attempt only has what's left of the deadline to respond
+    with pytest.raises(requests.Timeout):
+        http.post(stub_server.url, timeout=5, retry=True)
+    assert time.monotonic() - start < 1
+    assert stub_server.requests == 2
+
+
+def test_post_retry_no_time_to_back_off(stub_server, monkeypatch):
+    monkeypatch.setattr(http, "RETRY_BACKOFF", 1)
+    monkeypatch.setattr(http, "RETRY_DEADLINE", 0.5)
+    stub_server.responses = [(503, 0)] * 3
+    response = http.post(stub_server.url, timeout=5, retry=True)
+    assert response.status_code == 503
+    assert stub_server.requests == 1
@@ -0,0 +1,64 @@
+import tracemalloc
+
+import pytest
+
+from services import memory
+
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    yield
+    tracemalloc.stop()
+
+
+def test_rss_bytes():
+    rss = memory.rss_bytes()
+    assert rss is not None
+    assert rss > 0
+
+
+def test_measure():
+    with memory.measure() as usage:
+        data = bytearray(10_000_000)
+        del data
+
+    assert tracemalloc.is_tracing()
+    assert usage.peak_allocated >= 10_000_000
+    attributes = usage.attributes()
+    assert attributes["memory.peak_allocated_bytes"] == usage.peak_allocated
+    assert attributes["memory.rss_bytes"] == usage.rss_after
+    assert attributes["memory.rss_delta_bytes"] == usage.rss_delta
+
+
+def test_measure_already_tracing():
+    tracemalloc.start()
+    with memory.measure() as usage:
+        pass
+    assert usage.peak_allocated < 10_000_000
+
+
+def test_snapshotter(tmp_path):
+    snapshotter = memory.Snapshotter(tmp_path / "snapshots", interval=0, top=3)
+    # not tracing, so no snapshot
+    assert snapshotter.maybe_snapshot() is None
+
+    tracemalloc.start()
+    # by far the largest allocation since tracing started
+    data = [str(i) for i in range(100_000)]  # noqa: F841
+    path = snapshotter.maybe_snapshot()
+
+    assert path is not None
+    lines = path.read_text().splitlines()
+    assert lines[0].startswith("rss: ")
+    # other allocations depend on the environment, so we only check there are
+    # at most top, and that ours is first
+    assert 1 <= sum(line.endswith(" blocks") for line in lines) <= 3
+    assert lines[2].endswith(" blocks")
+    assert "test_memory.py" in lines[3]
+
+
+def test_snapshotter_interval(tmp_path):
+    snapshotter = memory.Snapshotter(tmp_path, interval=60)
+    tracemalloc.start()
+    assert snapshotter.maybe_snapshot()
+    assert snapshotter.maybe_snapshot() is None
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+from services.metrics import Counter, Histogram, Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+@pytest.fixture
+def directory(tmp_path):
+    # tmp_path also has the test's settings directories in it
+    return tmp_path / "metrics"
+
+
+def test_counter(registry, directory):
+    counter = Counter(
+        "test_total", "A test counter.", labels=("kind",), registry=registry
+    )
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    counter.inc(kind='b"\\\n')
+
+    assert registry.expose(directory) == (
+        "# HELP test_total A test counter.\n"
+        "# TYPE test_total counter\n"
+        'test_total{kind="a"} 3\n'
+        'test_total{kind="b\\"\\\\\\n"} 1\n'
+    )
+
+
+def test_counter_wrong_labels(registry):
+    counter = Counter(
+        "test_total", "A test counter.", labels=("kind",), registry=registry
+    )
+    with pytest.raises(ValueError, match="expects labels"):
+        counter.inc(other="a")
+
+
+def test_register_twice(registry):
+    Counter("test_total", "A test counter.", registry=registry)
+    with pytest.raises(ValueError, match="already registered"):
+        Counter("test_total", "A test counter.", registry=registry)
+
+
+def test_histogram(registry, directory):
+    histogram = Histogram(
+        "test_seconds", "A test histogram.", buckets=(10, 0.5), registry=registry
+    )
+    histogram.observe(0.25)
+    histogram.observe(2)
+    histogram.observe(100)
+
+    assert registry.expose(directory) == (
+        "# HELP test_seconds A test histogram.\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{le="0.5"} 1\n'
+        'test_seconds_bucket{le="10"} 2\n'
+        'test_seconds_bucket{le="+Inf"} 3\n'
+        "test_seconds_count 3\n"
+        "test_seconds_sum 102.25\n"
+    )
+
+
+def test_expose_adds_up_processes(registry, directory):
+    counter = Counter("test_total", "A test counter.", registry=registry)
+    counter.inc()
+    # another process's metrics
+    directory.mkdir()
+    (directory / "1.json").write_text(json.dumps([["test_total", [], 2]]))
+
+    assert registry.expose(directory).endswith("test_total 3\n")
+
+
+def test_flush_only_when_changed(registry, directory):
+    counter = Counter("test_total", "A test counter.", registry=registry)
+    registry.flush(directory)
+    assert not directory.exists()
+
+    counter.inc()
+    registry.flush(directory)
+    (path,) = directory.iterdir()
+    path.unlink()
+    registry.flush(directory)
+    assert not path.exists()
+
+    registry.reset()
+    registry.flush(directory)
+    assert json.loads(path.read_text()) == []
+
+
+def test_remove_dead(registry, directory, monkeypatch):
+    Counter("test_total", "A test counter.", registry=registry).inc()
+    registry.flush(directory)
+    live = directory / f"{os.getpid()}.json"
+    dead = directory / "1000001.json"
+    other_user = directory / "1.json"
+    not_pid = directory / "other.json"
+    for path in [dead, other_user, not_pid]:
+        path.write_text("[]")
+
+    def kill(pid, signal):
+        if pid == 1000001:
+            raise ProcessLookupError(pid)
+        if pid == 1:
+            raise PermissionError(pid)
+
+    monkeypatch.setattr(os, "kill", kill)
+    registry.remove_dead(directory)
+    assert sorted(directory.iterdir()) == sorted([live, other_user, not_pid])
+
+
+def test_collector(registry, directory):
+    registry.register_collector(
+        lambda: [("test_gauge", "A test gauge.", "gauge", [("test_gauge", {}, 1.5)])]
+    )
+    assert registry.expose(directory) == (
+        "# HELP test_gauge A test gauge.\n# TYPE test_gauge gauge\ntest_gauge 1.5\n"
+    )
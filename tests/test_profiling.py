@@ -0,0 +1,75 @@
+import time
+from collections import Counter
+
+import pytest
+from opentelemetry import trace
+
+from services import profiling
+from tests.conftest import get_trace
+
+
+def slow_function():
+    time.sleep(0.05)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    # tmp_path also has the test's settings directories in it
+    return tmp_path / "profiles"
+
+
+def test_profile_disabled(directory):
+    with profiling.profile("name", None, directory):
+        slow_function()
+
+    assert not directory.exists()
+
+
+def test_profile_slow(directory):
+    tracer = trace.get_tracer("test")
+    with tracer.start_as_current_span("span"):
+        with profiling.profile("GET /some/path/", 0.01, directory, interval=0.001):
+            slow_function()
+
+    (path,) = directory.iterdir()
+    assert "-GET_some_path-" in path.name
+    assert path.name.endswith("ms.collapsed.txt")
+
+    lines = path.read_text().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("slow_function (")
+    assert "test_profile_slow (" in stack
+
+    attributes = get_trace()[-1].attributes
+    assert attributes["profile.path"] == str(path)
+    assert attributes["profile.samples"] == sum(
+        int(line.rsplit(" ", 1)[1]) for line in lines
+    )
+
+
+def test_profile_fast(directory):
+    with profiling.profile("name", 10, directory, interval=0.001):
+        slow_function()
+
+    assert not directory.exists()
+
+
+def test_profile_exception(directory):
+    with pytest.raises(ValueError):
+        with profiling.profile("name", 0, directory, interval=0.001):
+            slow_function()
+            raise ValueError()
+
+    assert len(list(directory.iterdir())) == 1
+
+
+def test_save_keeps_newest(directory, monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_PROFILES", 2)
+    paths = []
+    for i in range(3):
+        paths.append(profiling.save(directory, f"name{i}", 1, Counter({"a;b": 1})))
+        time.sleep(0.01)
+
+    assert sorted(directory.iterdir()) == sorted(paths[1:])
+    assert paths[2].read_text() == "a;b 1\n"
@@ -197,3 +197,28 @@ def test_instrument_decorator_on_class_method(instance_kwargs, function_arg, exp
 
     instance = Decorated(**instance_kwargs)
     instance.decorated_method(function_arg)
+
+
+def test_instrument_decorator_not_recording():
+    @instrument(existing_tracer=trace.NoOpTracer(), func_attributes={"foo": "bar"})
+    def decorated_function():
+        return "result"
+
+    # the attributes aren't looked for, so the missing argument doesn't matter
+    assert decorated_function() == "result"
+    assert not get_trace()
+
+
+def test_instrument_decorator_attributes_per_call():
+    attributes = {"foo": "bar"}
+
+    @instrument(attributes=attributes, func_attributes={"number": "num"})
+    def decorated_function(num):
+        assert trace.get_current_span().attributes == {  # type: ignore
+            "foo": "bar",
+            "number": str(num),
+        }
+
+    decorated_function(1)
+    decorated_function(2)
+    assert attributes == {"foo": "bar"}
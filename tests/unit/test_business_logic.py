@@ -1,16 +1,18 @@
 import inspect
 import json
-from unittest.mock import patch
+import os
+import shutil
+import time
+from unittest.mock import Mock, patch
 
 import pytest
 from django.conf import settings
 from django.urls import reverse
 from django.utils.dateparse import parse_datetime
-from opentelemetry import trace
 
 import old_api
 from airlock import exceptions
-from airlock.business_logic import DataAccessLayerProtocol
+from airlock.business_logic import DataAccessLayerProtocol, WorkspaceListingCache
 from airlock.enums import (
     AuditEventType,
     NotificationEventType,
@@ -21,14 +23,16 @@ from airlock.enums import (
     Visibility,
     WorkspaceFileStatus,
 )
+from airlock.lib.generations import ROOT, GenerationWriter
 from airlock.models import (
     AuditEvent,
+    Workspace,
     WorkspaceListing,
 )
 from airlock.types import UrlPath
 from airlock.visibility import RequestFileStatus
+from local_db.models import AuditLog
 from tests import factories
-from tests.conftest import get_trace
 
 
 pytestmark = pytest.mark.django_db
@@ -88,10 +92,13 @@ def test_provider_get_workspaces_for_user(bll, output_checker, readonly_access):
         readonly_access=readonly_access,
     )
 
-    assert bll.get_workspaces_for_user(user) == [
-        bll.get_workspace("foo", user),
-        bll.get_workspace("bar", user),
+    listings = bll.get_workspaces_for_user(user)
+    assert listings == [WorkspaceListing("foo"), WorkspaceListing("bar")]
+    assert [(ws.project.name, ws.is_archived()) for ws in listings] == [
+        ("project 1", False),
+        ("project 2", True),
     ]
+    assert listings[1].display_name() == "bar (ARCHIVED)"
 
 
 @pytest.mark.parametrize("output_checker", [False, True])
@@ -117,17 +124,16 @@ def test_provider_get_copiloted_workspaces_for_user(bll, output_checker):
     )
 
     assert bll.get_workspaces_for_user(user) == [
-        bll.get_workspace("test", user),
-        bll.get_workspace("test1", user),
+        WorkspaceListing("test"),
+        WorkspaceListing("test1"),
     ]
 
-    assert bll.get_copiloted_workspaces_for_user(user) == [
-        bll.get_workspace("copiloted", user),
-        bll.get_workspace("test", user),
-    ]
+    copiloted = bll.get_copiloted_workspaces_for_user(user)
+    assert copiloted == [WorkspaceListing("copiloted"), WorkspaceListing("test")]
+    assert copiloted[0].project.name == "project 2"
 
 
-def test_provider_get_workspaces_for_user_skips_bad_manifest(bll):
+def test_provider_get_workspaces_for_user_skips_missing_manifest(bll):
     factories.create_workspace("good")
     bad_workspace = factories.create_workspace("bad-manifest")
     bad_workspace.manifest_path().unlink()
@@ -139,17 +145,39 @@ def test_provider_get_workspaces_for_user_skips_bad_manifest(bll):
         },
     )
 
-    tracer = trace.get_tracer("test")
-    with tracer.start_as_current_span("test_span"):
-        result = bll.get_workspaces_for_user(user)
+    assert bll.get_workspaces_for_user(user) == [WorkspaceListing("good")]
+
+
+def test_provider_get_workspaces_for_user_refreshes_listing_once(bll, monkeypatch):
+    factories.create_workspace("workspace1")
+    factories.create_workspace("workspace2")
+    user = factories.create_airlock_user(
+        username="testuser",
+        workspaces={
+            "workspace1": factories.create_api_workspace(),
+            "workspace2": factories.create_api_workspace(),
+        },
+    )
+    refresh = Mock(wraps=bll._workspace_listing_cache._refresh)
+    monkeypatch.setattr(bll._workspace_listing_cache, "_refresh", refresh)
+
+    assert len(bll.get_workspaces_for_user(user)) == 2
+    refresh.assert_called_once()
+
+
+def test_provider_get_workspaces_for_user_does_not_read_manifests(bll, monkeypatch):
+    factories.create_workspace("workspace")
+    user = factories.create_airlock_user(
+        username="testuser",
+        workspaces={"workspace": factories.create_api_workspace(project="project")},
+    )
+    monkeypatch.setattr(
+        Workspace, "from_directory", Mock(side_effect=AssertionError("read"))
+    )
 
-    assert [ws.name for ws in result] == ["good"]
-    spans = get_trace()
-    assert len(spans) == 1
-    assert len(spans[0].events) == 1
-    event = spans[0].events[0]
-    assert event.name == "exception"
-    assert "ManifestFileError" in event.attributes["exception.type"]
+    [listing] = bll.get_workspaces_for_user(user)
+    assert listing.name == "workspace"
+    assert listing.project.name == "project"
 
 
 def test_provider_get_all_workspaces(bll):
@@ -192,6 +220,92 @@ def test_provider_get_all_workspaces_returns_workspace_listings(bll):
     )
 
 
+def test_provider_get_all_workspaces_query(bll):
+    factories.create_workspace("foo")
+    factories.create_workspace("bar")
+    factories.create_workspace("Bazaar")
+
+    result = bll.get_all_workspaces("BA")
+    assert [ws.name for ws in result] == ["Bazaar", "bar"]
+
+
+def test_workspace_listing_cache(tmp_path):
+    cache = WorkspaceListingCache()
+
+    def create(name, manifest=True):
+        (tmp_path / name / "metadata").mkdir(parents=True)
+        if manifest:
+            (tmp_path / name / "metadata" / "manifest.json").write_text("{}")
+
+    def search(query=""):
+        return [ws.name for ws in cache.search(tmp_path, query)]
+
+    def set_old_mtime():
+        # so the cache trusts the mtime
+        old = time.time() - 10
+        os.utime(tmp_path, (old, old))
+
+    create("foo")
+    create("bar")
+    create("baz", manifest=False)
+    (tmp_path / "stray-file.txt").write_text("not a workspace")
+    set_old_mtime()
+
+    assert search() == ["bar", "foo"]
+    assert search("A") == ["bar"]
+    assert cache.names_with_manifest(tmp_path) == {"bar", "foo"}
+
+    # workspaces we have seen a manifest for are not checked again
+    (tmp_path / "foo" / "metadata" / "manifest.json").unlink()
+    # but those without a manifest are
+    (tmp_path / "baz" / "metadata" / "manifest.json").write_text("{}")
+    assert search() == ["bar", "baz", "foo"]
+
+    # adding or removing workspaces changes the directory's mtime
+    create("new")
+    shutil.rmtree(tmp_path / "bar")
+    assert search() == ["baz", "foo", "new"]
+
+    # a different directory starts again
+    other = tmp_path / "foo"
+    assert [ws.name for ws in cache.search(other)] == []
+
+
+def test_workspace_listing_cache_with_watcher(settings):
+    writer = GenerationWriter(settings.GENERATIONS_FILE)
+    writer.write()
+    workspace_dir = settings.WORKSPACE_DIR
+    cache = WorkspaceListingCache()
+
+    def search():
+        return [ws.name for ws in cache.search(workspace_dir)]
+
+    (workspace_dir / "empty").mkdir()
+    factories.create_workspace("foo")
+    assert search() == ["foo"]
+
+    # the watcher hasn't seen the changes yet, so we don't look for them
+    factories.create_workspace("bar")
+    factories.create_workspace("empty")
+    assert search() == ["foo"]
+
+    writer.bump("empty")
+    writer.write()
+    assert search() == ["empty", "foo"]
+
+    writer.bump(ROOT)
+    writer.write()
+    assert search() == ["bar", "empty", "foo"]
+
+    # removed workspaces are forgotten
+    (workspace_dir / "other").mkdir()
+    shutil.rmtree(workspace_dir / "foo")
+    writer.bump(ROOT)
+    writer.write()
+    assert search() == ["bar", "empty"]
+    assert cache._without_manifest.keys() == {"other"}
+
+
 def test_provider_request_release_files_request_not_approved(bll, mock_notifications):
     author = factories.create_airlock_user(username="author", workspaces=["workspace"])
     checker = factories.create_airlock_user(username="checker", output_checker=True)
@@ -1437,6 +1551,21 @@ def test_set_status_cannot_action_own_request(bll, mock_old_api):
         bll.set_status(release_request2, RequestStatus.RELEASED, user=user)
 
 
+def test_get_release_request_version(bll):
+    author = factories.create_airlock_user(username="author", workspaces=["workspace"])
+    other = factories.create_airlock_user(username="other", workspaces=["other"])
+    release_request = factories.create_release_request("workspace", user=author)
+    factories.add_request_file(release_request, "group", "file.txt")
+    version = bll.get_release_request_version(release_request.id, author)
+
+    bll.group_edit(release_request, "group", "foo", "bar", author)
+    assert bll.get_release_request_version(release_request.id, author) == version + 1
+    assert bll.get_release_request(release_request.id, author).version == version + 1
+
+    with pytest.raises(exceptions.WorkspacePermissionDenied):
+        bll.get_release_request_version(release_request.id, other)
+
+
 def test_submit_request(bll, mock_notifications):
     """
     From pending
@@ -3595,10 +3724,13 @@ def test_review_request_race_condition(bll):
 # add DAL method names to this if they do not require auditing
 DAL_AUDIT_EXCLUDED = {
     "get_release_request",
+    "get_release_request_version",
     "get_requests_for_workspace",
     "get_active_requests_for_workspace_by_user",
     "get_audit_log",
     "get_requests_by_status",
+    "count_requests_by_status",
+    "count_files_pending_upload",
     "get_requests_authored_by_user",
     "get_approved_requests",
     "delete_file_from_request",
@@ -3608,6 +3740,7 @@ DAL_AUDIT_EXCLUDED = {
     "get_released_files_for_request",
     "register_file_upload_attempt",
     "hide_audit_events_for_turn",
+    "flush_audit_events",
 }
 
 
@@ -4329,6 +4462,17 @@ def test_hide_all_audit_logs_from_turn(bll):
         assert log.extra.get("review_turn") != str(release_request.review_turn)
 
 
+def test_flush_audit_events(bll, settings):
+    settings.AUDIT_SPOOL_MAX_EVENTS = 100
+    workspace = factories.create_workspace("workspace")
+    user = factories.create_airlock_user(workspaces=["workspace"])
+    bll.audit_workspace_file_access(workspace, UrlPath("foo.txt"), user)
+    assert not AuditLog.objects.exists()
+
+    bll.flush_audit_events()
+    assert AuditLog.objects.get().type == AuditEventType.WORKSPACE_FILE_VIEW
+
+
 def test_early_return(bll):
     checker1, checker2 = factories.get_default_output_checkers()
     release_request = factories.create_request_at_status(
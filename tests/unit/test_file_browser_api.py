@@ -4,6 +4,7 @@ import textwrap
 import pytest
 from django.template.loader import render_to_string
 
+from airlock import metrics
 from airlock.enums import (
     PathType,
     RequestFileDecision,
@@ -13,11 +14,15 @@ from airlock.enums import (
 )
 from airlock.file_browser_api import (
     PathItem,
+    TreeFragmentCache,
     get_code_tree,
     get_request_tree,
     get_workspace_tree,
+    request_tree_key,
+    workspace_tree_key,
 )
 from airlock.types import UrlPath
+from services import metrics as services_metrics
 from tests import factories
 from tests.conftest import get_trace
 
@@ -811,3 +816,104 @@ def test_get_code_tree_root(workspace):
         """
     )
     assert str(tree).strip() == expected.strip()
+
+
+def cache_lookups(settings, result):
+    metrics.flush()
+    values = services_metrics.REGISTRY.read(settings.METRICS_DIR)
+    return values.get(
+        ("airlock_cache_lookups_total", (("cache", "file_tree"), ("result", result))),
+        0,
+    )
+
+
+def test_tree_fragment_cache_matches_uncached_render(workspace, settings):
+    cache = TreeFragmentCache(size=2)
+
+    for relpath in ["some_dir/file_a.txt", "some_dir/file_b.txt", "some_dir"]:
+        tree = get_workspace_tree(workspace, UrlPath(relpath))
+        html = cache.render(tree, state_key="key")
+        assert html == render_to_string(
+            "file_browser/tree.html", {"path": tree.fake_parent()}
+        )
+
+    # the same directories were expanded each time, so only the first missed
+    assert cache_lookups(settings, "miss") == 1
+    assert cache_lookups(settings, "hit") == 2
+
+
+def test_tree_fragment_cache_state_key(workspace, settings):
+    cache = TreeFragmentCache(size=2)
+    tree = get_workspace_tree(workspace, UrlPath("some_dir/file_a.txt"))
+
+    cache.render(tree, state_key="key")
+    cache.render(tree, state_key="other")
+    assert cache_lookups(settings, "miss") == 2
+
+    # no key, no caching
+    cache.render(tree)
+    assert cache_lookups(settings, "miss") == 2
+    assert cache_lookups(settings, "hit") == 0
+
+
+def test_tree_fragment_cache_expanded_paths(workspace, settings):
+    factories.write_workspace_file(workspace, "other_dir/file.txt", "other")
+    cache = TreeFragmentCache(size=2)
+
+    for relpath in ["some_dir/file_a.txt", "other_dir/file.txt"]:
+        tree = get_workspace_tree(workspace, UrlPath(relpath))
+        assert cache.render(tree, state_key="key") == render_to_string(
+            "file_browser/tree.html", {"path": tree.fake_parent()}
+        )
+
+    assert cache_lookups(settings, "miss") == 2
+
+
+def test_tree_fragment_cache_evicts_oldest(workspace, settings):
+    cache = TreeFragmentCache(size=2)
+    tree = get_workspace_tree(workspace, UrlPath("some_dir/file_a.txt"))
+
+    for key in ["a", "b", "c", "a"]:
+        cache.render(tree, state_key=key)
+
+    assert cache_lookups(settings, "miss") == 4
+
+    cache.render(tree, state_key="c")
+    assert cache_lookups(settings, "hit") == 1
+
+
+def test_tree_fragment_cache_no_selected_path(workspace):
+    cache = TreeFragmentCache(size=2)
+    tree = get_workspace_tree(workspace, UrlPath("some_dir/file_a.txt"))
+    tree.get_selected().selected = False
+
+    html = cache.render(tree, state_key="key")
+    assert " selected" not in html
+    assert cache.render(tree, state_key="key") == html
+
+
+def test_workspace_tree_key(release_request):
+    factories.write_workspace_file(
+        release_request.workspace, "some_dir/file_d.txt", "file_d"
+    )
+    workspace = factories.refresh_workspace(release_request.workspace)
+    key = workspace_tree_key(workspace)
+    assert workspace_tree_key(factories.refresh_workspace(workspace.name)) == key
+
+    # adding a file to the current request changes the file statuses
+    factories.add_request_file(release_request, "group1", "some_dir/file_d.txt")
+    assert workspace_tree_key(factories.refresh_workspace(workspace.name)) != key
+
+
+def test_request_tree_key(release_request):
+    factories.write_workspace_file(
+        release_request.workspace, "some_dir/file_d.txt", "file_d"
+    )
+    author = release_request.author
+    checker = factories.create_airlock_user(username="checker", output_checker=True)
+    key = request_tree_key(release_request, author)
+    assert request_tree_key(release_request, checker) != key
+
+    factories.add_request_file(release_request, "group1", "some_dir/file_d.txt")
+    release_request = factories.refresh_release_request(release_request)
+    assert request_tree_key(release_request, author) != key
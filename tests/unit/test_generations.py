@@ -0,0 +1,307 @@
+import ctypes
+import errno
+import json
+import os
+import time
+
+import pytest
+
+from airlock.lib import generations
+from airlock.lib.generations import (
+    ROOT,
+    GenerationCache,
+    GenerationWriter,
+    InotifyWatcher,
+    PollingWatcher,
+)
+
+
+def write(path, content="{}"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.fixture
+def root(tmp_path):
+    # tmp_path also has the test's settings directories in it
+    root = tmp_path / "root"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def writer(settings):
+    writer = GenerationWriter(settings.GENERATIONS_FILE)
+    writer.write()
+    return writer
+
+
+def test_get_token_no_watcher():
+    assert generations.get_token("workspace") is None
+
+
+def test_get_token(writer):
+    token = generations.get_token("workspace")
+    assert token == f"{writer.epoch}:0"
+    assert generations.get_token(ROOT) == token
+
+    writer.bump("workspace")
+    writer.write()
+    assert generations.get_token("workspace") == f"{writer.epoch}:1"
+    assert generations.get_token(ROOT) == token
+
+
+def test_get_token_new_epoch(writer):
+    token = generations.get_token("workspace")
+    writer.reset()
+    writer.write()
+    assert generations.get_token("workspace") != token
+
+
+def test_get_token_stale(writer, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + generations.STALE_AFTER + 1)
+    assert generations.get_token("workspace") is None
+
+
+def test_get_token_bad_file(settings):
+    settings.GENERATIONS_FILE.write_text("{")
+    assert generations.get_token("workspace") is None
+
+
+def test_get_token_reads_file_once(writer, monkeypatch):
+    generations.get_token("workspace")
+
+    def fail(*args):  # pragma: no cover
+        raise AssertionError("read again")
+
+    monkeypatch.setattr(json, "loads", fail)
+    assert generations.get_token("workspace") == f"{writer.epoch}:0"
+
+
+def test_generation_cache_no_watcher():
+    cache = GenerationCache("test", size=2)
+    assert cache.get("workspace", lambda: 1) == 1
+    assert cache.get("workspace", lambda: 2) == 2
+
+
+def test_generation_cache(writer):
+    cache = GenerationCache("test", size=2)
+    assert cache.get("workspace", lambda: 1) == 1
+    assert cache.get("workspace", lambda: 2) == 1
+
+    writer.bump("workspace")
+    writer.write()
+    assert cache.get("workspace", lambda: 3) == 3
+
+    cache.clear()
+    assert cache.get("workspace", lambda: 4) == 4
+
+
+def test_generation_cache_size(writer):
+    cache = GenerationCache("test", size=2)
+    cache.get("a", lambda: "a1")
+    cache.get("b", lambda: "b1")
+    # a is now the most recently used
+    cache.get("a", lambda: "a2")
+    cache.get("c", lambda: "c1")
+
+    assert cache.get("a", lambda: "a3") == "a1"
+    assert cache.get("b", lambda: "b2") == "b2"
+
+
+def test_generation_writer(root):
+    path = root / "sub" / "generations.json"
+    writer = GenerationWriter(path)
+    writer.bump("workspace")
+    writer.bump("workspace")
+    writer.write()
+
+    data = json.loads(path.read_text())
+    assert data["epoch"] == writer.epoch
+    assert data["generations"] == {"workspace": 2}
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_polling_watcher(root):
+    write(root / "workspace/metadata/manifest.json")
+    write(root / "stray-file.txt")
+    write(root / "workspace/output/file.txt")
+    watcher = PollingWatcher(root, interval=0)
+
+    assert watcher.wait(timeout=1) == set()
+
+    # changes outside the metadata directory are ignored
+    write(root / "workspace/output/file.txt", "changed")
+    assert watcher.wait(timeout=1) == set()
+
+    write(root / "workspace/metadata/manifest.json", '{"outputs": {}}')
+    assert watcher.wait(timeout=1) == {"workspace"}
+
+    write(root / "workspace/metadata/logs/job.log")
+    assert watcher.wait(timeout=1) == {"workspace"}
+
+    write(root / "new/metadata/manifest.json")
+    assert watcher.wait(timeout=1) == {ROOT, "new"}
+
+
+def test_polling_watcher_file_removed(root, monkeypatch):
+    write(root / "workspace/metadata/manifest.json")
+    watcher = PollingWatcher(root, interval=0)
+
+    def stat(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "stat", stat)
+    assert watcher.wait(timeout=1) == {"workspace"}
+
+
+@pytest.fixture
+def inotify(root):
+    write(root / "workspace/metadata/manifest.json")
+    write(root / "stray-file.txt")
+    (root / "workspace/output").mkdir()
+    watcher = InotifyWatcher(root, poll_interval=0.1)
+    yield watcher
+    watcher.close()
+
+
+def test_inotify_watcher_timeout(inotify):
+    assert inotify.wait(timeout=0) == set()
+
+
+def test_inotify_watcher_manifest(inotify, root):
+    write(root / "workspace/metadata/manifest.json", '{"outputs": {}}')
+    assert inotify.wait(timeout=1) == {"workspace"}
+
+
+def test_inotify_watcher_ignores_outputs(inotify, root):
+    write(root / "workspace/output/file.txt")
+    (root / "workspace/other").mkdir()
+    write(root / "workspace/other/file.txt")
+    assert inotify.wait(timeout=1) == {"workspace"}
+    # the new directory isn't watched
+    write(root / "workspace/other/file.txt", "changed")
+    assert inotify.wait(timeout=0.1) == set()
+
+
+def test_inotify_watcher_new_metadata_subdir(inotify, root):
+    write(root / "workspace/metadata/logs/job.log")
+    assert inotify.wait(timeout=1) == {"workspace"}
+    write(root / "workspace/metadata/logs/job.log", "changed")
+    assert inotify.wait(timeout=1) == {"workspace"}
+
+
+def test_inotify_watcher_new_workspace(inotify, root):
+    (root / "new").mkdir()
+    assert inotify.wait(timeout=1) == {ROOT, "new"}
+    write(root / "new/metadata/manifest.json")
+    assert inotify.wait(timeout=1) == {"new"}
+    write(root / "new/metadata/manifest.json", "changed")
+    assert inotify.wait(timeout=1) == {"new"}
+
+
+def test_inotify_watcher_workspace_removed(inotify, root):
+    (root / "workspace/metadata/manifest.json").unlink()
+    (root / "workspace/metadata").rmdir()
+    (root / "workspace/output").rmdir()
+    (root / "workspace").rmdir()
+    assert inotify.wait(timeout=1) == {ROOT, "workspace"}
+    assert {name for name, _ in inotify._watches.values()} == {ROOT}
+
+
+def test_inotify_watcher_overflow(inotify):
+    event = generations.EVENT_HEADER.pack(-1, generations.IN_Q_OVERFLOW, 0, 0)
+    assert inotify._handle_events(event) == {ROOT, "workspace"}
+
+
+def test_inotify_watcher_directory_already_removed(inotify, root):
+    inotify._watch_workspace("missing")
+    assert {name for name, _ in inotify._watches.values()} == {ROOT, "workspace"}
+
+
+def test_inotify_watcher_add_watch_error(inotify, root):
+    write(root / "file")
+    with pytest.raises(NotADirectoryError):
+        inotify._add_watch("file", root / "file", generations.IN_ONLYDIR)
+
+
+def test_inotify_watcher_watch_limit(inotify, root, monkeypatch, caplog):
+    libc = inotify._libc
+
+    class FullLibc:
+        def inotify_add_watch(self, fd, path, mask):
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+
+    monkeypatch.setattr(inotify, "_libc", FullLibc())
+    (root / "new/metadata").mkdir(parents=True)
+    assert inotify.wait(timeout=1) == {ROOT, "new"}
+    # logged once, though neither directory could be watched
+    assert caplog.text.count("polling new") == 1
+    monkeypatch.setattr(inotify, "_libc", libc)
+
+    # the new workspace is polled instead
+    write(root / "new/metadata/manifest.json")
+    assert inotify.wait(timeout=1) == {"new"}
+    assert inotify.wait(timeout=0.2) == set()
+
+    # and no longer polled once removed
+    (root / "new/metadata/manifest.json").unlink()
+    (root / "new/metadata").rmdir()
+    (root / "new").rmdir()
+    assert inotify.wait(timeout=1) == {ROOT, "new"}
+    assert inotify._polled == {}
+
+
+def test_inotify_watcher_watch_limit_root(root, monkeypatch):
+    class FullLibc:
+        def inotify_init1(self, flags):
+            return os.open(root, os.O_RDONLY)
+
+        def inotify_add_watch(self, fd, path, mask):
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+
+    monkeypatch.setattr(generations, "_load_libc", lambda: FullLibc())
+    # we can't watch anything, so fall back to polling everything
+    with pytest.raises(OSError) as error:
+        InotifyWatcher(root, poll_interval=1)
+    assert error.value.errno == errno.ENOSPC
+
+
+def test_inotify_watcher_init_error(root):
+    with pytest.raises(FileNotFoundError):
+        InotifyWatcher(root / "missing", poll_interval=1)
+
+
+def test_inotify_watcher_init_fd_error(root, monkeypatch):
+    class BadLibc:
+        def inotify_init1(self, flags):
+            return -1
+
+    monkeypatch.setattr(generations, "_load_libc", lambda: BadLibc())
+    with pytest.raises(OSError):
+        InotifyWatcher(root, poll_interval=1)
+
+
+def test_load_libc_no_inotify(monkeypatch):
+    monkeypatch.setattr(ctypes, "CDLL", lambda *args, **kwargs: object())
+    with pytest.raises(OSError, match="inotify is not available"):
+        generations._load_libc()
+
+
+def test_make_watcher(root):
+    watcher = generations.make_watcher(root, poll_interval=1)
+    assert isinstance(watcher, InotifyWatcher)
+    watcher.close()
+
+
+def test_make_watcher_fallback(root, monkeypatch, caplog):
+    def load_libc():
+        raise OSError("no inotify")
+
+    monkeypatch.setattr(generations, "_load_libc", load_libc)
+    watcher = generations.make_watcher(root, poll_interval=1)
+    assert isinstance(watcher, PollingWatcher)
+    assert "polling instead" in caplog.text
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from airlock.lib import git
+from airlock.types import UrlPath
+from tests import factories
+
+
+@pytest.fixture
+def repo():
+    return factories.create_repo(
+        "workspace",
+        files=[
+            ("project.yaml", "yaml: true"),
+            ("a.txt", "a"),
+            ("a/b.txt", "b"),
+            ("a0.txt", "a0"),
+            ("c/d/e.py", "e"),
+            ("has space.txt", "space"),
+        ],
+    )
+
+
+def test_list_files_from_repo(repo):
+    # same order as `git ls-tree -r`
+    assert git.list_files_from_repo(repo.repo, repo.commit) == [
+        UrlPath("a.txt"),
+        UrlPath("a/b.txt"),
+        UrlPath("a0.txt"),
+        UrlPath("c/d/e.py"),
+        UrlPath("has space.txt"),
+        UrlPath("project.yaml"),
+    ]
+
+
+def test_list_files_from_repo_bad_commit(repo):
+    with pytest.raises(git.GitError):
+        git.list_files_from_repo(repo.repo, "0" * 40)
+
+
+def test_read_file_from_repo(repo):
+    assert git.read_file_from_repo(repo.repo, repo.commit, "c/d/e.py") == b"e"
+
+    with pytest.raises(git.GitFileNotFoundError):
+        git.read_file_from_repo(repo.repo, repo.commit, "missing.txt")
+
+    with pytest.raises(git.GitFileNotFoundError):
+        git.read_file_from_repo(repo.repo, repo.commit, "bad\nname.txt")
+
+
+def test_read_file_from_repo_with_space(repo):
+    repo_dir = git.get_local_repo_dir(repo.repo)
+    assert git.read_file_from_repo(repo.repo, repo.commit, "has space.txt") == b"space"
+    process = git.get_cat_file_batch(repo_dir)._process
+
+    with pytest.raises(git.GitFileNotFoundError):
+        git.read_file_from_repo(repo.repo, repo.commit, "missing file.txt")
+
+    # the shared process is still in use
+    assert git.get_cat_file_batch(repo_dir)._process is process
+    git.get_cat_file_batch(repo_dir)._stop()
+
+
+def test_cat_file_batch_idle_timeout(repo):
+    batch = git.CatFileBatch(git.get_local_repo_dir(repo.repo), idle_timeout=0.1)
+    assert batch.read(f"{repo.commit}:a.txt") == ("blob", b"a")
+    process = batch._process
+    assert process.poll() is None
+
+    # later reads reuse the same process, and don't start any more threads
+    threads = threading.active_count()
+    for _ in range(5):
+        batch.read(f"{repo.commit}:a.txt")
+    assert batch._process is process
+    assert threading.active_count() <= threads
+
+    time.sleep(0.5)
+    assert batch._process is None
+    assert process.returncode is not None
+
+    # restarted when next needed
+    assert batch.read(f"{repo.commit}:a0.txt") == ("blob", b"a0")
+    batch._stop()
+
+
+def test_cat_file_batch_process_died(repo):
+    batch = git.CatFileBatch(git.get_local_repo_dir(repo.repo))
+    batch.read(f"{repo.commit}:a.txt")
+    batch._process.kill()
+    batch._process.wait()
+
+    assert batch.read(f"{repo.commit}:a.txt") == ("blob", b"a")
+    batch._stop()
+
+
+def test_get_repo_tree(repo):
+    paths, child_map = git.get_repo_tree(repo.repo, repo.commit)
+    assert paths == git.list_files_from_repo(repo.repo, repo.commit)
+    assert child_map == {
+        ".": ["a", "a.txt", "a0.txt", "c", "has space.txt", "project.yaml"],
+        "a": ["a/b.txt"],
+        "c": ["c/d"],
+        "c/d": ["c/d/e.py"],
+    }
+
+
+def test_get_repo_tree_cached(repo):
+    cache_path = (
+        git.get_local_repo_dir(repo.repo) / git.TREE_CACHE_DIR / f"{repo.commit}.json"
+    )
+    cache_path.unlink(missing_ok=True)
+
+    git._repo_trees.clear()
+
+    expected = git.get_repo_tree(repo.repo, repo.commit)
+    assert cache_path.exists()
+
+    # subsequent calls in this process use the tree in memory
+    cache_path.unlink()
+    assert git.get_repo_tree(repo.repo, repo.commit) is expected
+
+    # other processes only read the cache on disk
+    git._repo_trees.clear()
+    cache_path.write_text(
+        '{"paths": ["cached.txt"], "children": {".": ["cached.txt"]}}'
+    )
+    assert git.get_repo_tree(repo.repo, repo.commit) == (
+        [UrlPath("cached.txt")],
+        {".": ["cached.txt"]},
+    )
+
+    git._repo_trees.clear()
+    cache_path.unlink()
+    assert git.get_repo_tree(repo.repo, repo.commit) == expected
+
+
+def test_get_repo_tree_memory_cache_size(repo, monkeypatch):
+    monkeypatch.setattr(git, "TREE_MEMORY_CACHE_SIZE", 1)
+    git._repo_trees.clear()
+    other = factories.create_repo("other", files=[("other.txt", "other")])
+
+    git.get_repo_tree(repo.repo, repo.commit)
+    git.get_repo_tree(other.repo, other.commit)
+    assert list(git._repo_trees) == [(git.get_local_repo_dir(other.repo), other.commit)]
+
+
+def test_fetched_commits_size(repo, monkeypatch):
+    monkeypatch.setattr(git, "FETCHED_COMMITS_CACHE_SIZE", 1)
+    monkeypatch.setattr(git, "_fetched_commits", OrderedDict())
+    other = factories.create_repo("other", files=[("other.txt", "other")])
+    repo_dir = git.get_local_repo_dir(repo.repo)
+    other_dir = git.get_local_repo_dir(other.repo)
+
+    git.ensure_commit_fetched(repo_dir, repo.repo, repo.commit)
+    git.ensure_commit_fetched(other_dir, other.repo, other.commit)
+    assert list(git._fetched_commits) == [(other_dir, other.commit)]
+
+
+def test_get_repo_tree_not_cached_for_invalid_sha(repo, settings):
+    # commit comes from the url, so must not be used as a path if it isn't a sha
+    with pytest.raises(git.GitError):
+        git.get_repo_tree(repo.repo, "../../../bad")
+    assert not list(settings.GIT_REPO_DIR.parent.rglob("bad.json"))
@@ -1,3 +1,4 @@
+import dataclasses
 import hashlib
 import json
 from hashlib import file_digest
@@ -7,7 +8,7 @@ import pytest
 from django.conf import settings
 from opentelemetry import trace
 
-from airlock import exceptions, permissions
+from airlock import exceptions, models, permissions, renderers
 from airlock.enums import (
     RequestFileDecision,
     RequestFileType,
@@ -16,6 +17,7 @@ from airlock.enums import (
     Visibility,
     WorkspaceFileStatus,
 )
+from airlock.lib.generations import GenerationWriter
 from airlock.models import (
     CodeRepo,
     Workspace,
@@ -112,6 +114,32 @@ def test_workspace_from_directory_out_of_date_action_filter():
     assert excluded.out_of_date_action_count == 1
 
 
+def test_workspace_from_directory_cached_by_generation():
+    factories.write_workspace_file("workspace", "foo.txt")
+    writer = GenerationWriter(settings.GENERATIONS_FILE)
+    writer.write()
+    workspace = Workspace.from_directory("workspace")
+    assert workspace.workspace_files == {"foo.txt", "metadata/manifest.json"}
+
+    factories.write_workspace_file("workspace", "bar.txt")
+    factories.write_workspace_file("workspace", "metadata/job.log")
+
+    # the watcher hasn't seen the changes yet
+    cached = Workspace.from_directory("workspace")
+    assert cached.manifest is workspace.manifest
+    assert cached.workspace_files == workspace.workspace_files
+
+    writer.bump("workspace")
+    writer.write()
+    refreshed = Workspace.from_directory("workspace")
+    assert refreshed.workspace_files == {
+        "bar.txt",
+        "foo.txt",
+        "metadata/manifest.json",
+        "metadata/job.log",
+    }
+
+
 def test_workspace_out_of_date_action_count_zero():
     factories.write_workspace_file("workspace", "current.txt", "cur")
     workspace = Workspace.from_directory("workspace")
@@ -1144,6 +1172,37 @@ def test_coderepo_from_workspace(bll):
     )
 
 
+def test_coderepo_get_renderer_highlight_cache(bll, monkeypatch):
+    repo = factories.create_repo("workspace", files=[("script.py", "import os\n")])
+
+    renderer = repo.get_renderer(UrlPath("script.py"))
+    assert isinstance(renderer, renderers.CodeRenderer)
+    assert renderer.highlight_cache is not None
+    assert repo.commit in renderer.highlight_cache.parts
+
+    renderer.get_response().render()
+    assert renderer.highlight_cache.exists()
+
+    # a different version of the highlighter uses a different cache
+    monkeypatch.setattr(renderers, "HIGHLIGHTER_VERSION", "new")
+    new_renderer = repo.get_renderer(UrlPath("script.py"))
+    assert isinstance(new_renderer, renderers.CodeRenderer)
+    assert new_renderer.highlight_cache != renderer.highlight_cache
+
+
+def test_coderepo_get_renderer_not_cached_for_branch(bll, monkeypatch):
+    repo = factories.create_repo("workspace", files=[("script.py", "import os\n")])
+    # a branch name could point at different code later
+    repo = dataclasses.replace(repo, commit="main")
+    monkeypatch.setattr(
+        models, "read_file_from_repo", lambda repo, commit, relpath: b"import os\n"
+    )
+
+    renderer = repo.get_renderer(UrlPath("script.py"))
+    assert isinstance(renderer, renderers.CodeRenderer)
+    assert renderer.highlight_cache is None
+
+
 def test_displayed_decision_for_conflicting_file_reviews(bll):
     path = UrlPath("path/file1.txt")
 
@@ -39,6 +39,19 @@ def test_send_notification_error(notifications_stubber):
     }
 
 
+def test_send_notification_connection_error(responses, settings):
+    settings.AIRLOCK_API_TOKEN = "token"
+    responses.post(
+        f"{settings.AIRLOCK_API_ENDPOINT}/airlock/events/",
+        body=requests.ConnectionError("connection refused"),
+    )
+    event_json = json.dumps({"event_type": "request_submitted"})
+    assert send_notification_event(event_json=event_json, username="test-user") == {
+        "status": "error",
+        "message": "Error sending notification: connection refused",
+    }
+
+
 def test_all_expected_status_changes_notify():
     """
     For every possible request status that a request can move
@@ -120,6 +120,68 @@ def test_code_renderer_from_contents(suffix, mimetype, plaintext, template_path)
     assert response.headers["Cache-Control"] == "max-age=31536000, immutable"
 
 
+@pytest.mark.parametrize(
+    "filename,renderer_class",
+    [
+        ("script.py", renderers.CodeRenderer),
+        ("analysis.R", renderers.CodeRenderer),
+        ("analysis.do", renderers.CodeRenderer),
+        ("notes.txt", renderers.TextRenderer),
+        ("file.unknown", renderers.TextRenderer),
+        ("image.svg", renderers.Renderer),
+    ],
+)
+def test_get_code_renderer_highlighting(filename, renderer_class):
+    assert renderers.get_code_renderer(UrlPath(filename)) is renderer_class
+    assert renderers.get_code_renderer(UrlPath(filename), plaintext=True) is (
+        renderers.TextRenderer
+    )
+
+
+def test_code_renderer():
+    path = UrlPath("script.py")
+    renderer = renderers.CodeRenderer.from_contents(
+        b"import os\nprint('<b>')\n", path, "cache_id"
+    )
+    assert renderer.cache_id.endswith(renderers.HIGHLIGHTER_VERSION)
+
+    response = renderer.get_response()
+    response.render()
+    assert response.headers["ETag"] == renderer.etag
+    assert '<pre class="highlight py">' in response.rendered_content
+    assert '<span class="kn">import</span>' in response.rendered_content
+    assert "&lt;b&gt;" in response.rendered_content
+    assert ".highlight .kn" in response.rendered_content
+
+
+def test_code_renderer_highlight_cache(tmp_path):
+    path = UrlPath("script.py")
+    cache = tmp_path / "cache" / "script.html"
+
+    renderer = renderers.CodeRenderer.from_contents(b"import os\n", path, "")
+    assert isinstance(renderer, renderers.CodeRenderer)
+    renderer.highlight_cache = cache
+    highlighted = renderer.highlighted()
+    assert cache.read_text() == highlighted
+    assert list(cache.parent.iterdir()) == [cache]
+
+    # subsequent renders only read the cache
+    cache.write_text("cached")
+    renderer = renderers.CodeRenderer.from_contents(b"import os\n", path, "")
+    assert isinstance(renderer, renderers.CodeRenderer)
+    renderer.highlight_cache = cache
+    assert renderer.highlighted() == "cached"
+
+
+def test_highlight_code_large_file(monkeypatch):
+    monkeypatch.setattr(renderers, "MAX_HIGHLIGHT_CHARS", 5)
+    assert renderers.highlight_code("import os", "script.py") == "import os"
+    assert "<span" in renderers.highlight_code("x = 1", "script.py")
+    # measured in characters, not bytes
+    assert "<span" in renderers.highlight_code("x = é", "script.py")
+    assert renderers.highlight_code("<b>", "file.unknown") == "&lt;b&gt;"
+
+
 def test_csv_renderer_handles_empty_file(tmp_path):
     empty_csv = tmp_path / "empty.csv"
     empty_csv.write_text("")
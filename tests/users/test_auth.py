@@ -1,3 +1,6 @@
+import threading
+import time
+
 from tests import factories
 from users import auth
 
@@ -43,3 +46,52 @@ def test_get_user():
     assert backend.get_user("foo") is None
     user = factories.create_airlock_user(username="foo")
     assert backend.get_user("foo") == user
+
+
+def test_needs_refresh(settings):
+    backend = auth.Level4AuthenticationBackend()
+    user = factories.create_airlock_user()
+    assert not backend.needs_refresh(user)
+    assert not backend.must_refresh(user)
+
+    user.last_refresh = time.time() - (settings.AIRLOCK_AUTHZ_TIMEOUT + 1)
+    assert backend.needs_refresh(user)
+    assert not backend.must_refresh(user)
+
+    user.last_refresh = time.time() - (settings.AIRLOCK_AUTHZ_HARD_TIMEOUT + 1)
+    assert backend.needs_refresh(user)
+    assert backend.must_refresh(user)
+
+
+def test_background_refresher_one_refresh_per_user():
+    refresher = auth.BackgroundRefresher()
+    started = threading.Event()
+    finish = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append("user")
+        started.set()
+        finish.wait(5)
+
+    assert refresher.submit("user", refresh)
+    assert started.wait(5)
+    # already in progress
+    assert not refresher.submit("user", refresh)
+
+    finish.set()
+    refresher._executor.shutdown(wait=True)
+    assert calls == ["user"]
+    assert refresher._in_progress == set()
+
+
+def test_background_refresher_error(caplog):
+    refresher = auth.BackgroundRefresher()
+
+    def refresh():
+        raise Exception("job-server is down")
+
+    assert refresher.submit("user", refresh)
+    refresher._executor.shutdown(wait=True)
+    assert "Background refresh failed for user user" in caplog.text
+    assert refresher._in_progress == set()
@@ -1,6 +1,7 @@
 import json
 
 import pytest
+import requests
 
 from tests import factories
 from users import login_api
@@ -60,3 +61,16 @@ def test_get_user_data_with_dev_users_invalid(settings, tmp_path):
 
     with pytest.raises(login_api.LoginError):
         login_api.get_user_data("test_user", "bad token")
+
+
+@pytest.mark.parametrize(
+    "exception", [requests.ConnectionError(), requests.ReadTimeout()]
+)
+def test_get_user_authz_could_not_connect(responses, settings, exception):
+    settings.AIRLOCK_API_TOKEN = "token"
+    responses.post(
+        f"{settings.AIRLOCK_API_ENDPOINT}/releases/authorise", body=exception
+    )
+    user = factories.create_airlock_user()
+    with pytest.raises(login_api.LoginError, match="Could not connect"):
+        login_api.get_user_authz(user)
@@ -1,8 +1,12 @@
 import logging
+import threading
 import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
+from django.db import connection
 from django.http import HttpRequest
 
 from users import login_api
@@ -12,6 +16,52 @@ from users.models import User
 logger = logging.getLogger(__name__)
 
 
+class BackgroundRefresher:
+    """Run user refreshes in background threads.
+
+    Only one refresh per user is run at a time, so a user making many requests
+    while their refresh is in progress doesn't queue up more of them.
+    """
+
+    def __init__(self, max_workers=2):
+        # threads are only started when first needed, so this is safe to
+        # create before gunicorn forks its workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="authz-refresh"
+        )
+        self._lock = threading.Lock()
+        self._in_progress: set[str] = set()
+
+    def submit(self, user_id: str, fn: Callable[[], object]) -> bool:
+        """Run fn in the background, unless a refresh for this user is already
+        in progress.
+
+        Returns True if the refresh was started.
+        """
+        with self._lock:
+            if user_id in self._in_progress:
+                return False
+            self._in_progress.add(user_id)
+
+        self._executor.submit(self._run, user_id, fn)
+        return True
+
+    def _run(self, user_id: str, fn: Callable[[], object]):
+        try:
+            fn()
+        except Exception:
+            logger.exception(f"Background refresh failed for user {user_id}")
+        finally:
+            with self._lock:
+                self._in_progress.discard(user_id)
+            # Django opens a db connection per thread, and nothing else will
+            # close the one this thread used.
+            connection.close()
+
+
+background_refresher = BackgroundRefresher()
+
+
 class Level4AuthenticationBackend(BaseBackend):
     def authenticate(
         self, request: HttpRequest | None, username=None, token=None, **kwargs
@@ -39,10 +89,22 @@ class Level4AuthenticationBackend(BaseBackend):
 
         return self.update(request.user)
 
+    def refresh_in_background(self, user: User) -> bool:
+        """Refresh a user's data via the API, without waiting for it.
+
+        Returns False if a refresh for this user is already in progress.
+        """
+        return background_refresher.submit(user.user_id, lambda: self.update(user))
+
     def needs_refresh(self, user):
         time_since_authz = time.time() - user.last_refresh
         return time_since_authz > settings.AIRLOCK_AUTHZ_TIMEOUT
 
+    def must_refresh(self, user):
+        """Is the user's data too old to use while we refresh it?"""
+        time_since_authz = time.time() - user.last_refresh
+        return time_since_authz > settings.AIRLOCK_AUTHZ_HARD_TIMEOUT
+
     def create_or_update(self, username: str, force_refresh=False) -> User | None:
         """
         Create a user and/or update their data via the API.
@@ -5,8 +5,11 @@ import requests
 from django.conf import settings
 from opentelemetry import trace
 
+from services import http
 
-session = requests.Session()
+
+# seconds to wait for job-server to respond, while the user waits for us
+AUTH_API_TIMEOUT = 10
 
 
 class LoginError(Exception):
@@ -60,13 +63,16 @@ def get_user_data_dev(dev_users_file: Path, user: str, token: str):
 def auth_api_call(path, json):
     span = trace.get_current_span()
     try:
-        response = session.post(
+        # these calls only read data, so are safe to retry
+        response = http.post(
             f"{settings.AIRLOCK_API_ENDPOINT}{path}",
+            timeout=AUTH_API_TIMEOUT,
+            retry=True,
             headers={"Authorization": settings.AIRLOCK_API_TOKEN},
             json=json,
         )
         response.raise_for_status()
-    except requests.ConnectionError as exc:  # pragma: nocover
+    except (requests.ConnectionError, requests.Timeout) as exc:
         span.record_exception(exc)
         raise LoginError("Could not connect to jobs.opensafely.org")
     except requests.HTTPError as exc: